@@ -0,0 +1,232 @@
+#!/usr/bin/env python
+#
+# Copyright (c) 2011-2023 Bertrand Janin <b@janin.com>
+#
+# Permission to use, copy, modify, and/or distribute this software for any
+# purpose with or without fee is hereby granted, provided that the above
+# copyright notice and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+# WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+# ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+# OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+
+"""
+Run the ``cm`` commands against the fake Trac (see ``faketrac.py``) and
+measure the wall time, number of requests and peak memory of each. The
+results are compared with the stored baselines, a regression is flagged
+when a command makes more requests, or is slower or bigger than its
+baseline by more than the tolerance.
+
+usage: python benchmarks/bench_commands.py [-v 1.2] [-r repeat] [--save]
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+import faketrac
+
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+BASELINES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                              "baselines.json")
+
+# Name of the benchmark and arguments of ``cm``, the commands are run in
+# this order, changing the tickets as they go.
+COMMANDS = (
+    ("help", ["help"]),
+    ("properties", ["properties", "--refresh"]),
+    ("view", ["view", "1"]),
+    ("view-many", ["view", "1-50"]),
+    ("report", ["report", "1"]),
+    ("reports", ["reports"]),
+    ("search", ["search", "crash"]),
+    ("timeline", ["timeline"]),
+    ("status", ["status", "2"]),
+    ("status-change", ["status", "2", "accept", "-m", "mine"]),
+    ("comment", ["comment", "3", "-m", "some comment"]),
+    ("change", ["change", "4,5,6", "milestone=2.0"]),
+)
+
+CONFIG = """[trac]
+base_url = {url}
+username = joe
+password = secret
+auth_type = basic
+"""
+
+
+def run_command(trac, home, arguments):
+    """Run one ``cm`` command in a subprocess, return its metrics.
+
+    :param trac: ``FakeTrac`` instance, to count the requests.
+    :param home: Temporary home directory holding the configuration.
+    :param arguments: Arguments of the ``cm`` command.
+
+    """
+    env = dict(os.environ, HOME=home, CARTMAN_NO_DAEMON="1",
+               PYTHONPATH=ROOT)
+    command = [sys.executable, os.path.join(ROOT, "cm")] + arguments
+
+    trac.reset_counter()
+    started = time.time()
+    with open(os.devnull, "w") as devnull:
+        p = subprocess.Popen(command, env=env, stdout=devnull,
+                             stderr=subprocess.PIPE)
+        stderr = p.stderr.read()
+        _, status, rusage = os.wait4(p.pid, 0)
+        p.returncode = status
+        p.stderr.close()
+    wall = time.time() - started
+
+    # Usage errors are reported on stderr with a successful exit status.
+    if status != 0 or stderr:
+        raise RuntimeError("{} failed: {}".format(
+            " ".join(arguments), stderr.decode("utf-8", "replace")))
+
+    # ru_maxrss is in kilobytes on Linux, in bytes on macOS.
+    rss = rusage.ru_maxrss
+    if sys.platform == "darwin":
+        rss //= 1024
+
+    return {"wall": wall, "requests": trac.requests, "rss": rss}
+
+
+def run_benchmarks(version, tickets, latency, repeat):
+    """Return the metrics of each command, the best wall time out of
+    ``repeat`` runs.
+
+    :param version: Trac version to imitate.
+    :param tickets: Number of tickets of the fake Trac.
+    :param latency: Seconds the fake Trac waits before each response.
+    :param repeat: Number of times each command is run.
+
+    """
+    trac = faketrac.FakeTrac(version, tickets, latency=latency)
+    server = faketrac.serve(trac)
+    home = tempfile.mkdtemp(prefix="cartman-bench-")
+
+    try:
+        config_dir = os.path.join(home, ".cartman")
+        os.mkdir(config_dir)
+        with open(os.path.join(config_dir, "config"), "w") as fp:
+            fp.write(CONFIG.format(url="http://{}:{}".format(
+                *server.server_address)))
+
+        results = {}
+        for name, arguments in COMMANDS:
+            runs = [run_command(trac, home, arguments)
+                    for _ in range(repeat)]
+            results[name] = {
+                "wall": round(min(r["wall"] for r in runs), 3),
+                "requests": max(r["requests"] for r in runs),
+                "rss": max(r["rss"] for r in runs),
+            }
+        return results
+    finally:
+        server.shutdown()
+        server.server_close()
+        shutil.rmtree(home)
+
+
+def compare(results, baselines, tolerance):
+    """Return the list of regressions as human-readable strings.
+
+    :param results: Metrics returned by ``run_benchmarks()``.
+    :param baselines: Stored metrics, same format.
+    :param tolerance: Fraction by which the wall time and memory may exceed
+                      the baseline.
+
+    """
+    regressions = []
+
+    for name, result in sorted(results.items()):
+        baseline = baselines.get(name)
+        if baseline is None:
+            continue
+
+        if result["requests"] > baseline["requests"]:
+            regressions.append("{}: {} requests (baseline: {})".format(
+                name, result["requests"], baseline["requests"]))
+
+        for metric in ("wall", "rss"):
+            if result[metric] > baseline[metric] * (1 + tolerance):
+                regressions.append("{}: {} {} (baseline: {})".format(
+                    name, metric, result[metric], baseline[metric]))
+
+    return regressions
+
+
+def load_baselines(path):
+    try:
+        with open(path) as fp:
+            return json.load(fp)
+    except IOError:
+        return {}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-v", dest="version", default="1.2",
+                        choices=faketrac.VERSIONS,
+                        help="Trac version to imitate")
+    parser.add_argument("-n", dest="tickets", type=int, default=500,
+                        help="number of tickets")
+    parser.add_argument("-l", dest="latency", type=float, default=0.0,
+                        help="seconds the server waits before each response")
+    parser.add_argument("-r", dest="repeat", type=int, default=3,
+                        help="number of runs per command")
+    parser.add_argument("-t", dest="tolerance", type=float, default=0.5,
+                        help="fraction of slowdown tolerated (default: 0.5)")
+    parser.add_argument("--baselines", default=BASELINES_PATH,
+                        help="file of the stored baselines")
+    parser.add_argument("--save", action="store_true",
+                        help="store the results as the new baselines")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.version, args.tickets, args.latency,
+                             args.repeat)
+
+    # Baselines are only comparable for the same server settings.
+    key = "{} n={} l={}".format(args.version, args.tickets, args.latency)
+    all_baselines = load_baselines(args.baselines)
+    baselines = all_baselines.get(key, {})
+
+    print("{:<14} {:>9} {:>9} {:>9}".format("command", "wall (s)",
+                                            "requests", "rss (KiB)"))
+    for name, _ in COMMANDS:
+        result = results[name]
+        print("{:<14} {:9.3f} {:9d} {:9d}".format(
+            name, result["wall"], result["requests"], result["rss"]))
+
+    if args.save:
+        all_baselines[key] = results
+        with open(args.baselines, "w") as fp:
+            json.dump(all_baselines, fp, indent=2, sort_keys=True)
+            fp.write("\n")
+        print("baselines saved for {}".format(key))
+        return
+
+    if not baselines:
+        print("no baselines for {}, use --save".format(key))
+        return
+
+    regressions = compare(results, baselines, args.tolerance)
+    for line in regressions:
+        print("REGRESSION {}".format(line))
+
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+#
+# Copyright (c) 2011-2023 Bertrand Janin <b@janin.com>
+#
+# Permission to use, copy, modify, and/or distribute this software for any
+# purpose with or without fee is hereby granted, provided that the above
+# copyright notice and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+# WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+# ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+# OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+
+"""
+Benchmark the fuzzy matching of values on large lists of options (e.g.
+thousands of milestones), comparing ``FuzzyIndex`` with the previous
+``fuzzy_find()``, scanning all the options for each value. Both must return
+the same matches.
+
+usage: python benchmarks/bench_fuzzy.py [-n options] [-r repeat]
+"""
+
+import os
+import re
+import sys
+import time
+import random
+import difflib
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from cartman import text
+
+
+PREFIXES = ("milestone", "release", "sprint", "backend", "frontend", "api",
+            "docs", "packaging", "infra", "mobile")
+
+
+def fuzzy_find_scan(value, options):
+    """The matching as done before ``FuzzyIndex``."""
+
+    value = value.lower()
+    options = {opt.lower(): opt for opt in options}
+
+    if value in options.keys():
+        return options[value]
+
+    tokenized_matches = []
+    for key, option in options.items():
+        tokens = key.split()
+        if value in tokens:
+            tokenized_matches.append(option)
+
+    if len(tokenized_matches) == 1:
+        return tokenized_matches[0]
+
+    matches = difflib.get_close_matches(value, options.keys())
+
+    if not matches:
+        for l_opt, opt in options.items():
+            pattern = r".*\b{}\b.*".format(value)
+            if re.match(pattern, l_opt):
+                matches.append(l_opt)
+
+    if len(matches) == 1:
+        return options[matches.pop()]
+
+    return None
+
+
+def build_options(count, rng):
+    options = set()
+    while len(options) < count:
+        options.add("{} {}.{}".format(rng.choice(PREFIXES),
+                                      rng.randint(1, 400),
+                                      rng.randint(0, 99)))
+    return sorted(options)
+
+
+def build_values(options, rng):
+    """Return a mix of exact, differently cased, misspelled, partial and
+    unknown values."""
+
+    values = []
+    for option in rng.sample(options, 10):
+        values.append(option)
+        values.append(option.upper())
+        values.append(option[:-1] + "x")
+        values.append(option.split()[1])
+    values += ["nothing like it", "backend", "zzz", "relase 12.5"]
+    return values
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", dest="options", type=int, default=10000,
+                        help="number of options")
+    parser.add_argument("-r", dest="repeat", type=int, default=3,
+                        help="number of passes over the values")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    options = build_options(args.options, rng)
+    values = build_values(options, rng)
+
+    print("{} options, {} values".format(len(options), len(values)))
+
+    started = time.time()
+    index = text.FuzzyIndex(options)
+    index.find("")
+    print("{:<24} {:10.1f} ms".format("FuzzyIndex (build)",
+                                      (time.time() - started) * 1000))
+
+    expected = [fuzzy_find_scan(value, options) for value in values]
+    found = [index.find(value) for value in values]
+    if found != expected:
+        for value, e, f in zip(values, expected, found):
+            if e != f:
+                print("MISMATCH {!r}: {!r} != {!r}".format(value, f, e))
+        sys.exit(1)
+
+    for name, func in (("fuzzy_find (scan)",
+                        lambda v: fuzzy_find_scan(v, options)),
+                       ("FuzzyIndex.find", index.find)):
+        started = time.time()
+        for _ in range(args.repeat):
+            for value in values:
+                func(value)
+        elapsed = (time.time() - started) / args.repeat / len(values)
+        print("{:<24} {:10.3f} ms/value".format(name, elapsed * 1000))
+
+
+if __name__ == "__main__":
+    main()
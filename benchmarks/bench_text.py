@@ -0,0 +1,227 @@
+#!/usr/bin/env python
+#
+# Copyright (c) 2011-2023 Bertrand Janin <b@janin.com>
+#
+# Permission to use, copy, modify, and/or distribute this software for any
+# purpose with or without fee is hereby granted, provided that the above
+# copyright notice and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+# WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+# ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+# OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+
+"""
+Measure the throughput of the extractors of ``cartman.text`` on pages from a
+few KiB to several MiB, generated with the fake Trac (see ``faketrac.py``).
+Pages recorded from a real server can be added in ``benchmarks/corpus/``,
+named after the kind of page (e.g. ``timeline-1.2.html``,
+``search-big.html``), none are shipped and the directory is optional.
+
+The adversarial pages check that no extractor backtracks: the time of each
+extractor should grow linearly with the size of the page, a regression is
+flagged when a page four times bigger takes more than eight times longer
+(sixteen for a quadratic growth).
+
+usage: python benchmarks/bench_text.py [-s scale] [-r repeat] [-k kind]
+"""
+
+import os
+import sys
+import glob
+import timeit
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import faketrac
+from cartman import text
+
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           "corpus")
+
+# Number of tickets (or comments for the ticket pages) of each generated
+# page, multiplied by the scale.
+SIZES = (("small", 10), ("medium", 500), ("large", 5000))
+
+# Extractors run on each kind of page.
+EXTRACTORS = {
+    "ticket": (
+        ("TicketPage", text.TicketPage),
+        ("extract_statuses", text.extract_statuses),
+        ("extract_trac_version", text.extract_trac_version),
+        ("extract_message", text.extract_message),
+        ("is_logged_out", text.is_logged_out),
+    ),
+    "query": (
+        ("extract_properties", text.extract_properties),
+    ),
+    "search": (
+        ("extract_search_results", text.extract_search_results),
+    ),
+    "timeline": (
+        ("extract_timeline_items", text.extract_timeline_items),
+    ),
+}
+
+# Pages made to trigger backtracking, the function returns a page of about
+# ``n`` KiB for the given kind of page.
+ADVERSARIAL = (
+    # Timeline without any line break (minified), ".*" then spans the
+    # remainder of the page.
+    ("timeline", "single line",
+     lambda n: ('<span class="time">10:47</span> Ticket <em>#1</em> '
+                '(x) created</a></dt> ' * (n * 16)).replace("\n", "")),
+    # Time spans never followed by the ticket.
+    ("timeline", "no em",
+     lambda n: '<span class="time">10:47</span>' + " " * (n * 1024)),
+    # Properties never terminated by another "var".
+    ("query", "unterminated",
+     lambda n: "var properties={" + '"a": 1; ' * (n * 128)),
+    # Semicolons followed by long runs of whitespace.
+    ("query", "whitespace",
+     lambda n: "var properties={}" + (";" + " " * 1024) * n),
+    # Inputs never closed.
+    ("ticket", "unclosed inputs",
+     lambda n: "<input " * (n * 146)),
+    # Status spans never completed.
+    ("ticket", "broken status",
+     lambda n: '<span class="trac-status">' + " " * (n * 1024)),
+    # Search results never completed.
+    ("search", "broken results",
+     lambda n: '<dt><a href="/ticket/1" class="searchable"><span class="'
+               + "a" * (n * 1024)),
+)
+
+
+def generate_corpus(scale):
+    """Return the generated pages as (kind, name, html) tuples.
+
+    :param scale: Multiplier of the page sizes.
+
+    """
+    pages = []
+
+    for size_name, size in SIZES:
+        count = max(1, int(size * scale))
+        for version in faketrac.VERSIONS:
+            name = "{} {}".format(size_name, version)
+
+            trac = faketrac.FakeTrac(version, tickets=1, comments=count)
+            pages.append(("ticket", name, trac.render_ticket(1)))
+
+            trac = faketrac.FakeTrac(version, tickets=count, comments=0)
+            pages.append(("search", name, trac.render_search([])))
+            pages.append(("timeline", name, trac.render_timeline(365)))
+
+        trac = faketrac.FakeTrac(tickets=0)
+        pages.append(("query", size_name, trac.render_query()))
+
+    return pages
+
+
+def load_corpus():
+    """Return the recorded pages as (kind, name, html) tuples, if any."""
+
+    pages = []
+
+    for path in sorted(glob.glob(os.path.join(CORPUS_PATH, "*.html"))):
+        name = os.path.basename(path)
+        kind = name.split("-")[0].split(".")[0]
+        if kind not in EXTRACTORS:
+            continue
+        with open(path, "rb") as fp:
+            pages.append((kind, name, fp.read().decode("utf-8", "replace")))
+
+    return pages
+
+
+def measure(func, raw_html, repeat):
+    """Return the best time of a call, in seconds."""
+
+    number = max(1, repeat)
+    return min(timeit.repeat(lambda: func(raw_html), number=number,
+                             repeat=3)) / number
+
+
+def run_throughput(pages, kinds, repeat):
+    print("{:<9} {:<12} {:<24} {:>9} {:>10} {:>9}".format(
+        "page", "name", "extractor", "KiB", "ms", "MiB/s"))
+
+    for kind, name, raw_html in pages:
+        if kind not in kinds:
+            continue
+        size = len(raw_html)
+        for func_name, func in EXTRACTORS[kind]:
+            elapsed = measure(func, raw_html, repeat)
+            print("{:<9} {:<12} {:<24} {:9d} {:10.3f} {:9.1f}".format(
+                kind, name, func_name, size // 1024, elapsed * 1000,
+                size / elapsed / 1024 / 1024 if elapsed else 0))
+
+
+def run_adversarial(kinds, repeat):
+    """Time each extractor on adversarial pages of 512 KiB and 2 MiB, return
+    the number of extractors growing faster than linearly."""
+
+    print("")
+    print("{:<9} {:<16} {:<24} {:>10} {:>10} {:>6}".format(
+        "page", "case", "extractor", "ms@512K", "ms@2M", "ratio"))
+
+    failures = 0
+
+    for kind, case, build in ADVERSARIAL:
+        if kind not in kinds:
+            continue
+        small, large = build(512), build(2048)
+        for func_name, func in EXTRACTORS[kind]:
+            func = ignore_errors(func)
+            t_small = measure(func, small, repeat)
+            t_large = measure(func, large, repeat)
+            ratio = t_large / t_small if t_small else 0
+            flag = ""
+            if ratio > 8:
+                flag = "  BACKTRACKING"
+                failures += 1
+            print("{:<9} {:<16} {:<24} {:10.3f} {:10.3f} {:6.1f}{}".format(
+                kind, case, func_name, t_small * 1000, t_large * 1000,
+                ratio, flag))
+
+    return failures
+
+
+def ignore_errors(func):
+    """The adversarial pages are not valid, only the time matters."""
+
+    def wrapper(raw_html):
+        try:
+            func(raw_html)
+        except Exception:
+            pass
+    return wrapper
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-s", dest="scale", type=float, default=1.0,
+                        help="multiplier of the page sizes")
+    parser.add_argument("-r", dest="repeat", type=int, default=5,
+                        help="number of parses per measure")
+    parser.add_argument("-k", dest="kinds", action="append",
+                        choices=sorted(EXTRACTORS),
+                        help="only this kind of page (repeatable)")
+    args = parser.parse_args()
+
+    kinds = args.kinds or sorted(EXTRACTORS)
+    pages = generate_corpus(args.scale) + load_corpus()
+
+    run_throughput(pages, kinds, args.repeat)
+    if run_adversarial(kinds, args.repeat):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+#
+# Copyright (c) 2011-2023 Bertrand Janin <b@janin.com>
+#
+# Permission to use, copy, modify, and/or distribute this software for any
+# purpose with or without fee is hereby granted, provided that the above
+# copyright notice and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+# WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+# ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+# OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+
+"""
+Benchmark the parsing of large ticket pages (many comments), comparing the
+single-pass ``TicketPage`` with one scan per extracted value.
+
+usage: python benchmarks/bench_ticket_page.py [-n comments] [-r repeat]
+"""
+
+import os
+import re
+import sys
+import timeit
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from cartman import text
+
+
+HEADER = """<html><head><title>#1 (Something broke) - Trac</title></head>
+<body>
+<div id="ticket">
+  <h2>
+    <a href="/ticket/1" class="trac-id">#1</a>
+    <span class="trac-status">
+      <a href="/query?status=assigned">assigned</a>
+    </span>
+    <span class="trac-type">
+      <a href="/query?status=!closed&amp;type=defect">defect</a>
+    </span>
+  </h2>
+</div>
+<div id="changelog">
+"""
+
+COMMENT = """
+  <div class="change" id="trac-change-{0}">
+    <h3 class="change">
+      <span class="threading">
+        <span id="comment:{0}" class="cnum">comment:{0}</span>
+      </span>
+      Changed <a class="timeline" href="/timeline?from=2023">3 days</a> ago
+      by <span class="trac-author">someone</span>
+    </h3>
+    <ul class="changes">
+      <li class="trac-field-priority"><strong>Priority</strong> changed
+        from <em>minor</em> to <em>major</em></li>
+    </ul>
+    <div class="comment searchable">
+      <p>Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do
+      eiusmod tempor incididunt ut labore et dolore magna aliqua, see
+      <a class="ticket" href="/ticket/{0}">#{0}</a> and the
+      <code>status</code> of the other <em>tickets</em>.</p>
+    </div>
+  </div>
+"""
+
+FOOTER = """
+</div>
+<form action="/ticket/1" method="post" id="propertyform">
+  <input type="hidden" name="start_time" value="1690000000000000" />
+  <input type="hidden" name="view_time" value="1690000000000001" />
+  <fieldset id="action">
+    <input type="radio" id="action_leave" name="action" value="leave" />
+    <input type="radio" id="action_resolve" name="action" value="resolve" />
+    <input type="radio" id="action_reassign" name="action" value="reassign" />
+  </fieldset>
+</form>
+<div id="footer"><p>Powered by <a href="/about"><strong>Trac 1.2</strong>
+</a></p></div>
+</body></html>
+"""
+
+
+def build_page(comments):
+    return HEADER + "".join(COMMENT.format(i) for i in range(comments)) + \
+        FOOTER
+
+
+def parse_separately(raw_html):
+    """The extraction as done before ``TicketPage``, one scan per value."""
+
+    version = re.findall(r"Trac (\d+)\.(\d+)", raw_html)[0]
+    actions = re.findall(
+            r'<input type="radio" [^<]+name="action" value="([^"]+)',
+            raw_html)
+    status = re.search(
+            r'<span class="trac-status">[\s\n]+<a href="[^"]+">(\w+)</a>',
+            raw_html).group(1)
+    timestamps = {}
+    for token in ("start_time", "view_time"):
+        regex = r"""name="{}"\s*value="([^"]+)""".format(token)
+        timestamps[token] = re.search(regex, raw_html, re.MULTILINE).group(1)
+    message = re.findall(r"<p class=\"message\">([^<]+)</p>", raw_html)
+
+    return version, actions, status, timestamps, message
+
+
+def parse_once(raw_html):
+    page = text.TicketPage(raw_html)
+    return (page.trac_version, page.actions, page.get_status(),
+            page.get_timestamps(), page.message)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", dest="comments", type=int, default=2000,
+                        help="number of comments on the page")
+    parser.add_argument("-r", dest="repeat", type=int, default=20,
+                        help="number of parses per measure")
+    args = parser.parse_args()
+
+    raw_html = build_page(args.comments)
+    print("page: {} comments, {} KiB".format(args.comments,
+                                             len(raw_html) // 1024))
+
+    for name, func in (("separate scans", parse_separately),
+                       ("TicketPage", parse_once)):
+        best = min(timeit.repeat(lambda: func(raw_html), number=args.repeat,
+                                 repeat=5))
+        print("{:<16} {:8.2f} ms/page".format(name,
+                                            best * 1000 / args.repeat))
+
+
+if __name__ == "__main__":
+    main()
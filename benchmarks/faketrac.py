@@ -0,0 +1,600 @@
+#!/usr/bin/env python
+#
+# Copyright (c) 2011-2023 Bertrand Janin <b@janin.com>
+#
+# Permission to use, copy, modify, and/or distribute this software for any
+# purpose with or without fee is hereby granted, provided that the above
+# copyright notice and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+# WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+# ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+# OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+
+"""
+Stand-in for a Trac server, serving the pages used by cartman the way Trac
+0.12, 1.0 or 1.2 renders them: login, ticket (HTML and tab-delimited),
+query, reports, search and timeline. The number of tickets, the size of
+the pages and the latency of the responses are configurable.
+
+usage: python benchmarks/faketrac.py [-v 1.2] [-n tickets] [-p port]
+"""
+
+import re
+import json
+import hashlib
+import time
+import random
+import argparse
+import threading
+
+from email.utils import formatdate
+
+try:
+    from urllib.parse import parse_qs
+except ImportError:
+    from urlparse import parse_qs
+
+try:
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from SocketServer import ThreadingMixIn
+
+from wsgiref.simple_server import make_server, WSGIServer, WSGIRequestHandler
+
+
+VERSIONS = ("0.12", "1.0", "1.2")
+
+COMPONENTS = ("backend", "frontend", "docs", "packaging", "tools")
+MILESTONES = ("1.0", "1.1", "2.0", "someday")
+STATUSES = ("new", "assigned", "accepted", "reopened", "closed")
+TYPES = ("defect", "enhancement", "task")
+PRIORITIES = ("blocker", "critical", "major", "minor", "trivial")
+
+TICKET_COLUMNS = ("id", "summary", "reporter", "owner", "description",
+                  "type", "status", "priority", "milestone", "component",
+                  "version", "resolution", "keywords", "cc", "time",
+                  "changetime")
+
+REPORT_COLUMNS = ("__color__", "ticket", "summary", "component", "version",
+                  "milestone", "type", "owner", "status", "created",
+                  "_changetime", "_description", "_reporter")
+
+REPORTS = (
+    (1, "Active Tickets", lambda t: t["status"] != "closed"),
+    (2, "Closed Tickets", lambda t: t["status"] == "closed"),
+    (3, "All Tickets", lambda t: True),
+)
+
+WORDS = ("lorem ipsum dolor sit amet consectetur adipiscing elit sed do "
+         "eiusmod tempor incididunt ut labore et dolore magna aliqua mouse "
+         "crash login report milestone parser slow").split()
+
+
+def make_text(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def escape(value):
+    return (value.replace("&", "&amp;").replace("<", "&lt;")
+            .replace(">", "&gt;").replace('"', "&quot;"))
+
+
+def parse_id_list(value):
+    """Return the set of ids of a list of ids and ranges (e.g. 1-3,7)."""
+
+    ids = set()
+    for token in value.split(","):
+        start, _, end = token.partition("-")
+        ids.update(range(int(start), int(end or start) + 1))
+    return ids
+
+
+def tsv_value(value):
+    value = u"{}".format(value)
+    if any(c in value for c in "\t\n\r\""):
+        return u'"{}"'.format(value.replace('"', '""'))
+    return value
+
+
+class FakeTrac(object):
+
+    """
+    WSGI application, the tickets are generated from a seed and kept in
+    memory, the changes posted are applied to them.
+    """
+
+    def __init__(self, version="1.2", tickets=500, comments=10,
+                 description_words=60, latency=0.0, seed=0):
+        if version not in VERSIONS:
+            raise ValueError("unknown version: {}".format(version))
+
+        self.version = version
+        self.comments = comments
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.tickets = {}
+
+        rng = random.Random(seed)
+        now = int(time.time())
+        for ticket_id in range(1, tickets + 1):
+            created = now - rng.randint(86400, 86400 * 365)
+            self.tickets[ticket_id] = {
+                "id": ticket_id,
+                "summary": make_text(rng, 6),
+                "reporter": rng.choice(("joe", "bob", "alice")),
+                "owner": rng.choice(("joe", "bob", "alice")),
+                "description": make_text(rng, description_words),
+                "type": rng.choice(TYPES),
+                "status": rng.choice(STATUSES),
+                "priority": rng.choice(PRIORITIES),
+                "milestone": rng.choice(MILESTONES),
+                "component": rng.choice(COMPONENTS),
+                "version": "",
+                "resolution": "",
+                "keywords": "",
+                "cc": "",
+                "time": created,
+                "changetime": created + rng.randint(0, 86400 * 30),
+            }
+
+    @property
+    def is_v1(self):
+        return self.version != "0.12"
+
+    def reset_counter(self):
+        with self.lock:
+            self.requests = 0
+
+    def __call__(self, environ, start_response):
+        with self.lock:
+            self.requests += 1
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        path = environ.get("PATH_INFO", "/")
+        query = parse_qs(environ.get("QUERY_STRING", ""))
+        method = environ["REQUEST_METHOD"]
+
+        if method == "POST":
+            size = int(environ.get("CONTENT_LENGTH") or 0)
+            form = parse_qs(environ["wsgi.input"].read(size).decode("utf-8"))
+        else:
+            form = {}
+
+        response = self.route(method, path, query, form)
+        status, content_type, body = response[:3]
+
+        if not isinstance(body, bytes):
+            body = body.encode("utf-8")
+
+        # The reports support conditional requests, as would a Trac behind
+        # a caching proxy.
+        extra_headers = list(response[3:])
+        if path.startswith("/report/") and status.startswith("200"):
+            etag = '"{}"'.format(hashlib.sha1(body).hexdigest())
+            extra_headers.append(("ETag", etag))
+            if environ.get("HTTP_IF_NONE_MATCH") == etag:
+                status, body = "304 Not Modified", b""
+
+        headers = [
+            ("Content-Type", content_type),
+            ("Content-Length", str(len(body))),
+            ("Set-Cookie", "trac_form_token=f0f0f0f0; Path=/"),
+            ("Set-Cookie", "trac_auth=a1a1a1a1; Path=/"),
+        ]
+
+        # Some responses come with extra headers (e.g. redirections).
+        headers.extend(extra_headers)
+
+        start_response(status, headers)
+        return [body]
+
+    def route(self, method, path, query, form):
+        html = "text/html; charset=utf-8"
+        tsv = "text/tab-separated-values; charset=utf-8"
+        fmt = query.get("format", [None])[0]
+
+        if path == "/login":
+            return "200 OK", html, self.render_page("Login", "")
+
+        m = re.match(r"^/ticket/(\d+)$", path)
+        if m:
+            ticket_id = int(m.group(1))
+            if ticket_id not in self.tickets:
+                return "404 Not Found", html, self.render_page(
+                    "Error", '<p class="message">Ticket {} does not '
+                    'exist.</p>'.format(ticket_id))
+            if method == "POST":
+                self.apply_change(ticket_id, form)
+            if fmt == "tab":
+                return "200 OK", tsv, self.render_tsv(
+                    TICKET_COLUMNS, [self.tickets[ticket_id]])
+            return "200 OK", html, self.render_ticket(ticket_id)
+
+        if path == "/newticket" and method == "POST":
+            # Trac redirects to the page of the ticket once created.
+            ticket_id = self.create_ticket(form)
+            return ("303 See Other", html, "",
+                    ("Location", "/ticket/{}".format(ticket_id)))
+
+        if path == "/query":
+            if fmt == "tab":
+                columns = query.get("col") or ["id", "summary", "status"]
+                tickets = sorted(self.tickets.values(),
+                                 key=lambda t: t["changetime"])
+                ids = query.get("id")
+                if ids:
+                    wanted = parse_id_list(ids[0])
+                    tickets = [t for t in tickets if t["id"] in wanted]
+                tickets = self.paginate(query, tickets)
+                if tickets is None:
+                    return self.render_beyond_last_page(query)
+                return "200 OK", tsv, self.render_tsv(columns, tickets)
+            return "200 OK", html, self.render_query()
+
+        if path == "/report":
+            rows = [{"report": r[0], "title": r[1], "description": ""}
+                    for r in REPORTS]
+            return "200 OK", tsv, self.render_tsv(
+                ("report", "title", "description"), rows)
+
+        m = re.match(r"^/report/(\d+)$", path)
+        if m:
+            for report_id, _, condition in REPORTS:
+                if report_id == int(m.group(1)):
+                    rows = [self.make_report_row(t)
+                            for t in sorted(self.tickets.values(),
+                                            key=lambda t: t["id"])
+                            if condition(t)]
+                    rows = self.paginate(query, rows)
+                    if rows is None:
+                        return self.render_beyond_last_page(query)
+                    return "200 OK", tsv, self.render_tsv(REPORT_COLUMNS,
+                                                          rows)
+            return "404 Not Found", html, self.render_page(
+                "Error", '<p class="message">Report does not exist.</p>')
+
+        if path == "/search":
+            terms = query.get("q", [""])[0].split()
+            return "200 OK", html, self.render_search(terms)
+
+        if path == "/timeline":
+            daysback = int(query.get("daysback", ["30"])[0])
+            # Like Trac, the feed is limited to 50 events unless max= is
+            # given, 0 meaning no limit.
+            limit = int(query.get("max", ["50" if fmt == "rss" else "0"])[0])
+            if fmt == "rss":
+                return ("200 OK", "application/rss+xml; charset=utf-8",
+                        self.render_timeline_rss(daysback, limit))
+            return "200 OK", html, self.render_timeline(daysback, limit)
+
+        return "404 Not Found", html, self.render_page("Not Found", "")
+
+    def create_ticket(self, form):
+        with self.lock:
+            ticket_id = max(self.tickets or [0]) + 1
+            now = int(time.time())
+            self.tickets[ticket_id] = t = {
+                "id": ticket_id,
+                "reporter": "joe",
+                "status": "new",
+                "time": now,
+                "changetime": now,
+            }
+        for name in TICKET_COLUMNS:
+            t.setdefault(name, "")
+        for name, values in form.items():
+            if name.startswith("field_") and name[6:] in t:
+                t[name[6:]] = values[0]
+        t["owner"] = t["owner"] or "joe"
+        return ticket_id
+
+    def apply_change(self, ticket_id, form):
+        t = self.tickets[ticket_id]
+        for name, values in form.items():
+            if name.startswith("field_") and name[6:] in t:
+                t[name[6:]] = values[0]
+        action = form.get("action", ["leave"])[0]
+        if action == "resolve":
+            t["status"] = "closed"
+        elif action == "reopen":
+            t["status"] = "reopened"
+        t["changetime"] = int(time.time())
+
+    def make_report_row(self, t):
+        return {
+            "__color__": PRIORITIES.index(t["priority"]) + 1,
+            "ticket": t["id"],
+            "summary": t["summary"],
+            "component": t["component"],
+            "version": t["version"],
+            "milestone": t["milestone"],
+            "type": t["type"],
+            "owner": t["owner"],
+            "status": t["status"],
+            "created": t["time"],
+            "_changetime": t["changetime"],
+            "_description": t["description"],
+            "_reporter": t["reporter"],
+        }
+
+    def paginate(self, query, rows):
+        """Return the rows of the page requested with max= and page=, all
+        of them by default, None past the last page (an error in Trac)."""
+
+        limit = int(query.get("max", ["0"])[0])
+        page = int(query.get("page", ["1"])[0])
+        if not limit:
+            return rows
+
+        offset = (page - 1) * limit
+        if offset and offset >= len(rows):
+            return None
+        return rows[offset:offset + limit]
+
+    def render_beyond_last_page(self, query):
+        page = self.render_page(
+            "Error", '<p class="message">Page {} is beyond the number of '
+            'pages in the query</p>'.format(query["page"][0]))
+        return "500 Internal Server Error", "text/html; charset=utf-8", page
+
+    def render_tsv(self, columns, rows):
+        lines = [u"\t".join(columns)]
+        for row in rows:
+            lines.append(u"\t".join(tsv_value(row.get(c, ""))
+                                    for c in columns))
+        body = u"\r\n".join(lines) + u"\r\n"
+
+        # Recent versions of Trac start the exports with a BOM.
+        if self.is_v1:
+            body = u"\ufeff" + body
+
+        return body
+
+    def render_page(self, title, content):
+        return (u"""<!DOCTYPE html>
+<html><head><title>{title} - Fake Trac</title></head>
+<body>
+<div id="metanav" class="nav"><ul>
+  <li class="first">logged in as joe</li>
+  <li><a href="/logout">Logout</a></li>
+</ul></div>
+<div id="content">
+{content}
+</div>
+<div id="footer" lang="en" xml:lang="en"><hr/>
+  <p class="left">Powered by <a href="/about"><strong>Trac {version}</strong>
+  </a><br /> By <a href="http://www.edgewall.org/">Edgewall Software</a>.</p>
+</div>
+</body></html>
+""".format(title=escape(title), content=content, version=self.version))
+
+    def render_ticket(self, ticket_id):
+        t = self.tickets[ticket_id]
+
+        if self.is_v1:
+            header = u"""<h2>
+  <a href="/ticket/{id}" class="trac-id">#{id}</a>
+  <span class="trac-status">
+    <a href="/query?status={status}">{status}</a>
+  </span>
+  <span class="trac-type">
+    <a href="/query?status=!closed&amp;type={type}">{type}</a>
+  </span>
+</h2>
+<div id="warning" class="system-message" style="display: none"></div>
+""".format(**t)
+            timestamps = (u'<input type="hidden" name="start_time" '
+                          u'value="{0}000000" />\n'
+                          u'<input type="hidden" name="view_time" '
+                          u'value="{0}000000" />').format(t["changetime"])
+        else:
+            header = u"""<h1 id="trac-ticket-title">
+  <a href="/ticket/{id}">Ticket #{id}</a>
+  <span class="status">({status} {type})</span>
+</h1>
+""".format(**t)
+            timestamps = (u'<input type="hidden" name="ts" value="{}" />'
+                          .format(t["changetime"]))
+
+        changes = []
+        for i in range(1, self.comments + 1):
+            changes.append(u"""<div class="change" id="trac-change-{i}">
+  <h3 class="change">
+    <span class="threading"><span id="comment:{i}" class="cnum">
+      comment:{i}</span></span>
+    Changed <a class="timeline" href="/timeline">{i} days</a> ago by
+    <span class="trac-author">bob</span>
+  </h3>
+  <div class="comment searchable"><p>{text}</p></div>
+</div>""".format(i=i, text=escape(t["description"])))
+
+        actions = ("leave", "resolve", "reassign", "accept")
+        if t["status"] == "closed":
+            actions = ("leave", "reopen")
+        radios = u"\n".join(
+            u'<input type="radio" id="action_{0}" name="action" '
+            u'value="{0}" />'.format(a) for a in actions)
+
+        content = u"""<div id="ticket">
+{header}
+<h2 class="summary searchable">{summary}</h2>
+<div class="description"><div class="searchable"><p>{description}</p>
+</div></div>
+</div>
+<div id="changelog">
+{changes}
+</div>
+<form action="/ticket/{id}" method="post" id="propertyform">
+{timestamps}
+<fieldset id="action">
+{radios}
+</fieldset>
+<input type="submit" name="submit" value="Submit changes" />
+</form>""".format(header=header, summary=escape(t["summary"]),
+                  description=escape(t["description"]),
+                  changes=u"\n".join(changes), id=ticket_id,
+                  timestamps=timestamps, radios=radios)
+
+        return self.render_page(u"#{} ({})".format(ticket_id, t["summary"]),
+                                content)
+
+    def render_query(self):
+        properties = {
+            "component": {"type": "select", "label": "Component",
+                          "options": list(COMPONENTS)},
+            "milestone": {"type": "select", "label": "Milestone",
+                          "options": list(MILESTONES[:-1]),
+                          "optgroups": [{"label": "Closed",
+                                         "options": [MILESTONES[-1]]}]},
+            "priority": {"type": "select", "label": "Priority",
+                         "options": list(PRIORITIES)},
+            "status": {"type": "radio", "label": "Status",
+                       "options": list(STATUSES)},
+            "type": {"type": "select", "label": "Type",
+                     "options": list(TYPES)},
+            "version": {"type": "select", "label": "Version",
+                        "options": ["1.0", "2.0"]},
+            "summary": {"type": "text", "label": "Summary"},
+        }
+        content = (u'<script type="text/javascript">\n'
+                   u'  var properties={};\n'
+                   u'  var modes={{"text": []}};\n'
+                   u'</script>').format(json.dumps(properties))
+        return self.render_page("Custom Query", content)
+
+    def render_search(self, terms):
+        items = []
+        for t in sorted(self.tickets.values(), key=lambda t: -t["id"]):
+            haystack = (t["summary"] + " " + t["description"]).lower()
+            if all(term.lower() in haystack for term in terms):
+                items.append(
+                    u'<dt><a href="/ticket/{id}" class="searchable">'
+                    u'<span class="{status}">#{id}</span>: {type}: '
+                    u'{summary} ({status})</a></dt>\n'
+                    u'<dd class="searchable">{description}</dd>'
+                    .format(summary=escape(t["summary"]),
+                            description=escape(t["description"][:200]),
+                            id=t["id"], status=t["status"], type=t["type"]))
+        content = u'<dl id="results">\n{}\n</dl>'.format(u"\n".join(items))
+        return self.render_page("Search Results", content)
+
+    def get_timeline_tickets(self, daysback, limit):
+        """Return the tickets created in the last days, newest first.
+
+        :param daysback: Number of days covered.
+        :param limit: Maximum number of tickets, 0 for no limit.
+
+        """
+
+        since = time.time() - daysback * 86400
+        tickets = [t for t in sorted(self.tickets.values(),
+                                     key=lambda t: -t["time"])
+                   if t["time"] >= since]
+        if limit:
+            tickets = tickets[:limit]
+        return tickets
+
+    def render_timeline(self, daysback, limit=0):
+        items = []
+        for t in self.get_timeline_tickets(daysback, limit):
+            items.append(
+                u'<dt class="newticket"><a href="/ticket/{id}">'
+                u'<span class="time">{hour}</span> Ticket '
+                u'<em title="{type}: {summary} ({status})">#{id}</em> '
+                u'({summary}) created</a></dt>\n'
+                u'<dd class="newticket">{description}</dd>'
+                .format(hour=time.strftime("%H:%M", time.gmtime(t["time"])),
+                        summary=escape(t["summary"]),
+                        description=escape(t["description"][:200]),
+                        id=t["id"], status=t["status"], type=t["type"]))
+        content = u'<dl>\n{}\n</dl>'.format(u"\n".join(items))
+        return self.render_page("Timeline", content)
+
+    def render_timeline_rss(self, daysback, limit=0):
+        items = []
+        for t in self.get_timeline_tickets(daysback, limit):
+            items.append(
+                u"""<item>
+  <title>Ticket #{id} ({summary}) created</title>
+  <dc:creator>{reporter}</dc:creator>
+  <pubDate>{date}</pubDate>
+  <link>http://localhost/ticket/{id}</link>
+  <guid isPermaLink="false">http://localhost/ticket/{id}/{time}</guid>
+  <description>{description}</description>
+  <category>newticket</category>
+</item>""".format(date=formatdate(t["time"], usegmt=True),
+                  summary=escape(t["summary"]),
+                  description=escape(t["description"][:200]),
+                  **dict((k, t[k]) for k in ("id", "reporter", "time"))))
+        return (u"""<?xml version="1.0"?>
+<rss version="2.0" xmlns:dc="http://purl.org/dc/elements/1.1/">
+<channel>
+<title>Fake Trac</title>
+<link>http://localhost/timeline</link>
+{}
+</channel>
+</rss>
+""".format(u"\n".join(items)))
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+
+    daemon_threads = True
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(trac, host="127.0.0.1", port=0):
+    """Start serving the given ``FakeTrac`` in a thread, returns the server
+    (see ``server_address`` and ``shutdown()``).
+
+    :param trac: ``FakeTrac`` instance.
+    :param host: Address to listen on.
+    :param port: Port to listen on, 0 for any free port.
+
+    """
+    server = make_server(host, port, trac, server_class=ThreadingWSGIServer,
+                         handler_class=QuietRequestHandler)
+    thread = threading.Thread(target=server.serve_forever,
+                              kwargs={"poll_interval": 0.05})
+    thread.daemon = True
+    thread.start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-v", dest="version", default="1.2",
+                        choices=VERSIONS, help="Trac version to imitate")
+    parser.add_argument("-n", dest="tickets", type=int, default=500,
+                        help="number of tickets")
+    parser.add_argument("-c", dest="comments", type=int, default=10,
+                        help="number of comments per ticket page")
+    parser.add_argument("-l", dest="latency", type=float, default=0.0,
+                        help="seconds to wait before each response")
+    parser.add_argument("-p", dest="port", type=int, default=8000,
+                        help="port to listen on")
+    args = parser.parse_args()
+
+    trac = FakeTrac(args.version, args.tickets, args.comments,
+                    latency=args.latency)
+    server = make_server("127.0.0.1", args.port, trac,
+                         server_class=ThreadingWSGIServer)
+    print("fake Trac {} on http://127.0.0.1:{}/".format(args.version,
+                                                       args.port))
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
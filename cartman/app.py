@@ -12,20 +12,18 @@
 # ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
 # OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
 
-import csv
+# Only the modules needed by every command are imported here, the others
+# (e.g. requests, sqlite3, email) are imported by the methods using them to
+# keep the start-up time of ``cm`` low.
 import sys
 import os
-import subprocess
-import tempfile
-import webbrowser
-import email.parser
-import warnings
+import json
+import time
+import threading
+import contextlib
 from collections import OrderedDict
 
-import requests
-from requests.packages.urllib3.exceptions import InsecureRequestWarning
-
-from cartman.compat import configparser
+from cartman.compat import configparser, parse_qsl, string_types, urlencode
 from cartman import exceptions
 from cartman import ticket
 from cartman import ui
@@ -38,18 +36,110 @@ CONFIG_LOCATIONS = [
     "/etc/cartmanrc",
 ]
 
+# Number of concurrent requests for commands working on many tickets.
+DEFAULT_JOBS = 4
+
+# Size of the chunks read from streamed responses.
+CHUNK_SIZE = 64 * 1024
+
+# Environment variables overriding the configuration, the commands are not
+# forwarded to the daemon when they are set.
+ENVIRONMENT_OVERRIDES = ("TRAC_PASSWORD",)
+
+# Default number of seconds to wait for the connection to Trac and then for
+# its response, and number of retries of the failed requests.
+DEFAULT_CONNECT_TIMEOUT = 10.0
+DEFAULT_READ_TIMEOUT = 60.0
+DEFAULT_RETRIES = 2
+
+# Delay before the first retry, doubled on each of the following ones.
+BACKOFF_BASE = 0.5
+
+# Responses to GET requests worth a retry, typically a busy server.
+RETRY_STATUS_CODES = (502, 503, 504)
+
+# Fields of the JSON records of ``new --batch`` named differently in the
+# ticket templates, the description is the body of the ticket.
+BATCH_FIELDS = {
+    "summary": "Subject",
+    "owner": "To",
+}
+
+# Number of rows requested per page by ``export``, the unit of its
+# checkpoints.
+EXPORT_PAGE_SIZE = 1000
+
+# Delay between two polls of ``timeline --follow`` and ``watch``, doubled
+# after each poll without any change, up to the maximum.
+FOLLOW_DELAY = 15
+FOLLOW_MAX_DELAY = 300
+
+# Columns always requested when synchronizing the local mirror, in addition
+# to all the fields listed in the system's properties.
+SYNC_COLUMNS = (
+    "id",
+    "summary",
+    "reporter",
+    "owner",
+    "type",
+    "status",
+    "priority",
+    "milestone",
+    "component",
+    "version",
+    "resolution",
+    "keywords",
+    "cc",
+    "time",
+    "changetime",
+    "description",
+)
+
 MIN_TRAC_VERSION = (0, 11)
 MAX_TRAC_VERSION = (1, 2)
 
-# List of all our accepted authentication types.  The values are authentication
-# classes used by the requests module.
+# List of all our accepted authentication types.  The values are the names of
+# authentication classes in the requests.auth module.
 AUTH_TYPES = {
-    "basic": requests.auth.HTTPBasicAuth,
-    "digest": requests.auth.HTTPDigestAuth,
+    "basic": "HTTPBasicAuth",
+    "digest": "HTTPDigestAuth",
     "acctmgr": None,
     "none": None,
 }
 
+# Backends used to read and change the tickets, the values are the names of
+# the classes in the cartman.backends module.
+BACKENDS = {
+    "http": "HttpBackend",
+    "xmlrpc": "XmlRpcBackend",
+    "db": "DbBackend",
+}
+
+# Formats of the output of the commands listing tickets or items (see
+# ``--format``), text is for humans, the others one record per line.
+OUTPUT_FORMATS = ("text", "jsonl", "tsv")
+
+# Commands exposed to the command-line, each implemented by a run_ method,
+# with what they need to run: "session" for access to Trac, "config" for the
+# site configuration only, None for nothing at all.
+COMMANDS = {
+    "change": "session",
+    "comment": "session",
+    "export": "session",
+    "help": None,
+    "new": "session",
+    "open": "config",
+    "properties": "session",
+    "report": "session",
+    "reports": "session",
+    "search": "session",
+    "status": "session",
+    "sync": "session",
+    "timeline": "session",
+    "view": "session",
+    "watch": "session",
+}
+
 DEFAULT_TEMPLATE = """To:
 Cc:
 Milestone:
@@ -63,6 +153,104 @@ Subject:
 """
 
 
+def get_sites():
+    """Return the names of the configured sites, the sections of the
+    configuration files with a base_url."""
+
+    cp = configparser.SafeConfigParser()
+    cp.read(CONFIG_LOCATIONS)
+
+    return [site for site in cp.sections()
+            if cp.has_option(site, "base_url")]
+
+
+def get_backoff(attempt):
+    """Return the number of seconds to wait before a retry: a random value
+    up to an exponentially increasing bound ("full jitter"), to avoid many
+    clients retrying in lockstep.
+
+    :param attempt: Number of retries already made.
+
+    """
+    import random
+
+    return random.uniform(0, BACKOFF_BASE * (2 ** attempt))
+
+
+def is_connect_error(ex):
+    """Returns True if a request failed before reaching the server, it is
+    then safe to send it again whatever its method.
+
+    :param ex: Exception raised by requests.
+
+    """
+    import requests
+    import urllib3
+
+    if isinstance(ex, requests.exceptions.ConnectTimeout):
+        return True
+
+    if not isinstance(ex, requests.exceptions.ConnectionError):
+        return False
+
+    reason = getattr(ex.args[0], "reason", None) if ex.args else None
+    return isinstance(reason, urllib3.exceptions.NewConnectionError)
+
+
+def diff_rows(old, new):
+    """Return the changes between two snapshots of a report, as a list of
+    dictionaries with the type of ``change`` (added, removed or changed),
+    the ``id`` of the ticket and its ``fields``: all of them for an added
+    or removed ticket, the ``[old, new]`` values of the fields changed
+    otherwise.
+
+    :param old: Dictionary of rows by ticket id, the previous snapshot.
+    :param new: Dictionary of rows by ticket id, each row a dictionary.
+
+    """
+    changes = []
+
+    for ticket_id, row in new.items():
+        old_row = old.get(ticket_id)
+        if old_row is None:
+            changes.append(OrderedDict([("change", "added"),
+                                        ("id", ticket_id),
+                                        ("fields", row)]))
+        elif old_row != row:
+            fields = OrderedDict()
+            for name, value in row.items():
+                if old_row.get(name) != value:
+                    fields[name] = [old_row.get(name), value]
+            for name, value in old_row.items():
+                if name not in row:
+                    fields[name] = [value, None]
+            changes.append(OrderedDict([("change", "changed"),
+                                        ("id", ticket_id),
+                                        ("fields", fields)]))
+
+    for ticket_id, row in old.items():
+        if ticket_id not in new:
+            changes.append(OrderedDict([("change", "removed"),
+                                        ("id", ticket_id),
+                                        ("fields", row)]))
+
+    return changes
+
+
+def format_change(change):
+    """Return the line of text describing a change of ``diff_rows()``."""
+
+    fields = change["fields"]
+
+    if change["change"] == "changed":
+        return u"~ #{} {}".format(change["id"], u", ".join(
+            u"{}: {} -> {}".format(name, old, new)
+            for name, (old, new) in fields.items()))
+
+    sign = "+" if change["change"] == "added" else "-"
+    return u"{} #{} {}".format(sign, change["id"], fields.get("summary", ""))
+
+
 class CartmanApp(object):
 
     """
@@ -73,14 +261,39 @@ class CartmanApp(object):
     def __init__(self):
         self.site = "trac"
         self.logged_in = False
-        self.browser = webbrowser
+        self.session_restored = False
+        self.properties_cached = False
+        self.login_lock = threading.Lock()
+        self.jobs = DEFAULT_JOBS
+        self.configured = False
+        self.session = None
+        self.backend_type = "http"
+        self.backend = None
+        self.database = None
+        self.use_cache = True
+        self.cache = None
+        self.connect_timeout = DEFAULT_CONNECT_TIMEOUT
+        self.read_timeout = DEFAULT_READ_TIMEOUT
+        self.retries = DEFAULT_RETRIES
+        self.hedge_after = 0
+        self.hooks = []
+        self.fuzzy_indexes = {}
+        self.output_format = "text"
+        self.since = False
+        self.follow = False
+        self.batch = None
+        self.out = None
+        self.properties = None
+        self.browser = None
         self.trac_version = (0, 0)
 
     def run(self, args):
         """Main function call.
 
         Converts the options and arguments into a function call within this
-        instance.
+        instance. The configuration is read and the HTTP session is created on
+        the first command needing them, an instance kept alive (e.g. by the
+        daemon) reuses them for all the following commands.
 
         :param options: Options returned from the optparse module.
         :param args: Arguments returned from the optparse module.
@@ -92,37 +305,181 @@ class CartmanApp(object):
         self.message = args.message
         self.template = args.template
         self.message_file = args.message_file
+        self.refresh = args.refresh
+        self.jobs = args.jobs or DEFAULT_JOBS
+        self.offline = args.offline
+        self.use_cache = not args.no_cache
+        self.output_format = args.format
+        self.since = args.since
+        self.follow = args.follow
+        self.batch = args.batch
+        self.out = args.out
+
+        if args.command not in COMMANDS:
+            raise exceptions.UnknownCommand("unknown command: " + args.command)
 
-        self.ensure_directories()
-        self.read_config()
-        self.session = requests.session()
+        func_name = "run_" + args.command
+        func = getattr(self, func_name)
 
-        auth_class = AUTH_TYPES[self.auth_type]
-        if auth_class:
-            self.session.auth = auth_class(self.username, self.password)
-        self.session.verify = self.verify_ssl_cert
+        # Commands reading from the local mirror have no use for a session.
+        needs = COMMANDS[args.command]
+        if needs == "session" and self.offline:
+            needs = "config"
 
-        func_name = "run_" + args.command
-        func = getattr(self, "run_" + args.command, None)
-        if not func:
-            raise exceptions.UnknownCommand("unknown command: " + args.command)
+        if needs and not self.configured:
+            self.ensure_directories()
+            self.read_config()
+            self.configured = True
+
+        if needs == "session" and self.session is None:
+            self.create_session()
+            self.create_backend()
 
         if "help" in args.parameters:
             self.print_function_help(func_name)
             return
 
+        tracer = None
+        if args.trace or args.trace_file:
+            from cartman import trace
+            tracer = trace.Tracer(args.command, args.trace, args.trace_file)
+            self.hooks.append(tracer)
+
+        try:
+            self.call_command(func, func_name, args.parameters)
+        finally:
+            if tracer:
+                self.hooks.remove(tracer)
+                tracer.finish()
+
+    def call_command(self, func, func_name, parameters):
+        """Call the method of a command and print its output.
+
+        :param func: ``run_`` method of the command.
+        :param func_name: Name of the method, for the help.
+        :param parameters: Parameters of the command.
+
+        """
         try:
-            output = func(*args.parameters)
+            output = func(*parameters)
         except exceptions.InvalidParameter as ex:
             print("error: {}\n".format(ex))
             self.print_function_help(func_name)
             return
+        except exceptions.BatchError as ex:
+            self.save_session()
+            self.print_output(ex.output)
+            raise
 
+        self.save_session()
         self.print_output(output)
 
+    def emit(self, event, **data):
+        """Call the hooks with an event, e.g. for ``--trace``.
+
+        The events are ``request_start`` and ``request_end`` (with the
+        ``method``, ``url``, ``status``, ``bytes`` received and ``elapsed``
+        seconds), ``stream_end`` once a streamed response is consumed (with
+        its ``bytes`` and ``elapsed`` seconds), and ``phase_start`` and
+        ``phase_end`` (see ``trace_phase()``).
+
+        :param event: Name of the event.
+        :param data: Values describing the event.
+
+        """
+        for hook in self.hooks:
+            hook(event, data)
+
+    @contextlib.contextmanager
+    def trace_phase(self, phase, **data):
+        """Emit the ``phase_start`` and ``phase_end`` events around a block,
+        e.g. ``login``, ``version_check``, ``parse`` or ``editor``.
+
+        :param phase: Name of the phase.
+        :param data: Values describing the phase.
+
+        """
+        if not self.hooks:
+            yield
+            return
+
+        self.emit("phase_start", phase=phase, **data)
+        started = time.time()
+        try:
+            yield
+        finally:
+            self.emit("phase_end", phase=phase,
+                      elapsed=time.time() - started, **data)
+
+    def create_session(self):
+        """Create the HTTP session, with the authentication settings."""
+
+        import requests
+
+        self.session = requests.session()
+
+        # Allow as many connections to be kept alive as concurrent requests.
+        adapter = requests.adapters.HTTPAdapter(
+            pool_maxsize=max(self.jobs, 10))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        auth_class_name = AUTH_TYPES[self.auth_type]
+        if auth_class_name:
+            auth_class = getattr(requests.auth, auth_class_name)
+            self.session.auth = auth_class(self.username, self.password)
+        self.session.verify = self.verify_ssl_cert
+        self.restore_session()
+
+    def create_backend(self):
+        """Create the backend reading and changing the tickets."""
+
+        from cartman import backends
+
+        backend_class = getattr(backends, BACKENDS[self.backend_type])
+        self.backend = backend_class(self)
+
+    def warn(self, message):
+        """Print a warning on stderr, keeping it out of the output.
+
+        :param message: Text of the warning, or an exception.
+
+        """
+        sys.stderr.write("warning: {}\n".format(message))
+
     def print_output(self, output):
-        if output:
-            print("\n".join(output))
+        """Print each line of output as soon as it is produced.
+
+        :param output: Iterable of lines, typically a list or a generator.
+
+        """
+        if not output:
+            return
+
+        for line in output:
+            print(line)
+
+    def format_items(self, items, format_text, as_dict=None):
+        """Return the lines of output of a list of items in the output format
+        (see ``--format``), produced as the items are.
+
+        :param items: Iterable of items, e.g. tickets or dictionaries.
+        :param format_text: Function returning the line of an item for the
+                            text format.
+        :param as_dict: Function returning the fields of an item for the
+                        other formats, the items are dictionaries if None.
+
+        """
+        if self.output_format == "text":
+            return (format_text(item) for item in items)
+
+        if as_dict is not None:
+            items = (as_dict(item) for item in items)
+
+        if self.output_format == "tsv":
+            return ui.iter_tsv(items)
+
+        return ui.iter_jsonl(items)
 
     def ensure_directories(self):
         """Creates a ~/.cartman/ if none exist."""
@@ -134,6 +491,84 @@ class CartmanApp(object):
 
         os.mkdir(expanded_directory, 0o750)
 
+    def get_site_path(self, filename):
+        """Return the path to a file holding state for the current site,
+        creating the per-site directory (~/.cartman/sites/<site>/) if needed.
+
+        :param filename: Name of the file within the site directory.
+
+        """
+        directory = os.path.join(os.path.expanduser(BASE_DIRECTORY), "sites",
+                                 self.site)
+
+        if not os.path.exists(directory):
+            os.makedirs(directory, 0o700)
+
+        return os.path.join(directory, filename)
+
+    def restore_session(self):
+        """Load the cookies saved by a previous run, if any.
+
+        When an authentication cookie is restored, the session is considered
+        logged-in and the ``/login`` round trip is skipped. If the server
+        rejects it, ``get()`` logs in again transparently.
+
+        """
+        from cartman import session
+
+        if not self.session_lifetime or self.logged_in:
+            return
+
+        path = self.get_site_path("cookies")
+        if session.load(self.session.cookies, path, self.session_lifetime):
+            self.logged_in = True
+            self.session_restored = True
+
+    def save_session(self):
+        """Store the current cookies for the next runs, if authenticated."""
+
+        from cartman import session
+
+        if self.session is None or not self.session_lifetime:
+            return
+
+        if session.has_auth_cookie(self.session.cookies):
+            session.save(self.session.cookies, self.get_site_path("cookies"))
+
+    def is_session_rejected(self, r, stream=False):
+        """Returns True if a restored session was refused by the server,
+        either explicitly, by expiring the authentication cookie or by
+        rendering the page for an anonymous user.
+
+        :param r: Response from the server.
+        :param stream: The body of the response is streamed and should not be
+                       read, only the status code and headers are checked.
+
+        """
+        from cartman import session
+
+        if not self.session_restored:
+            return False
+
+        if r.status_code in (401, 403) or session.is_auth_expired(r):
+            return True
+
+        if stream:
+            return False
+
+        return text.is_logged_out(r.text)
+
+    def relogin(self):
+        """Drop the current (stale) session and log in again."""
+
+        from cartman import session
+
+        self.session_restored = False
+        self.logged_in = False
+        self.session.cookies.clear()
+        session.clear(self.get_site_path("cookies"))
+        self.login()
+
     def read_config(self):
         """Populate the instance with settings for the config file.
 
@@ -143,6 +578,14 @@ class CartmanApp(object):
         defaults = {
             "auth_type": "basic",
             "verify_ssl_cert": "true",
+            "session_lifetime": "86400",
+            "properties_ttl": "3600",
+            "backend": "http",
+            "cache_size": "50",
+            "connect_timeout": str(DEFAULT_CONNECT_TIMEOUT),
+            "read_timeout": str(DEFAULT_READ_TIMEOUT),
+            "retries": str(DEFAULT_RETRIES),
+            "hedge_after": "0",
         }
 
         cp = configparser.SafeConfigParser(defaults)
@@ -154,11 +597,19 @@ class CartmanApp(object):
 
         self.base_url = cp.get(self.site, "base_url").rstrip("/")
         self.verify_ssl_cert = cp.getboolean(self.site, "verify_ssl_cert")
+        self.session_lifetime = cp.getint(self.site, "session_lifetime")
+        self.properties_ttl = cp.getint(self.site, "properties_ttl")
+        self.cache_size = cp.getint(self.site, "cache_size")
+        self.connect_timeout = cp.getfloat(self.site, "connect_timeout")
+        self.read_timeout = cp.getfloat(self.site, "read_timeout")
+        self.retries = cp.getint(self.site, "retries")
+        self.hedge_after = cp.getfloat(self.site, "hedge_after")
 
         # If you've decided not to verify your SSL certificate, you're on your
         # own, there is no need to add more warnings.
         if not self.verify_ssl_cert:
-            requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
+            import urllib3
+            urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
         # load auth
         auth_type = cp.get(self.site, "auth_type")
@@ -170,6 +621,19 @@ class CartmanApp(object):
             raise exceptions.ConfigError(msg)
         self.auth_type = auth_type
 
+        backend_type = cp.get(self.site, "backend").lower()
+        if backend_type not in BACKENDS:
+            msg = ("invalid backend setting '{}', supported: {}"
+                   .format(backend_type, ", ".join(sorted(BACKENDS))))
+            raise exceptions.ConfigError(msg)
+        self.backend_type = backend_type
+
+        if cp.has_option(self.site, "database"):
+            self.database = cp.get(self.site, "database")
+        elif backend_type == "db":
+            raise exceptions.ConfigError("the db backend requires a database "
+                                         "setting")
+
         # On anonymous Trac systems, you may still specify a username, but you
         # you are able to do some operations as anonymous.  For all other
         # authentication types, username and password are mandatory.
@@ -205,24 +669,262 @@ class CartmanApp(object):
 
         return ""
 
-    def get_properties(self):
+    def get_cache(self):
+        """Return the cache of the HTTP responses for the current site, None
+        if disabled (``cache_size`` of 0 or ``--no-cache``)."""
+
+        if not self.use_cache or not self.cache_size:
+            return None
+
+        if self.cache is None:
+            from cartman import cache
+            self.cache = cache.ResponseCache(self.get_site_path("cache"),
+                                             self.cache_size * 1024 * 1024)
+
+        return self.cache
+
+    def get_properties(self, refresh=False):
         """Return the values used in drop-downs on the create ticket page.
 
         The lists such as Milestones and Versions are extracted from a
-        JavaScript dictionary exposed on the query page.
+        JavaScript dictionary exposed on the query page. They are cached on
+        disk for ``properties_ttl`` seconds, ``self.properties_cached`` tells
+        whether the returned values came from that cache.
+
+        :param refresh: Ignore the cache and fetch the values from Trac.
 
         """
-        # NOTE: lack of "order" parameter disables "max" request too
-        r = self.get("/query?max=1&order=priority")
-        return text.extract_properties(r.text)
+        path = self.get_site_path("properties.json")
+
+        if not refresh and self.properties_ttl:
+            # Long-running instances keep them in memory as well.
+            if self.properties:
+                loaded_at, properties = self.properties
+                if time.time() - loaded_at < self.properties_ttl:
+                    self.properties_cached = True
+                    return properties
+
+            if os.path.exists(path):
+                loaded_at = os.path.getmtime(path)
+                if time.time() - loaded_at < self.properties_ttl:
+                    with open(path) as fp:
+                        properties = json.load(fp)
+                    self.properties = (loaded_at, properties)
+                    self.properties_cached = True
+                    return properties
+
+        properties = self.backend.get_properties()
+        self.properties_cached = False
+
+        if self.properties_ttl and properties:
+            temp_path = path + ".tmp"
+            with open(temp_path, "w") as fp:
+                json.dump(properties, fp)
+            os.rename(temp_path, path)
+            self.properties = (time.time(), properties)
+
+        return properties
+
+    def load_timeline_cursor(self):
+        """Return the position in the timeline reached by the previous
+        ``timeline --since`` or ``--follow``, None on the first run.
+
+        The cursor is the time of the newest event seen and the ids of the
+        events at that time, the following events may share it.
+
+        """
+        path = self.get_site_path("timeline_cursor.json")
+
+        try:
+            with open(path) as fp:
+                return json.load(fp)
+        except (IOError, ValueError):
+            return None
+
+    def save_timeline_cursor(self, cursor):
+        path = self.get_site_path("timeline_cursor.json")
+        temp_path = path + ".tmp"
+        with open(temp_path, "w") as fp:
+            json.dump(cursor, fp)
+        os.rename(temp_path, path)
+
+    def get_new_timeline_events(self, cursor, daysback=None):
+        """Return the events of the timeline after the cursor, oldest first,
+        and the new cursor.
+
+        :param cursor: Cursor returned by ``load_timeline_cursor()``, or
+                       None for the events of the last ``daysback`` days.
+        :param daysback: Number of days to go back without cursor.
+
+        """
+        if cursor:
+            since = cursor["time"]
+            seen = set(cursor["ids"])
+        else:
+            from cartman import backends
+            days = int(daysback or backends.DEFAULT_DAYSBACK)
+            since = time.time() - days * 86400
+            seen = set()
 
-    def get_property_options(self):
-        """Return all the property options, with option groups expanded."""
+        events = [e for e in self.backend.get_timeline_events(since)
+                  if e["time"] > since or
+                  (e["time"] == since and e["id"] not in seen)]
+
+        if not events:
+            return events, cursor
+
+        newest = events[-1]["time"]
+        ids = [e["id"] for e in events if e["time"] == newest]
+        if cursor and cursor["time"] == newest:
+            ids.extend(cursor["ids"])
+
+        return events, {"time": newest, "ids": ids}
+
+    def iter_timeline_events(self, daysback=None):
+        """Yield the events of the timeline not seen by the previous run,
+        then the new ones as they appear with ``--follow``. The cursor is
+        saved once the events are consumed.
+
+        :param daysback: Number of days to go back on the first run.
+
+        """
+        import requests
+
+        cursor = self.load_timeline_cursor()
+        delay = FOLLOW_DELAY
+
+        while True:
+            try:
+                events, new_cursor = self.get_new_timeline_events(cursor,
+                                                                  daysback)
+            except (requests.RequestException,
+                    exceptions.FatalError) as ex:
+                if not self.follow:
+                    raise
+                self.warn(ex)
+                events, new_cursor = [], cursor
+
+            for event in events:
+                yield event
+
+            if new_cursor != cursor:
+                self.save_timeline_cursor(new_cursor)
+                cursor = new_cursor
+
+            if not self.follow:
+                return
+
+            # Poll less often while nothing happens.
+            if events:
+                delay = FOLLOW_DELAY
+            else:
+                delay = min(delay * 2, FOLLOW_MAX_DELAY)
+
+            sys.stdout.flush()
+            try:
+                time.sleep(delay)
+            except KeyboardInterrupt:
+                return
+
+    def get_report_snapshot(self, report_id, validators):
+        """Return the rows of a report by ticket id and the validators of
+        the response, or None if the report did not change since the
+        response of the given validators.
+
+        :param report_id: id of the report.
+        :param validators: Headers making the request conditional, from the
+                           previous snapshot.
+
+        """
+        query_string = "/report/{}?format=tab".format(report_id)
+        r = self.get(query_string, stream=True, headers=validators)
+
+        if r.status_code == 304:
+            r.close()
+            return None, validators
+
+        validators = {}
+        if r.headers.get("ETag"):
+            validators["If-None-Match"] = r.headers["ETag"]
+        if r.headers.get("Last-Modified"):
+            validators["If-Modified-Since"] = r.headers["Last-Modified"]
+
+        rows = self.iter_rows(r, query_string)
+        header = next(rows, None) or []
+
+        for key in ("ticket", "id"):
+            if key in header:
+                break
+        else:
+            raise exceptions.FatalError("report {} has no ticket or id "
+                                        "column".format(report_id))
+
+        snapshot = OrderedDict()
+        for row in rows:
+            row = OrderedDict(zip(header, row))
+            ticket_id = row[key]
+            if ticket_id.isdigit():
+                ticket_id = int(ticket_id)
+            snapshot[ticket_id] = row
+
+        return snapshot, validators
+
+    def iter_report_changes(self, report_id):
+        """Yield the changes of a report (see ``diff_rows()``) as they are
+        found, polling it until interrupted. All the tickets of the report
+        are added by the first poll.
+
+        :param report_id: id of the report.
+
+        """
+        import requests
+
+        snapshot = OrderedDict()
+        validators = {}
+        delay = FOLLOW_DELAY
+
+        while True:
+            try:
+                new_snapshot, validators = self.get_report_snapshot(
+                    report_id, validators)
+            except (requests.RequestException,
+                    exceptions.FatalError) as ex:
+                self.warn(ex)
+                new_snapshot = None
+
+            changes = []
+            if new_snapshot is not None:
+                changes = diff_rows(snapshot, new_snapshot)
+                snapshot = new_snapshot
+
+            for change in changes:
+                yield change
+
+            # Poll less often while nothing changes.
+            if changes:
+                delay = FOLLOW_DELAY
+            else:
+                delay = min(delay * 2, FOLLOW_MAX_DELAY)
+
+            sys.stdout.flush()
+            try:
+                time.sleep(delay)
+            except KeyboardInterrupt:
+                return
+
+    def get_property_options(self, refresh=False):
+        """Return all the property options, with option groups expanded.
+
+        :param refresh: Ignore the cache and fetch the values from Trac.
+
+        """
         options = {}
-        for name, prop in self.get_properties().items():
+        for name, prop in self.get_properties(refresh).items():
             if "options" not in prop:
                 continue
-            options[name] = prop["options"]
+            # Copied, the properties may be kept in memory (see
+            # ``properties_ttl``).
+            options[name] = list(prop["options"])
             if "optgroups" in prop:
                 for optgroup in prop["optgroups"]:
                     options[name] += optgroup["options"]
@@ -235,15 +937,25 @@ class CartmanApp(object):
         if self.trac_version != (0, 0):
             return
 
-        trac_version = text.extract_trac_version(raw_html)
+        with self.trace_phase("version_check"):
+            trac_version = text.extract_trac_version(raw_html)
+
+        self.set_trac_version(trac_version)
 
+    def set_trac_version(self, trac_version):
+        """Keep the version of Trac found on a page, print a warning if it is
+        unsupported.
+
+        :param trac_version: Tuple (major, minor), empty if not found.
+
+        """
         # We can't extract anything from this query.
         if not trac_version:
             return
 
         if trac_version < MIN_TRAC_VERSION or trac_version > MAX_TRAC_VERSION:
             version = ".".join([str(tok) for tok in trac_version])
-            print("WARNING: Untested Trac version ({})".format(version))
+            self.warn("untested Trac version ({})".format(version))
 
         self.trac_version = trac_version
 
@@ -256,14 +968,134 @@ class CartmanApp(object):
                                         "environment variable or editor "
                                         "configuration item)")
 
-        if subprocess.call([self.config_editor, filename]) != 0:
+        import subprocess
+
+        with self.trace_phase("editor"):
+            status = subprocess.call([self.config_editor, filename])
+
+        if status != 0:
             raise exceptions.FatalError("there was a problem running the "
                                         "editor")
 
     def input(self, prompt):
         return raw_input(prompt)
 
-    def get(self, query_string, data=None, handle_errors=True):
+    def send(self, method, url, **kwargs):
+        """Send a request on the session, with the configured timeouts.
+
+        GET requests are retried on connection errors, timeouts and busy
+        servers (502, 503, 504), with an exponential backoff. They are hedged
+        if ``hedge_after`` is set: a second identical request is sent if the
+        first one takes longer, the first response received wins. Other
+        requests (e.g. POST) are only retried if the connection could not be
+        established, since they could have been processed by Trac.
+
+        :param method: HTTP method, ``GET`` or ``POST``.
+        :param url: Full URL of the request.
+        :param kwargs: Passed to the ``get()``/``post()`` of the session.
+
+        """
+        import requests
+
+        kwargs["timeout"] = (self.connect_timeout, self.read_timeout)
+        idempotent = method == "GET"
+
+        attempt = 0
+        while True:
+            if self.hooks:
+                self.emit("request_start", method=method, url=url,
+                          attempt=attempt)
+                started = time.time()
+            try:
+                if idempotent and self.hedge_after:
+                    r = self.send_hedged(url, kwargs)
+                else:
+                    r = getattr(self.session, method.lower())(url, **kwargs)
+            except requests.exceptions.RequestException as ex:
+                if self.hooks:
+                    self.emit("request_end", method=method, url=url,
+                              attempt=attempt, status=None, bytes=0,
+                              elapsed=time.time() - started, error=str(ex))
+                if attempt >= self.retries:
+                    raise
+                if not idempotent and not is_connect_error(ex):
+                    raise
+            else:
+                if self.hooks:
+                    # The body of a streamed response is not downloaded yet.
+                    if kwargs.get("stream"):
+                        size = None
+                    else:
+                        size = len(r.content)
+                    self.emit("request_end", method=method, url=url,
+                              attempt=attempt, status=r.status_code,
+                              bytes=size, elapsed=time.time() - started)
+                if (not idempotent or attempt >= self.retries or
+                        r.status_code not in RETRY_STATUS_CODES):
+                    return r
+                r.close()
+
+            time.sleep(get_backoff(attempt))
+            attempt += 1
+
+    def send_hedged(self, url, kwargs):
+        """Send a GET request, and the same request again if there is no
+        response after ``hedge_after`` seconds. Returns the first response
+        received, the other one is closed when it arrives.
+
+        :param url: Full URL of the request.
+        :param kwargs: Passed to the ``get()`` of the session.
+
+        """
+        try:
+            import queue
+        except ImportError:
+            import Queue as queue
+
+        results = queue.Queue()
+
+        def fetch():
+            try:
+                results.put((self.session.get(url, **kwargs), None))
+            except Exception as ex:
+                results.put((None, ex))
+
+        def start():
+            thread = threading.Thread(target=fetch)
+            thread.daemon = True
+            thread.start()
+
+        start()
+        try:
+            r, error = results.get(timeout=self.hedge_after)
+            pending = 0
+        except queue.Empty:
+            start()
+            r, error = results.get()
+            pending = 1
+
+        # The first request failed, the hedged one might still succeed.
+        if error is not None and pending:
+            r, error = results.get()
+            pending = 0
+
+        if pending:
+            def close_late_response():
+                late, _ = results.get()
+                if late is not None:
+                    late.close()
+
+            thread = threading.Thread(target=close_late_response)
+            thread.daemon = True
+            thread.start()
+
+        if error is not None:
+            raise error
+
+        return r
+
+    def get(self, query_string, data=None, handle_errors=True, stream=False,
+            headers=None, detect_version=True):
         """Generates a GET query on the target Trac system.
 
         TODO: extract all the possible error elements as message.
@@ -274,10 +1106,42 @@ class CartmanApp(object):
                      ``query_string``.
         :param handle_errors: Crash with a proper exception according to the
                               HTTP return code (default: True).
+        :param stream: Do not download the body of a successful response
+                       immediately, it is left for the caller to consume
+                       (e.g. with ``iter_content()``).
+        :param headers: Dictionary of additional headers (e.g. validators of
+                        a conditional request).
+        :param detect_version: Look for the version of Trac in the page, if
+                               not known yet (disabled when the caller parses
+                               it anyway).
 
         """
-
-        r = self.session.get(self.base_url + query_string, data=data)
+        url = self.base_url + query_string
+
+        # Revalidate the cached response instead of downloading it again.
+        cache = self.get_cache() if data is None else None
+        cached = cache.get(url) if cache else None
+        headers = dict(headers or {})
+        if cached:
+            headers.update(cached.get_validators())
+
+        r = self.send("GET", url, data=data, stream=stream, headers=headers)
+
+        # The session restored from disk might have expired on the server,
+        # log in again and retry once.
+        if self.is_session_rejected(r, stream):
+            r.close()
+            with self.login_lock:
+                if self.session_restored:
+                    self.relogin()
+            r = self.send("GET", url, data=data, stream=stream,
+                          headers=headers)
+
+        if cached and r.status_code == 304:
+            r.close()
+            r = cached.make_response()
+        elif cache and r.status_code == 200:
+            cache.store(url, r, stream)
 
         if r.status_code >= 400 and handle_errors:
             message = text.extract_message(r.text)
@@ -285,12 +1149,15 @@ class CartmanApp(object):
                 message = "{} returned {}".format(self.base_url, r)
             raise exceptions.FatalError(message)
 
-        # Check the version if we can.
-        self.check_version(r.text)
+        # Check the version if we can, streamed responses are typically not
+        # HTML pages anyway. Once known, avoid decoding the body for nothing.
+        if detect_version and not stream and self.trac_version == (0, 0):
+            self.check_version(r.text)
 
         return r
 
-    def post(self, query_string, data=None, handle_errors=True):
+    def post(self, query_string, data=None, handle_errors=True,
+             allow_redirects=True):
         """Generates a POST query on the target Trac system.
 
         This also alters the given data to include the form token stored on the
@@ -302,12 +1169,15 @@ class CartmanApp(object):
                      target page.
         :param handle_errors: Crash with a proper exception according to the
                               HTTP return code (default: True).
+        :param allow_redirects: Follow the redirection of the response, if
+                                any (default: True).
 
         """
         if data:
             data["__FORM_TOKEN"] = self.get_form_token()
 
-        r = self.session.post(self.base_url + query_string, data=data)
+        r = self.send("POST", self.base_url + query_string, data=data,
+                      allow_redirects=allow_redirects)
 
         if r.status_code >= 400 and handle_errors:
             message = text.extract_message(r.text)
@@ -320,61 +1190,242 @@ class CartmanApp(object):
     def login(self):
         """Ensure the current session is logged-in, accessing the main page.
 
-        This will allow Trac to generate the cookies that will be stored on our
-        ``self.session`` object.
+        This will allow Trac to generate the cookies that will be stored on our
+        ``self.session`` object.
+
+        """
+        if self.logged_in:
+            return
+
+        with self.trace_phase("login"):
+            # Seems that depending on the method used to serve trac, we need
+            # to use a different path to initiate authentication.
+            r = self.get("/login", handle_errors=False)
+
+            if self.auth_type == "acctmgr":
+                r = self.post("/login", {
+                    "user": self.username,
+                    "password": self.password,
+                })
+
+        if r.status_code not in (200, 302):
+            msg = ("login failed on {} (bad user, password or auth type)"
+                   .format(r.request.url))
+            raise exceptions.LoginError(msg)
+
+        self.logged_in = True
+        self.save_session()
+
+    def get_rows(self, query_string):
+        """Wrapper around ``get()`` that yields lists of values, starting with
+        the header.
+
+        This methods assumes the response contains tab-delimited data, it is
+        parsed as it is downloaded.
+
+        :param query_string: Starts with a slash, part of the URL between the
+                             domain and the parameters (before the ?).
+
+        """
+        r = self.get(query_string, stream=True)
+        for row in self.iter_rows(r, query_string):
+            yield row
+
+    def iter_rows(self, r, query_string):
+        """Yield the lists of values of a streamed response holding
+        tab-delimited data, starting with the header, see ``get_rows()``.
+
+        :param r: Response returned by ``get()`` with ``stream``.
+        :param query_string: Part of the URL of the request, for the hooks.
+
+        """
+        import csv
+
+        started = time.time()
+
+        if r.encoding is None:
+            r.encoding = "utf-8"
+
+        try:
+            chunks = r.iter_content(CHUNK_SIZE, decode_unicode=True)
+            for row in csv.reader(self._iter_tsv_lines(chunks),
+                                  delimiter="\t"):
+                if row:
+                    yield row
+        finally:
+            r.close()
+
+            # The download and the parsing are interleaved, so is the time
+            # spent by the consumer of the rows.
+            if self.hooks:
+                tell = getattr(getattr(r, "raw", None), "tell", None)
+                self.emit("stream_end", url=query_string,
+                          bytes=tell() if tell else 0,
+                          elapsed=time.time() - started)
+
+    def get_dicts(self, query_string):
+        """Wrapper around ``get_rows()`` that yields dicts.
+
+        :param query_string: Starts with a slash, part of the URL between the
+                             domain and the parameters (before the ?).
+
+        """
+        rows = self.get_rows(query_string)
+        header = next(rows, None)
+
+        if header is None:
+            return
+
+        for row in rows:
+            yield dict(zip(header, row))
+
+    def _iter_tsv_lines(self, chunks):
+        """Yield the lines of a tab-delimited response, ready for the csv
+        module.
+
+        :param chunks: Decoded chunks of the response.
+
+        """
+        first = True
+        for line in text.iter_lines(chunks):
+            # Recent version of Trac seem to be sending data with a BOM (?!)
+            if first:
+                first = False
+                if line.startswith(u"\ufeff"):
+                    line = line[1:]
+
+            # And since the csv module in Python 2.7 is not unicode-friendly,
+            # we encode to UTF-8.
+            if sys.version < '3':
+                line = line.encode("utf-8")
+
+            yield line
+
+    def get_tickets(self, query_string):
+        """Wrapper around ``get_rows()`` that returns ``Ticket`` instances.
+
+        :param query_string: Starts with a slash, part of the URL between the
+                             domain and the parameters (before the ?).
+        """
+        rows = self.get_rows(query_string)
+        header = next(rows, None)
+
+        if header is None:
+            return
+
+        factory = ticket.compile_factory(header)
+        for row in rows:
+            yield factory(row)
+
+    def open_mirror(self):
+        """Return the local mirror of the current site."""
+
+        from cartman import mirror
+
+        return mirror.Mirror(self.get_site_path("mirror.sqlite"))
+
+    def get_mirrored_ticket(self, ticket_id):
+        """Return a ``Ticket`` from the local mirror.
+
+        :param ticket_id: id of the ticket.
+
+        """
+        m = self.open_mirror()
+        try:
+            ticket_dict = m.get_ticket(ticket_id)
+        finally:
+            m.close()
+
+        if ticket_dict is None:
+            raise exceptions.FatalError("ticket #{} is not in the local "
+                                        "mirror (try: cm sync)"
+                                        .format(ticket_id))
+
+        return ticket.factory(ticket_dict)
+
+    def get_mirrored_report(self, report_id):
+        """Return the list of ``Ticket`` of a report from the local mirror.
+
+        :param report_id: id of the report.
+
+        """
+        m = self.open_mirror()
+        try:
+            report = m.get_report(report_id)
+        finally:
+            m.close()
+
+        if report is None:
+            raise exceptions.FatalError("report #{} is not in the local "
+                                        "mirror (try: cm sync {})"
+                                        .format(report_id, report_id))
+
+        columns, rows = report
+        factory = ticket.compile_factory(columns)
+
+        return [factory(row) for row in rows]
+
+    def search_mirror(self, terms):
+        """Search the summary and description of the mirrored tickets, return
+        the fields of the matching tickets by relevance.
+
+        :param terms: List of words to look for.
 
         """
-        if self.logged_in:
-            return
+        if not terms:
+            raise exceptions.InvalidParameter("should provide a search term")
 
-        # Seems that depending on the method used to serve trac, we need to use
-        # a different path to initiate authentication.
-        r = self.get("/login", handle_errors=False)
+        m = self.open_mirror()
+        try:
+            results = m.search(terms)
+        finally:
+            m.close()
 
-        if self.auth_type == "acctmgr":
-            r = self.post("/login", {
-                "user": self.username,
-                "password": self.password,
-            })
+        return results
 
-        if r.status_code not in (200, 302):
-            msg = ("login failed on {} (bad user, password or auth type)"
-                   .format(r.request.url))
-            raise exceptions.LoginError(msg)
+    def get_sync_columns(self):
+        """Return the list of columns to synchronize in the local mirror."""
 
-        self.logged_in = True
+        columns = list(SYNC_COLUMNS)
+        for name in sorted(self.get_properties()):
+            if name not in columns:
+                columns.append(name)
 
-    def get_dicts(self, query_string):
-        """Wrapper around ``get()`` that ensures auth and returns dicts.
+        return columns
 
-        This methods assumes the response contains tab-delimited data.
+    def map_concurrently(self, func, items):
+        """Call ``func`` on each item using ``self.jobs`` threads sharing the
+        same session, yields the results in the order of ``items``.
 
-        :param query_string: Starts with a slash, part of the URL between the
-                             domain and the parameters (before the ?).
+        :param func: Function to call with each item.
+        :param items: List of items.
 
         """
-        r = self.get(query_string)
-        data = r.text
+        if len(items) < 2 or self.jobs < 2:
+            for item in items:
+                yield func(item)
+            return
 
-        # Recent version of Trac seem to be sending data with a BOM (?!)
-        if data[0] == u"\ufeff":
-            data = data[1:]
+        from multiprocessing.pool import ThreadPool
 
-        # And since the csv module in Python 2.7 is not unicode-friendly, we
-        # encode to UTF-8.
-        if sys.version < '3':
-            data = data.encode("utf-8")
+        pool = ThreadPool(min(self.jobs, len(items)))
+        try:
+            for result in pool.imap(func, items):
+                yield result
+        finally:
+            pool.terminate()
 
-        return csv.DictReader(data.splitlines(True), delimiter="\t")
+    def read_ticket_ids(self, raw_value):
+        """Return the list of ticket ids from a command-line parameter, read
+        them from stdin if the parameter is ``-``.
 
-    def get_tickets(self, query_string):
-        """Wrapper around ``get_dicts()`` that returns ``Ticket`` instances.
+        :param raw_value: List of ids/ranges (e.g. ``12,15,20-40``) or ``-``.
 
-        :param query_string: Starts with a slash, part of the URL between the
-                             domain and the parameters (before the ?).
         """
-        for ticket_dict in self.get_dicts(query_string):
-            yield ticket.factory(ticket_dict)
+        if raw_value == "-":
+            raw_value = sys.stdin.read()
+
+        return text.validate_id_list(raw_value)
 
     def print_function_help(self, attrname):
         """Print the docstring for one function.
@@ -389,11 +1440,7 @@ class CartmanApp(object):
     def list_commands(self):
         """Return list of all the commands."""
 
-        commands = []
-        for attrname in dir(self):
-            if attrname.startswith("run_"):
-                commands.append(attrname)
-        return commands
+        return ["run_" + command for command in sorted(COMMANDS)]
 
     def print_commands_list(self):
         """Print command list minus help."""
@@ -418,6 +1465,10 @@ class CartmanApp(object):
         :param ticket_id: id of the ticket to open in browser.
 
         """
+        if self.browser is None:
+            import webbrowser
+            self.browser = webbrowser
+
         self.browser.open("{}/ticket/{}".format(self.base_url, ticket_id))
 
     def open_in_browser_on_request(self, ticket_id):
@@ -468,25 +1519,343 @@ class CartmanApp(object):
     def _read_comment(self):
         """Prompt for a piece of text via the current EDITOR. Returns a string.
         """
+        import tempfile
+
         (fd, filename) = tempfile.mkstemp(suffix=".cm.ticket")
         self.editor(filename)
         with open(filename) as fp:
             comment = fp.read()
         return comment
 
-    def _extract_timestamps(self, raw_html):
-        """Wrapper around extract_time_v0 and extract_time_v1."""
+    def get_ticket_page(self, ticket_id):
+        """Fetch the HTML page of a ticket and return it parsed as a
+        ``text.TicketPage``.
 
-        if self.trac_version >= (1, 0):
-            return text.extract_timestamps_v1(raw_html)
-        else:
-            return text.extract_timestamps_v0(raw_html)
+        :param ticket_id: id of the ticket.
+
+        """
+        r = self.get("/ticket/{}".format(ticket_id), detect_version=False)
+
+        # The version of Trac comes from the same single pass, the page
+        # defaults to it while unknown.
+        known = self.trac_version != (0, 0)
+        with self.trace_phase("parse", what="ticket_page"):
+            page = text.TicketPage(r.text,
+                                   self.trac_version if known else None)
+
+        if not known:
+            self.set_trac_version(page.trac_version)
+
+        return page
+
+    def get_fuzzy_index(self, name, options):
+        """Return the ``text.FuzzyIndex`` of the options of a property,
+        built again only when the options change.
+
+        :param name: Name of the property (e.g. milestone).
+        :param options: List of options of the property.
+
+        """
+        index = self.fuzzy_indexes.get(name)
+
+        if index is None or index.values != tuple(options):
+            index = text.FuzzyIndex(options)
+            self.fuzzy_indexes[name] = index
+
+        return index
+
+    def _validate_headers(self, headers, options, complete=True):
+        """Validate the headers of a new ticket, returns a list of errors.
+
+        The fields tolerant to incomplete values are completed in place with
+        the closest option available.
+
+        :param headers: Dictionary of headers from the ticket template.
+        :param options: Property options, as returned by
+                        ``get_property_options()``.
+        :param complete: Complete the incomplete values, else they are errors
+                         (e.g. with cached options, which might lack a new
+                         milestone close to an old one).
+
+        """
+        errors = []
+        fuzzy_match_fields = ("Milestone", "Component", "Type", "Version",
+                              "Priority")
+
+        # Ensures all the required fields are filled-in
+        for key in self.required_fields:
+            if key in fuzzy_match_fields:
+                continue
+            if not headers.get(key) or "**ERROR**" in headers[key]:
+                errors.append("Invalid '{}': cannot be blank".format(key))
+
+        # Some fields are tolerant to incomplete values, this is where we
+        # try to complete them.
+        for key in fuzzy_match_fields:
+            lkey = key.lower()
+            if lkey not in options:
+                continue
+
+            valid_options = options[lkey]
+            index = self.get_fuzzy_index(lkey, valid_options)
+
+            # The specified value is not available in the multi-choice.
+            if key in headers and headers[key] not in index:
+                m = index.find(headers[key]) if complete else None
+                if m:
+                    # We found a close match, update the value with it.
+                    headers[key] = m
+                else:
+                    # We didn't find a close match. If the user entered
+                    # something explicitly or if this field is required,
+                    # this is an error, else just wipe the value and move
+                    # on.
+                    if headers[key] or key in self.required_fields:
+                        joined_options = ", ".join(valid_options)
+                        errors.append(u"Invalid '{}': expected: {}"
+                                      .format(key, joined_options))
+                    else:
+                        headers[key] = ""
+
+        return errors
+
+    def create_ticket(self, headers, body):
+        """Post a new ticket, return its id.
+
+        :param headers: Dictionary of validated headers, as in the templates.
+        :param body: Description of the ticket.
+
+        """
+        # Since the body is expected to be using CRLF line termination, we
+        # replace newlines by CRLF if no CRLF is found.
+        if "\r\n" not in body:
+            body = body.replace("\n", "\r\n")
+
+        fields_data = {
+            "field_summary": headers.get("Subject", ""),
+            "field_type": headers.get("Type", ""),
+            "field_version": headers.get("Version", ""),
+            "field_description": body,
+            "field_milestone": headers.get("Milestone", ""),
+            "field_component": headers.get("Component", ""),
+            "field_owner": headers.get("To", ""),
+            "field_keywords": headers.get("Keywords", ""),
+            "field_cc": headers.get("Cc", ""),
+            "field_attachment": "",
+        }
+
+        # Assume anything outside of the original headers it to be included as
+        # fields.
+        for key, value in headers.items():
+            field_name = "field_" + key.lower()
+            if field_name not in fields_data:
+                fields_data[field_name] = value
+
+        # Trac redirects to the page of the new ticket, there is no need to
+        # fetch it. The form is returned with the errors otherwise.
+        r = self.post("/newticket", fields_data, allow_redirects=False)
+
+        if r.status_code not in (301, 302, 303):
+            message = text.extract_message(r.text)
+            if not message:
+                message = "unable to create new ticket"
+            raise exceptions.RequestException(message)
+
+        try:
+            return int(r.headers["Location"].split("/")[-1])
+        except:
+            raise exceptions.RequestException("returned ticket_id is invalid.")
+
+    def read_batch(self, path):
+        """Return the tickets defined in a batch file, as a list of
+        ``(digest, headers, body)`` tuples.
+
+        The file is either a mbox, each message being a ticket written as in
+        the templates, or JSON lines, each object holding the fields of a
+        ticket (e.g. summary, milestone, description). The digest identifies
+        the content of each record in the manifest.
+
+        :param path: Path of the batch file.
 
-    def extract_status_from_ticket_page(self, raw_html):
-        if self.trac_version >= (1, 0):
-            return text.extract_status_from_ticket_page_v1(raw_html)
+        """
+        import hashlib
+
+        with open(path) as fp:
+            is_mbox = fp.readline().startswith("From ")
+
+        records = []
+        if is_mbox:
+            import mailbox
+
+            for message in mailbox.mbox(path, create=False):
+                records.append((OrderedDict(message.items()),
+                                message.get_payload()))
         else:
-            return text.extract_status_from_ticket_page_v0(raw_html)
+            with open(path) as fp:
+                for line_number, line in enumerate(fp, 1):
+                    if not line.strip():
+                        continue
+                    try:
+                        fields = json.loads(line,
+                                            object_pairs_hook=OrderedDict)
+                    except ValueError:
+                        raise exceptions.FatalError(
+                            "{}:{}: invalid JSON record".format(
+                                path, line_number))
+                    records.append(self._batch_record(fields))
+
+        batch = []
+        for headers, body in records:
+            content = json.dumps([list(headers.items()), body])
+            digest = hashlib.sha1(content.encode("utf-8")).hexdigest()
+            batch.append((digest, headers, body))
+        return batch
+
+    def _batch_record(self, fields):
+        """Convert the fields of a JSON record to the headers and body of a
+        ticket template.
+
+        :param fields: Dictionary of the ticket fields.
+
+        """
+        headers = OrderedDict()
+        body = ""
+
+        for key, value in fields.items():
+            if not isinstance(value, string_types):
+                value = json.dumps(value)
+            key = key.lower()
+            if key == "description":
+                body = value
+            else:
+                headers[BATCH_FIELDS.get(key, key.capitalize())] = value
+
+        return headers, body
+
+    def load_batch_manifest(self, path):
+        """Return the tickets created by previous runs of a batch, as a
+        dictionary of ``(digest, ticket_id)`` by record number.
+
+        The manifest has one JSON line per record processed, with its
+        number, digest and either the id of the ticket or the error.
+
+        :param path: Path of the manifest.
+
+        """
+        created = {}
+
+        try:
+            fp = open(path)
+        except IOError:
+            return created
+
+        with fp:
+            for line in fp:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Last line cut short by an interruption.
+                    continue
+                if entry.get("ticket"):
+                    created[entry["record"]] = (entry["digest"],
+                                                entry["ticket"])
+
+        return created
+
+    def create_tickets(self, path, owner=None):
+        """Create the tickets of a batch file, return the output of
+        ``new --batch``.
+
+        All the records are validated before any ticket is created. The
+        result of each record is appended to the manifest as soon as it is
+        known, the records already created are skipped on the next run.
+
+        :param path: Path of the batch file (see ``read_batch()``).
+        :param owner: Owner of the tickets not specifying one.
+
+        """
+        import requests
+
+        batch = self.read_batch(path)
+        manifest_path = path + ".manifest"
+        created = self.load_batch_manifest(manifest_path)
+
+        for record, (digest, headers, body) in enumerate(batch, 1):
+            if record in created and created[record][0] != digest:
+                raise exceptions.FatalError(
+                    "record {} changed since ticket #{} was created from it "
+                    "(see {})".format(record, created[record][1],
+                                      manifest_path))
+            if not headers.get("To"):
+                headers["To"] = owner or self.username
+
+        pending = [(record, headers, body)
+                   for record, (_, headers, body) in enumerate(batch, 1)
+                   if record not in created]
+
+        self.login()
+
+        # The options are fetched and indexed once for all the records.
+        refreshed = False
+        errors = []
+        while pending:
+            options = self.get_property_options(refresh=refreshed)
+            # The cached options might be outdated, only complete the values
+            # with fresh ones.
+            complete = not self.properties_cached
+            errors = []
+            for record, headers, _ in pending:
+                for error in self._validate_headers(headers, options,
+                                                    complete):
+                    errors.append(u"record {}. {}".format(record, error))
+
+            # Give it another try with fresh values from Trac.
+            if not errors or not self.properties_cached or refreshed:
+                break
+            refreshed = True
+
+        if errors:
+            raise exceptions.BatchError("invalid records, no ticket created",
+                                        errors)
+
+        lock = threading.Lock()
+        manifest = open(manifest_path, "a")
+
+        def create(item):
+            record, headers, body = item
+            entry = {"record": record, "digest": batch[record - 1][0]}
+            try:
+                entry["ticket"] = self.create_ticket(headers, body)
+            except (exceptions.FatalError,
+                    requests.exceptions.RequestException) as ex:
+                entry["error"] = str(ex)
+            with lock:
+                manifest.write(json.dumps(entry) + "\n")
+                manifest.flush()
+            return entry
+
+        output = []
+        failures = 0
+        with manifest:
+            for record in sorted(created):
+                output.append("record {}. ticket #{} already created"
+                              .format(record, created[record][1]))
+            for entry in self.map_concurrently(create, pending):
+                if "error" in entry:
+                    output.append("record {}. error: {}".format(
+                        entry["record"], entry["error"]))
+                    failures += 1
+                else:
+                    output.append("record {}. ticket #{} created".format(
+                        entry["record"], entry["ticket"]))
+
+        if failures:
+            raise exceptions.BatchError("{} of {} tickets failed (run again "
+                                        "to retry)".format(failures,
+                                                           len(pending)),
+                                        output)
+
+        return output
 
     #
     # Command definitions
@@ -499,22 +1868,26 @@ class CartmanApp(object):
     # documentation.
     #
 
-    def run_change(self, ticket_id, *values):
-        """Make change to the given ticket_id.
+    def run_change(self, ticket_ids, *values):
+        """Make change to the given ticket_id(s).
 
-        This command does not return anything if successful.
+        Multiple tickets can be given as a list of ids and ranges (e.g.
+        12,15,20-40), or read from stdin with ``-``. They are changed
+        concurrently (see ``-j``) and the result for each ticket is listed.
+        This command does not return anything if successful on a single
+        ticket.
 
         TODO: support spawning an editor to change field values.
 
-        usage: cm change ticket_id field=value [field=value...]
+        usage: cm change ticket_ids field=value [field=value...]
 
         """
-        ticket_id = text.validate_id(ticket_id)
+        ticket_ids = self.read_ticket_ids(ticket_ids)
 
         if not values:
             raise exceptions.InvalidParameter("should provide at least one "
                                               "field change")
-        fields_data = {}
+        fields = {}
         for v in values:
             s = v.split('=', 1)
             if len(s) != 2:
@@ -523,13 +1896,7 @@ class CartmanApp(object):
                         "pair".format(v))
             field = s[0].strip()
             value = s[1]
-            fields_data["field_" + field] = value
-
-        self.login()
-
-        # Load the timestamps from the ticket page.
-        r = self.get("/ticket/{}".format(ticket_id))
-        timestamps = self._extract_timestamps(r.text)
+            fields[field] = value
 
         if self.message:
             comment = self.message
@@ -538,25 +1905,28 @@ class CartmanApp(object):
         else:
             comment = ""
 
-        data = {
-            "action": "leave",
-            "comment": comment,
-            "submit": "Submit changes",
-        }
-        data.update(timestamps)
-        data.update(fields_data)
+        self.login()
 
-        r = self.post("/ticket/{}".format(ticket_id), data)
+        if len(ticket_ids) == 1:
+            self.backend.update_ticket(ticket_ids[0], comment, fields)
+            return
 
-        # Starting from 1.0+, the system-message element is always on the page,
-        # only the style is changed.
-        if self.trac_version >= (1, 0):
-            token = 'system-message" style=""'
-        else:
-            token = "system-message"
+        output = []
+        failures = 0
+        for ticket_id, error in self.backend.update_tickets(ticket_ids,
+                                                            comment, fields):
+            if error:
+                output.append("#{}. error: {}".format(ticket_id, error))
+                failures += 1
+            else:
+                output.append("#{}. changed".format(ticket_id))
 
-        if token in r.text or r.status_code != 200:
-            raise exceptions.FatalError("unable to save change")
+        if failures:
+            raise exceptions.BatchError("{} of {} changes failed"
+                                        .format(failures, len(ticket_ids)),
+                                        output)
+
+        return output
 
     def run_comment(self, ticket_id):
         """Add a comment to the given ticket_id. This command does not return
@@ -578,28 +1948,79 @@ class CartmanApp(object):
 
         self.login()
 
-        # Load the timestamps from the ticket page.
-        r = self.get("/ticket/{}".format(ticket_id))
-        timestamps = self._extract_timestamps(r.text)
+        self.backend.update_ticket(ticket_id, comment)
 
-        data = {
-            "comment": comment,
-            "action": "leave",
-            "submit": "Submit changes",
-        }
-        data.update(timestamps)
+    def run_export(self, kind=None, source=None):
+        """Export all the tickets of a report or of a query to a file.
+
+        The query uses the syntax of the query URLs of Trac (e.g.
+        status=!closed&milestone=1.0), with all the columns of the tickets
+        unless some are given with col=. The tickets are written as they are
+        downloaded, as JSON lines or as CSV if FILE ends with .csv, gzipped
+        if it ends with .gz. The export goes page by page, an interrupted
+        export resumes after the last page completed.
 
-        r = self.post("/ticket/{}".format(ticket_id), data)
+        usage: cm export report report_id --out FILE
+               cm export query query_string --out FILE
 
-        # Starting from 1.0+, the system-message element is always on the page,
-        # only the style is changed.
-        if self.trac_version >= (1, 0):
-            token = 'system-message" style=""'
+        """
+        from cartman import export
+
+        if kind == "report":
+            report_id = text.validate_id(source)
+            query_string = "/report/{}".format(report_id)
+            query = []
+            source = "report {}".format(report_id)
+        elif kind == "query" and source:
+            query_string = "/query"
+            query = [(name, value) for name, value
+                     in parse_qsl(source.lstrip("?"), keep_blank_values=True)
+                     if name not in ("format", "max", "page")]
+            source = "query " + source
         else:
-            token = "system-message"
+            raise exceptions.InvalidParameter("should export a report or a "
+                                              "query")
+
+        if not self.out:
+            raise exceptions.InvalidParameter("missing --out FILE")
+
+        self.login()
+
+        if kind == "query":
+            if not any(name == "col" for name, _ in query):
+                query.extend(("col", column)
+                             for column in self.get_sync_columns())
+            # The pages are only consistent in a stable order.
+            if not any(name == "order" for name, _ in query):
+                query.append(("order", "id"))
+
+        # The pages would evict everything else from the cache.
+        self.use_cache = False
 
-        if token in r.text or r.status_code != 200:
-            raise exceptions.FatalError("unable to save comment")
+        e = export.Export(self.out, source)
+        e.load_checkpoint()
+
+        while True:
+            page = e.page + 1
+            rows = self.get_rows("{}?{}".format(query_string, urlencode(
+                [("format", "tab"), ("max", EXPORT_PAGE_SIZE),
+                 ("page", page)] + query)))
+
+            try:
+                header = next(rows, None)
+            except exceptions.FatalError as ex:
+                # The previous page was full and the last one.
+                if page > 1 and text.is_beyond_last_page(str(ex)):
+                    break
+                raise
+
+            # Servers ignoring the paging return all the rows at once.
+            if e.write_page(header, rows) != EXPORT_PAGE_SIZE:
+                break
+
+        e.finish()
+
+        return ["{} ticket(s) exported to {}".format(e.rows, self.out)]
 
     def run_help(self, command="help"):
         """Show the help for a given command.
@@ -608,7 +2029,7 @@ class CartmanApp(object):
 
         """
         func_name = "run_" + command
-        if hasattr(self, func_name):
+        if command in COMMANDS:
             self.print_function_help(func_name)
             if command == "help":
                 self.print_commands_list()
@@ -618,9 +2039,22 @@ class CartmanApp(object):
     def run_new(self, owner=None):
         """Create a new ticket and return its id if successful.
 
-        usage: cm new [owner]
+        With ``--batch FILE``, create a ticket for each record of the file,
+        either a mbox of messages written as the templates or JSON lines of
+        fields (e.g. {"summary": "...", "milestone": "..."}). The records are
+        all validated first, then created concurrently (see ``-j``). The id
+        of each ticket is written to FILE.manifest, running the same batch
+        again only creates the tickets still missing.
+
+        usage: cm new [owner] [--batch FILE]
 
         """
+        import email.parser
+        import tempfile
+
+        if self.batch:
+            return self.create_tickets(self.batch, owner)
+
         template = self.resolve_template()
 
         if not template:
@@ -649,10 +2083,11 @@ class CartmanApp(object):
 
         self.login()
 
+        refreshed = False
         valid = False
         while not valid:
-            # Get the properties at each iteration, in case an admin updated
-            # the list in the mean time.
+            # Get the properties at each iteration, they are typically cached
+            # and refreshed if the validation fails.
             options = self.get_property_options()
 
             # Assume the user will produce a valid ticket
@@ -682,43 +2117,15 @@ class CartmanApp(object):
             body = em.get_payload()
             headers = OrderedDict(em.items())
 
-            errors = []
-            fuzzy_match_fields = ("Milestone", "Component", "Type", "Version",
-                                  "Priority")
-
-            # Ensures all the required fields are filled-in
-            for key in self.required_fields:
-                if key in fuzzy_match_fields:
-                    continue
-                if not headers.get(key) or "**ERROR**" in headers[key]:
-                    errors.append("Invalid '{}': cannot be blank".format(key))
-
-            # Some fields are tolerant to incomplete values, this is where we
-            # try to complete them.
-            for key in fuzzy_match_fields:
-                lkey = key.lower()
-                if lkey not in options:
-                    continue
-
-                valid_options = options[lkey]
-
-                # The specified value is not available in the multi-choice.
-                if key in headers and headers[key] not in valid_options:
-                    m = text.fuzzy_find(headers[key], valid_options)
-                    if m:
-                        # We found a close match, update the value with it.
-                        headers[key] = m
-                    else:
-                        # We didn't find a close match. If the user entered
-                        # something explicitly or if this field is required,
-                        # this is an error, else just wipe the value and move
-                        # on.
-                        if headers[key] or key in self.required_fields:
-                            joined_options = ", ".join(valid_options)
-                            errors.append(u"Invalid '{}': expected: {}"
-                                          .format(key, joined_options))
-                        else:
-                            headers[key] = ""
+            # The cached options might be outdated, only complete the values
+            # with fresh ones, give it another try with them on any error.
+            cached = self.properties_cached and not refreshed
+            errors = self._validate_headers(headers, options,
+                                            complete=not cached)
+            if errors and cached:
+                options = self.get_property_options(refresh=True)
+                errors = self._validate_headers(headers, options)
+                refreshed = True
 
             if errors:
                 valid = False
@@ -738,43 +2145,7 @@ class CartmanApp(object):
             if self.message_file:
                 break
 
-        # Since the body is expected to be using CRLF line termination, we
-        # replace newlines by CRLF if no CRLF is found.
-        if "\r\n" not in body:
-            body = body.replace("\n", "\r\n")
-
-        fields_data = {
-            "field_summary": headers.get("Subject", ""),
-            "field_type": headers.get("Type", ""),
-            "field_version": headers.get("Version", ""),
-            "field_description": body,
-            "field_milestone": headers.get("Milestone", ""),
-            "field_component": headers.get("Component", ""),
-            "field_owner": headers.get("To", ""),
-            "field_keywords": headers.get("Keywords", ""),
-            "field_cc": headers.get("Cc", ""),
-            "field_attachment": "",
-        }
-
-        # Assume anything outside of the original headers it to be included as
-        # fields.
-        for key, value in headers.items():
-            field_name = "field_" + key.lower()
-            if field_name not in fields_data:
-                fields_data[field_name] = value
-
-        r = self.post("/newticket", fields_data)
-
-        if r.status_code != 200:
-            message = text.extract_message(r.text)
-            if not message:
-                message = "unable to create new ticket"
-            raise exceptions.RequestException(message)
-
-        try:
-            ticket_id = int(r.url.split("/")[-1])
-        except:
-            raise exceptions.RequestException("returned ticket_id is invalid.")
+        ticket_id = self.create_ticket(headers, body)
 
         self.open_in_browser_on_request(ticket_id)
 
@@ -792,12 +2163,15 @@ class CartmanApp(object):
     def run_properties(self):
         """Lists the system's properties (Milestone, Component, etc.).
 
-        usage: cm properties
+        The properties are cached locally (see ``properties_ttl``), use
+        ``--refresh`` to fetch them from Trac.
+
+        usage: cm properties [--refresh]
 
         """
         self.login()
 
-        options = self.get_property_options()
+        options = self.get_property_options(refresh=self.refresh)
 
         output = []
         for title, prop in (("Milestones", "milestone"),
@@ -814,20 +2188,23 @@ class CartmanApp(object):
     def run_report(self, report_id=None):
         """List tickets from a given report number.
 
+        With ``--offline``, the report is read from the local mirror (see
+        ``sync``).
+
         usage: cm report report_id
 
         """
-        output = []
         report_id = text.validate_id(report_id)
 
-        query_string = "/report/{}?format=tab".format(report_id)
-
-        self.login()
-
-        for t in self.get_tickets(query_string):
-            output.append(t.format_title())
+        if self.offline:
+            tickets = self.get_mirrored_report(report_id)
+        else:
+            if self.backend.needs_login:
+                self.login()
+            tickets = self.backend.get_report_tickets(report_id)
 
-        return output
+        return self.format_items(tickets, ticket.Ticket.format_title,
+                                 ticket.Ticket.as_dict)
 
     def run_reports(self):
         """List reports available in the system.
@@ -835,50 +2212,159 @@ class CartmanApp(object):
         usage: cm reports
 
         """
-        output = []
+        if self.backend.needs_login:
+            self.login()
 
-        self.login()
-
-        for d in self.get_dicts("/report?format=tab"):
-            output.append("#{report}. {title}".format(**d))
+        reports = (OrderedDict([("id", report_id), ("title", title)])
+                   for report_id, title in self.backend.get_reports())
 
-        return output
+        return self.format_items(
+            reports, lambda r: "#{}. {}".format(r["id"], r["title"]))
 
     def run_search(self, *terms):
         """Search for tickets using the given terms.
 
+        With ``--local`` (or ``--offline``), the search is done on the local
+        mirror (see ``sync``), across all the tickets and ranked by relevance.
+
         TODO: multi-page search results.
 
         usage: cm search term
 
         """
-        output = []
+        if self.offline:
+            return self.format_items(
+                self.search_mirror(terms),
+                lambda d: u"#{}. {}: {} ({})".format(
+                    d.get("id"), d.get("type"), d.get("summary"),
+                    d.get("status")))
+
         query_string = "/search?q={}".format("+".join(terms))
 
         self.login()
 
         r = self.get(query_string)
-        for ticket_id, description in text.extract_search_results(r.text):
-            output.append("#{}. {}".format(ticket_id, description))
 
-        return output
+        with self.trace_phase("parse", what="search"):
+            results = text.extract_search_results(r.text)
+
+        results = (OrderedDict([("id", ticket_id),
+                                ("description", description)])
+                   for ticket_id, description in results)
+
+        return self.format_items(
+            results, lambda d: "#{}. {}".format(d["id"], d["description"]))
 
     def run_timeline(self, daysback=None):
         """Show tickets activity timeline
 
+        With ``--since``, only the events since the previous ``--since`` are
+        shown (the last ``daysback`` days on the first run). With
+        ``--follow``, the new events are shown as they appear, until
+        interrupted.
+
         usage: cm timeline [daysback]
 
         """
-        output = []
-        query_string = "/timeline?ticket=on"
-        if daysback:
-            query_string += "&daysback={}".format(daysback)
+        if self.backend.needs_login:
+            self.login()
+
+        if self.since or self.follow:
+            return self.format_items(
+                self.iter_timeline_events(daysback),
+                lambda e: u"{} {} by {}".format(
+                    time.strftime("%Y-%m-%d %H:%M",
+                                  time.localtime(e["time"])),
+                    e["title"], e["author"]))
+
+        items = (OrderedDict([("item", item), ("description", description)])
+                 for item, description in self.backend.get_timeline(daysback))
+
+        return self.format_items(
+            items, lambda d: u"{}. {}".format(d["item"], d["description"]))
+
+    def run_watch(self, kind=None, report_id=None):
+        """Poll a report and show the tickets added, removed or changed,
+        until interrupted. The first poll shows all the tickets of the
+        report. The report is polled less often while nothing changes, and
+        downloaded again only if changed when the server supports
+        conditional requests.
+
+        usage: cm watch report report_id
+
+        """
+        if kind != "report":
+            raise exceptions.InvalidParameter("can only watch a report")
+
+        report_id = text.validate_id(report_id)
 
         self.login()
 
-        r = self.get(query_string)
-        for item, description in text.extract_timeline_items(r.text):
-            output.append(u"{}. {}".format(item, description))
+        # The snapshot replaces the cache, its validators are kept in memory.
+        self.use_cache = False
+
+        return self.format_items(self.iter_report_changes(report_id),
+                                 format_change)
+
+    def run_sync(self, *report_ids):
+        """Update the local mirror of the tickets, used with ``--offline``.
+
+        The first synchronization downloads all the tickets, the following
+        ones only the tickets changed since the last one (use ``--refresh``
+        to download everything again, e.g. after tickets were deleted). The
+        given reports are stored in the mirror too, and updated by all the
+        following synchronizations.
+
+        usage: cm sync [report_id...]
+
+        """
+        report_ids = [text.validate_id(r) for r in report_ids]
+
+        self.login()
+
+        columns = self.get_sync_columns()
+        output = []
+
+        m = self.open_mirror()
+        try:
+            if self.refresh:
+                m.clear_tickets()
+
+            query = [
+                ("format", "tab"),
+                ("max", "0"),
+                ("order", "changetime"),
+            ]
+            query.extend(("col", column) for column in columns)
+
+            since = m.get_meta("changetime")
+            if since:
+                query.append(("changetime", since + ".."))
+
+            rows = self.get_rows("/query?" + urlencode(query))
+            header = next(rows, None)
+
+            count = 0
+            if header is not None:
+                if "id" not in header or "changetime" not in header:
+                    raise exceptions.FatalError("unable to synchronize, "
+                                                "missing id or changetime")
+                count = m.store_tickets(header, rows)
+
+            output.append("{} ticket(s) updated, {} in the mirror"
+                          .format(count, m.count_tickets()))
+
+            for report_id in sorted(set(report_ids) | set(m.get_report_ids())):
+                query_string = "/report/{}?format=tab".format(report_id)
+                rows = self.get_rows(query_string)
+                header = next(rows, None) or []
+                count = m.store_report(report_id, header, rows)
+                output.append("report #{}: {} ticket(s)"
+                              .format(report_id, count))
+
+            m.commit()
+        finally:
+            m.close()
 
         return output
 
@@ -893,23 +2379,15 @@ class CartmanApp(object):
 
         self.login()
 
-        # Get all the available actions for this ticket
-        r = self.get("/ticket/{}".format(ticket_id))
-        statuses = text.extract_statuses(r.text)
-
-        # Just display current status.
+        # Just display current status and the available actions.
         if not status:
-            status = self.extract_status_from_ticket_page(r.text)
+            status, statuses = self.backend.get_ticket_status(ticket_id)
             output.append("Current status: {}".format(status))
             if statuses:
                 output.append("Available statuses: {}"
                               .format(", ".join(statuses)))
             return output
 
-        if not status:
-            raise exceptions.FatalError("bad status (acceptable: {})"
-                                        .format(", ".join(statuses)))
-
         if self.message:
             comment = self.message
         elif self.add_comment:
@@ -917,33 +2395,40 @@ class CartmanApp(object):
         else:
             comment = ""
 
-        # Not having a value for submit causes Trac to ignore the request.
-        data = {
-            "action": status,
-            "comment": comment,
-            "submit": "anything",
-        }
-        data.update(self._extract_timestamps(r.text))
-
-        r = self.post("/ticket/{}".format(ticket_id), data)
+        self.backend.update_ticket(ticket_id, comment, action=status)
 
-    def run_view(self, ticket_id):
+    def run_view(self, ticket_ids):
         """Display a ticket summary.
 
-        usage: cm view ticket_id
+        Multiple tickets can be given as a list of ids and ranges (e.g.
+        12,15,20-40), or read from stdin with ``-``, they are displayed in
+        the given order. With ``--offline``, the tickets are read from the
+        local mirror (see ``sync``).
+
+        usage: cm view ticket_ids
 
         """
-        ticket_id = text.validate_id(ticket_id)
+        ticket_ids = self.read_ticket_ids(ticket_ids)
 
-        query_string = "/ticket/{}?format=tab".format(ticket_id)
+        if self.offline:
+            tickets = [self.get_mirrored_ticket(ticket_id)
+                       for ticket_id in ticket_ids]
+        else:
+            if self.backend.needs_login:
+                self.login()
+            tickets = self.backend.get_tickets(ticket_ids)
 
-        self.login()
+        if self.output_format != "text":
+            return self.format_items(tickets, None, ticket.Ticket.as_dict)
 
-        t = next(self.get_tickets(query_string))
-        title = t.format_title()
+        output = []
+        for t in tickets:
+            if output:
+                output.append("")
+            output.extend([
+                ui.title(t.format_title()),
+                "",
+                t.description,
+            ])
 
-        return [
-            ui.title(title),
-            "",
-            t.description,
-        ]
+        return output
@@ -0,0 +1,233 @@
+# Copyright (c) 2011-2023 Bertrand Janin <b@janin.com>
+#
+# Permission to use, copy, modify, and/or distribute this software for any
+# purpose with or without fee is hereby granted, provided that the above
+# copyright notice and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+# WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+# ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+# OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+
+"""
+On-disk cache of the HTTP responses, revalidated with conditional requests.
+"""
+
+import os
+import json
+import hashlib
+import tempfile
+
+import requests
+
+
+class CacheEntry(object):
+
+    """
+    Cached response of a URL, its body is only read when the server confirms
+    it has not changed.
+    """
+
+    def __init__(self, path, metadata, offset):
+        self.path = path
+        self.metadata = metadata
+        self.offset = offset
+
+    def get_validators(self):
+        """Return the headers making the request conditional."""
+
+        headers = {}
+        if self.metadata.get("etag"):
+            headers["If-None-Match"] = self.metadata["etag"]
+        if self.metadata.get("last_modified"):
+            headers["If-Modified-Since"] = self.metadata["last_modified"]
+        return headers
+
+    def make_response(self):
+        """Return a ``requests.Response`` with the cached body."""
+
+        with open(self.path, "rb") as fp:
+            fp.seek(self.offset)
+            body = fp.read()
+
+        # Mark the entry as recently used, for the eviction.
+        try:
+            os.utime(self.path, None)
+        except OSError:
+            pass
+
+        response = requests.models.Response()
+        response.status_code = 200
+        response.url = self.metadata["url"]
+        response.encoding = self.metadata.get("encoding")
+        response._content = body
+        response._content_consumed = True
+        if self.metadata.get("content_type"):
+            response.headers["Content-Type"] = self.metadata["content_type"]
+        response.from_cache = True
+
+        return response
+
+
+class CacheWriter(object):
+
+    """
+    Write a new entry in a temporary file, it only replaces the previous
+    entry once complete.
+    """
+
+    def __init__(self, cache, path, metadata):
+        self.cache = cache
+        self.path = path
+        fd, self.temp_path = tempfile.mkstemp(dir=cache.directory,
+                                              suffix=".tmp")
+        self.fp = os.fdopen(fd, "wb")
+        self.fp.write(json.dumps(metadata).encode("utf-8") + b"\n")
+
+    def write(self, chunk):
+        self.fp.write(chunk)
+
+    def commit(self):
+        self.fp.close()
+        os.rename(self.temp_path, self.path)
+        self.cache.evict()
+
+    def discard(self):
+        self.fp.close()
+        try:
+            os.remove(self.temp_path)
+        except OSError:
+            pass
+
+
+class ResponseCache(object):
+
+    """
+    Each entry is a file named after the hash of the URL, made of a line of
+    JSON metadata (validators, encoding) followed by the raw body. The least
+    recently used entries are removed when the total size exceeds
+    ``max_size``.
+    """
+
+    def __init__(self, directory, max_size):
+        self.directory = directory
+        self.max_size = max_size
+
+        if not os.path.exists(directory):
+            os.makedirs(directory, 0o700)
+
+    def get_path(self, url):
+        digest = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, digest)
+
+    def get(self, url):
+        """Return the ``CacheEntry`` of a URL or None.
+
+        :param url: Full URL of the request.
+
+        """
+        path = self.get_path(url)
+
+        try:
+            with open(path, "rb") as fp:
+                line = fp.readline()
+                offset = fp.tell()
+        except IOError:
+            return None
+
+        try:
+            metadata = json.loads(line.decode("utf-8"))
+        except ValueError:
+            return None
+
+        # Two URLs with the same hash are very unlikely, but cheap to check.
+        if metadata.get("url") != url:
+            return None
+
+        return CacheEntry(path, metadata, offset)
+
+    def store(self, url, r, stream=False):
+        """Store a successful response if it has validators.
+
+        The body of a streamed response is stored as it is consumed through
+        ``iter_content()``, and only if it is consumed entirely.
+
+        :param url: Full URL of the request.
+        :param r: Response from the server.
+        :param stream: The body of the response was not downloaded yet.
+
+        """
+        metadata = {
+            "url": url,
+            "etag": r.headers.get("ETag"),
+            "last_modified": r.headers.get("Last-Modified"),
+            "encoding": r.encoding,
+            "content_type": r.headers.get("Content-Type"),
+        }
+
+        if not metadata["etag"] and not metadata["last_modified"]:
+            return
+
+        path = self.get_path(url)
+
+        if not stream:
+            writer = CacheWriter(self, path, metadata)
+            writer.write(r.content)
+            writer.commit()
+            return
+
+        iter_content = r.iter_content
+
+        def iter_raw_content(chunk_size):
+            writer = CacheWriter(self, path, metadata)
+            complete = False
+            try:
+                for chunk in iter_content(chunk_size):
+                    writer.write(chunk)
+                    yield chunk
+                complete = True
+            finally:
+                if complete:
+                    writer.commit()
+                else:
+                    writer.discard()
+
+        def iter_content_tee(chunk_size=1, decode_unicode=False):
+            chunks = iter_raw_content(chunk_size)
+            if decode_unicode:
+                return requests.utils.stream_decode_response_unicode(chunks,
+                                                                     r)
+            return chunks
+
+        r.iter_content = iter_content_tee
+
+    def evict(self):
+        """Remove the least recently used entries until the cache fits in
+        ``max_size``."""
+
+        entries = []
+        total = 0
+
+        for name in os.listdir(self.directory):
+            if name.endswith(".tmp"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+            total += st.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
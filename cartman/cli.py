@@ -0,0 +1,272 @@
+# Copyright (c) 2011-2023 Bertrand Janin <b@janin.com>
+#
+# Permission to use, copy, modify, and/or distribute this software for any
+# purpose with or without fee is hereby granted, provided that the above
+# copyright notice and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+# WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+# ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+# OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+
+"""
+Command-line interface, shared by the ``cm`` script and the daemon.
+"""
+
+import os
+import re
+import sys
+
+from cartman import app
+from cartman import exceptions
+
+
+# Commands handled without building the argument parser nor contacting the
+# daemon, when called without any option (e.g. ``cm help``, ``cm open 12``).
+FAST_COMMANDS = ("help", "open")
+
+# Value of each argument when not specified on the command-line, must match
+# the defaults of the parser.
+DEFAULT_ARGUMENTS = {
+    "parameters": [],
+    "add_comment": False,
+    "message": None,
+    "stdin_id": False,
+    "message_file": None,
+    "open_after": False,
+    "site": None,
+    "template": None,
+    "refresh": False,
+    "jobs": None,
+    "offline": False,
+    "no_cache": False,
+    "trace": False,
+    "trace_file": None,
+    "format": "text",
+    "since": False,
+    "follow": False,
+    "batch": None,
+    "out": None,
+}
+
+
+class Arguments(object):
+
+    """
+    Stand-in for the arguments returned by argparse, for the fast commands.
+    """
+
+    def __init__(self, command, parameters):
+        self.__dict__.update(DEFAULT_ARGUMENTS)
+        self.command = command
+        self.parameters = parameters
+
+
+def parse_fast_arguments(argv):
+    """Return the ``Arguments`` for a fast command, None if the arguments
+    need the full parser.
+
+    :param argv: List of command-line arguments (without the program name).
+
+    """
+    if not argv or argv[0] not in FAST_COMMANDS:
+        return None
+
+    for arg in argv:
+        if arg.startswith("-"):
+            return None
+
+    return Arguments(argv[0], argv[1:])
+
+
+def build_parser():
+    """Return the parser for the ``cm`` command-line arguments."""
+
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="cm")
+    parser.add_argument("command",
+                        help="required (try help)")
+    parser.add_argument("parameters", nargs="*",
+                        help="specific for each commands")
+    parser.add_argument("-c", dest="add_comment", action="store_true",
+                        help="add a comment via the editor (status)")
+    parser.add_argument("-m", dest="message", action="store",
+                        help="comment/message to be added (status, comment)")
+    parser.add_argument("-i", dest="stdin_id", action="store_true",
+                        help="grab ticket_id from stdin")
+    parser.add_argument("--message-file", action="store",
+                        help="read message from file/stdin, disable editor")
+    parser.add_argument("-a", dest="open_after", action="store_true",
+                        help="open ticket in browser after command")
+    parser.add_argument("-s", dest="site", action="store",
+                        help="what site to use (default: trac), or several "
+                             "for the read commands (a,b,c or all)")
+    parser.add_argument("-t", dest="template", action="store",
+                        help="template to use for new tickets")
+    parser.add_argument("--refresh", action="store_true",
+                        help="ignore the cached values (properties)")
+    parser.add_argument("-j", dest="jobs", action="store", type=int,
+                        help="number of concurrent requests (default: 4)")
+    parser.add_argument("--offline", "--local", dest="offline",
+                        action="store_true",
+                        help="read from the local mirror (view, report, "
+                             "search)")
+    parser.add_argument("--no-cache", dest="no_cache", action="store_true",
+                        help="ignore the cached HTTP responses")
+    parser.add_argument("--trace", action="store_true",
+                        help="print the time spent in each phase on stderr")
+    parser.add_argument("--trace-file", dest="trace_file", action="store",
+                        help="append the timing events to a file (JSON "
+                             "lines)")
+    parser.add_argument("--format", choices=app.OUTPUT_FORMATS,
+                        default="text",
+                        help="output of report, reports, search, timeline "
+                             "and view (default: text)")
+    parser.add_argument("--since", action="store_true",
+                        help="only the events since the previous run "
+                             "(timeline)")
+    parser.add_argument("--follow", action="store_true",
+                        help="show the new events as they appear (timeline)")
+    parser.add_argument("--batch", action="store", metavar="FILE",
+                        help="create a ticket per record of the file, JSON "
+                             "lines or mbox (new)")
+    parser.add_argument("--out", action="store", metavar="FILE",
+                        help="file to write (export)")
+    return parser
+
+
+def is_forwardable(args):
+    """Returns True if the command can be run by the daemon, that is if it
+    does not need the terminal, stdin or an editor of the client.
+
+    :param args: Arguments returned from the argparse module.
+
+    """
+    if args.stdin_id or args.add_comment or args.message_file:
+        return False
+
+    if args.open_after or args.command == "open":
+        return False
+
+    # The trace, batch and export files are relative to the client.
+    if args.trace_file or args.batch or args.out:
+        return False
+
+    # The daemon runs the commands to completion even once the client is gone,
+    # a follow or a watch never completes.
+    if args.follow or args.command == "watch":
+        return False
+
+    # The ticket is always written in the editor, unless read from a file of
+    # the client (--message-file or --batch).
+    if args.command == "new":
+        return False
+
+    if args.command == "comment" and not args.message:
+        return False
+
+    # The daemon does not know the environment of the client.
+    for name in app.ENVIRONMENT_OVERRIDES:
+        if name in os.environ:
+            return False
+
+    return "-" not in args.parameters
+
+
+def execute(parser, args, application):
+    """Run the command on the given application, return the exit status.
+
+    :param parser: Parser used for the arguments, to print the usage, built
+                   on demand if None.
+    :param args: Arguments returned from the argparse module.
+    :param application: ``CartmanApp`` instance.
+
+    """
+    try:
+        # Try to grab the ticket id from stdin, if successful, slap the value
+        # as an extra positional argument.
+        if args.stdin_id:
+            data = sys.stdin.read()
+            m = re.match(r".*#(\d+).*", data,
+                         flags=(re.MULTILINE | re.DOTALL))
+            if not m:
+                raise exceptions.UsageException("No id on stdin")
+
+            args.parameters.append(m.group(1))
+
+        application.run(args)
+    except exceptions.UsageException as ex:
+        sys.stderr.write("{}: {}\n\n".format(ex.prefix, ex))
+        (parser or build_parser()).print_help(file=sys.stderr)
+    except exceptions.FatalError as ex:
+        sys.stderr.write("{}: {}\n".format(ex.prefix, ex))
+        return 1
+
+    return 0
+
+
+def run(argv, get_application):
+    """Parse the arguments and run the command, used by the daemon.
+
+    :param argv: List of command-line arguments (without the program name).
+    :param get_application: Function returning the ``CartmanApp`` instance
+                            to use for the given arguments.
+
+    """
+    parser = build_parser()
+    try:
+        args = parser.parse_args(argv)
+    except SystemExit as ex:
+        return ex.code
+
+    return execute(parser, args, get_application(args))
+
+
+def main():
+    argv = sys.argv[1:]
+
+    args = parse_fast_arguments(argv)
+    if args:
+        status = execute(None, args, app.CartmanApp())
+        if status:
+            sys.exit(status)
+        return
+
+    from cartman import daemon
+
+    # The daemon is started and stopped before anything else, it has no use
+    # for the other arguments.
+    if argv[:1] == ["daemon"]:
+        try:
+            if argv[1:] == ["stop"]:
+                daemon.stop()
+            else:
+                daemon.serve(run)
+        except exceptions.FatalError as ex:
+            sys.stderr.write("{}: {}\n".format(ex.prefix, ex))
+            sys.exit(1)
+        return
+
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    from cartman import fanout
+
+    if fanout.is_multi_site(args.site):
+        status = execute(parser, args, fanout.MultiSiteApp())
+        if status:
+            sys.exit(status)
+        return
+
+    if not os.environ.get("CARTMAN_NO_DAEMON") and is_forwardable(args):
+        status = daemon.forward(argv)
+        if status is not None:
+            sys.exit(status)
+
+    status = execute(parser, args, app.CartmanApp())
+    if status:
+        sys.exit(status)
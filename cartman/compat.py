@@ -16,3 +16,14 @@ try:
     import ConfigParser as configparser
 except ImportError:
     import configparser
+
+try:
+    from urllib import quote, urlencode
+    from urlparse import parse_qsl
+except ImportError:
+    from urllib.parse import quote, urlencode, parse_qsl
+
+try:
+    string_types = basestring
+except NameError:
+    string_types = str
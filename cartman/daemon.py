@@ -0,0 +1,309 @@
+# Copyright (c) 2011-2023 Bertrand Janin <b@janin.com>
+#
+# Permission to use, copy, modify, and/or distribute this software for any
+# purpose with or without fee is hereby granted, provided that the above
+# copyright notice and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+# WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+# ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+# OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+
+"""
+Daemon keeping a warm ``CartmanApp`` per site, and the client forwarding the
+command-line arguments to it over a Unix socket.
+
+Both sides exchange JSON messages, one per line. The client sends the
+arguments, the daemon replies with the output of the command as it is
+produced (``out`` and ``err`` messages) followed by its exit status.
+"""
+
+import os
+import sys
+import json
+import socket
+import threading
+import traceback
+
+try:
+    import SocketServer as socketserver
+except ImportError:
+    import socketserver
+
+from cartman import app
+from cartman import exceptions
+
+
+SOCKET_NAME = "daemon.sock"
+
+
+def get_socket_path():
+    """Return the path of the socket the daemon listens on."""
+
+    return os.path.join(os.path.expanduser(app.BASE_DIRECTORY), SOCKET_NAME)
+
+
+def send_message(fp, message):
+    """Write one message on the socket.
+
+    :param fp: File object of the socket, in binary mode.
+    :param message: Dictionary to send.
+
+    """
+    fp.write((json.dumps(message) + "\n").encode("utf-8"))
+    fp.flush()
+
+
+class StreamWriter(object):
+
+    """
+    File-like object forwarding everything written to the client, used in
+    place of ``sys.stdout`` and ``sys.stderr`` while a command runs.
+    """
+
+    def __init__(self, fp, name):
+        self.fp = fp
+        self.name = name
+        self.broken = False
+
+    def write(self, data):
+        if not data or self.broken:
+            return
+
+        # If the client went away, the command still runs to completion but
+        # its output is dropped.
+        try:
+            send_message(self.fp, {self.name: data})
+        except socket.error:
+            self.broken = True
+
+    def flush(self):
+        pass
+
+
+class ThreadStream(object):
+
+    """
+    Stand-in for ``sys.stdout`` or ``sys.stderr`` while the daemon runs,
+    writing to the stream set for the current thread (the client of the
+    command it runs), to the original stream otherwise.
+    """
+
+    def __init__(self, default):
+        self.default = default
+        self.local = threading.local()
+
+    def set(self, stream):
+        self.local.stream = stream
+
+    def get(self):
+        return getattr(self.local, "stream", None) or self.default
+
+    def write(self, data):
+        self.get().write(data)
+
+    def flush(self):
+        self.get().flush()
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline().decode("utf-8"))
+        except ValueError:
+            return
+
+        if request.get("stop"):
+            send_message(self.wfile, {"exit": 0})
+            self.server.shutdown()
+            return
+
+        acquired = []
+
+        def get_application(args):
+            application = self.server.acquire_application(args)
+            acquired.append((args, application))
+            return application
+
+        self.server.stdout.set(StreamWriter(self.wfile, "out"))
+        self.server.stderr.set(StreamWriter(self.wfile, "err"))
+        try:
+            status = self.server.run(request["argv"], get_application)
+        except Exception:
+            traceback.print_exc()
+            status = 1
+        finally:
+            self.server.stdout.set(None)
+            self.server.stderr.set(None)
+            for args, application in acquired:
+                self.server.release_application(args, application)
+
+        try:
+            send_message(self.wfile, {"exit": status or 0})
+        except socket.error:
+            pass
+
+
+class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+
+    """
+    Handles each command in a thread of its own, keeping the ``CartmanApp``
+    instances (and their HTTP session) alive for each site. An instance only
+    runs one command at a time, a command started while all of them are busy
+    gets a new one.
+    """
+
+    def __init__(self, path, run):
+        """
+        :param path: Path of the Unix socket to listen on.
+        :param run: Function running a command given the arguments and a
+                    function returning the ``CartmanApp`` to use (see
+                    ``cartman.cli.run``).
+        """
+        self.run = run
+        self.applications = {}
+        self.lock = threading.Lock()
+        self.stdout = ThreadStream(sys.stdout)
+        self.stderr = ThreadStream(sys.stderr)
+        socketserver.UnixStreamServer.__init__(self, path, RequestHandler)
+
+    def acquire_application(self, args):
+        """Return an idle application for the site of the command, to give
+        back with ``release_application()``."""
+
+        site = args.site or "trac"
+
+        with self.lock:
+            idle = self.applications.setdefault(site, [])
+            if idle:
+                return idle.pop()
+
+        return app.CartmanApp()
+
+    def release_application(self, args, application):
+        with self.lock:
+            self.applications[args.site or "trac"].append(application)
+
+    def handle_error(self, request, client_address):
+        traceback.print_exc()
+
+
+def connect(path):
+    """Return a socket connected to the daemon, None if none is running.
+
+    :param path: Path of the Unix socket of the daemon.
+
+    """
+    if not hasattr(socket, "AF_UNIX") or not os.path.exists(path):
+        return None
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except socket.error:
+        sock.close()
+        return None
+
+    return sock
+
+
+def serve(run, path=None):
+    """Run the daemon until it is stopped.
+
+    :param run: Function running a command (see ``Server``).
+    :param path: Path of the Unix socket, defaults to ~/.cartman/daemon.sock.
+
+    """
+    path = path or get_socket_path()
+
+    sock = connect(path)
+    if sock:
+        sock.close()
+        raise exceptions.FatalError("a daemon is already running on {}"
+                                    .format(path))
+
+    # Left over by a daemon that did not exit cleanly.
+    if os.path.exists(path):
+        os.unlink(path)
+
+    directory = os.path.dirname(path)
+    if not os.path.exists(directory):
+        os.makedirs(directory, 0o750)
+
+    # The configuration read from the environment is the one of the client,
+    # which only forwards its commands without any (see ``is_forwardable``).
+    for name in app.ENVIRONMENT_OVERRIDES:
+        os.environ.pop(name, None)
+
+    server = Server(path, run)
+    os.chmod(path, 0o600)
+
+    stdout, stderr = sys.stdout, sys.stderr
+    sys.stdout, sys.stderr = server.stdout, server.stderr
+    try:
+        server.serve_forever(poll_interval=0.1)
+    finally:
+        sys.stdout, sys.stderr = stdout, stderr
+        # Waits for the commands still running.
+        server.server_close()
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+def forward(argv, path=None, stdout=None, stderr=None):
+    """Run a command through the daemon, returns its exit status or None if
+    no daemon is running.
+
+    :param argv: List of command-line arguments (without the program name).
+    :param path: Path of the Unix socket, defaults to ~/.cartman/daemon.sock.
+    :param stdout: Where to write the output (default: ``sys.stdout``).
+    :param stderr: Where to write the errors (default: ``sys.stderr``).
+
+    """
+    stdout = stdout or sys.stdout
+    stderr = stderr or sys.stderr
+
+    sock = connect(path or get_socket_path())
+    if sock is None:
+        return None
+
+    try:
+        fp = sock.makefile("rwb")
+        send_message(fp, {"argv": argv})
+
+        for line in fp:
+            message = json.loads(line.decode("utf-8"))
+            if "out" in message:
+                stdout.write(message["out"])
+                stdout.flush()
+            elif "err" in message:
+                stderr.write(message["err"])
+            elif "exit" in message:
+                return message["exit"]
+    finally:
+        sock.close()
+
+    stderr.write("error: lost the connection with the daemon\n")
+    return 1
+
+
+def stop(path=None):
+    """Ask the running daemon to exit.
+
+    :param path: Path of the Unix socket, defaults to ~/.cartman/daemon.sock.
+
+    """
+    sock = connect(path or get_socket_path())
+    if sock is None:
+        raise exceptions.FatalError("no daemon running")
+
+    try:
+        fp = sock.makefile("rwb")
+        send_message(fp, {"stop": True})
+        fp.readline()
+    finally:
+        sock.close()
@@ -45,3 +45,12 @@ class RequestException(FatalError):
 
 class LoginError(RequestException):
     """Raise when unable to login."""
+
+
+class BatchError(FatalError):
+    """Some of the operations of a batch failed, ``output`` holds the report
+    of all the operations."""
+
+    def __init__(self, message, output):
+        FatalError.__init__(self, message)
+        self.output = output
@@ -0,0 +1,178 @@
+# Copyright (c) 2011-2023 Bertrand Janin <b@janin.com>
+#
+# Permission to use, copy, modify, and/or distribute this software for any
+# purpose with or without fee is hereby granted, provided that the above
+# copyright notice and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+# WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+# ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+# OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+
+"""
+Export of the rows of a report or query to a file, written page by page with
+a checkpoint to resume an interrupted export.
+"""
+
+import os
+import csv
+import json
+import gzip
+from collections import OrderedDict
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+from cartman import exceptions
+
+
+def format_csv_row(values):
+    """Return a row of values as a line of CSV."""
+
+    fp = StringIO()
+    csv.writer(fp).writerow(values)
+    return fp.getvalue()
+
+
+class Export(object):
+
+    """
+    File of an export and its checkpoint. Each page of rows is appended to
+    the file, as a gzip member of its own if the file name ends with
+    ``.gz``, then the checkpoint records the size of the file and the number
+    of the page. Resuming truncates the file to that size, dropping a page
+    partially written.
+
+    The rows are written as JSON lines, or CSV if the file name ends with
+    ``.csv`` (or ``.csv.gz``).
+    """
+
+    def __init__(self, path, source):
+        self.path = path
+        self.source = source
+        self.checkpoint_path = path + ".checkpoint"
+        self.compressed = path.endswith(".gz")
+        if self.compressed:
+            path = path[:-3]
+        self.format = "csv" if path.endswith(".csv") else "jsonl"
+        self.page = 0
+        self.rows = 0
+        self.offset = 0
+        self.header = None
+
+    def load_checkpoint(self):
+        """Resume from the checkpoint of a previous export of the same
+        source, return True if there is one."""
+
+        try:
+            with open(self.checkpoint_path) as fp:
+                checkpoint = json.load(fp)
+        except (IOError, ValueError):
+            return False
+
+        if checkpoint["source"] != self.source:
+            raise exceptions.FatalError(
+                "{} is an export of {} (remove {} to start over)".format(
+                    self.path, checkpoint["source"], self.checkpoint_path))
+
+        # Appending rows of another format (or compression) would corrupt
+        # the file.
+        if (checkpoint.get("format") != self.format or
+                checkpoint.get("compressed") != self.compressed):
+            raise exceptions.FatalError(
+                "{} was started as {}{} (remove {} to start over)".format(
+                    self.path, checkpoint.get("format"),
+                    " (gzip)" if checkpoint.get("compressed") else "",
+                    self.checkpoint_path))
+
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            size = -1
+        if size < checkpoint["offset"]:
+            raise exceptions.FatalError(
+                "{} is shorter than its checkpoint (remove {} to start "
+                "over)".format(self.path, self.checkpoint_path))
+
+        self.page = checkpoint["page"]
+        self.rows = checkpoint["rows"]
+        self.offset = checkpoint["offset"]
+        self.header = checkpoint["header"]
+
+        return True
+
+    def save_checkpoint(self):
+        checkpoint = {
+            "source": self.source,
+            "format": self.format,
+            "compressed": self.compressed,
+            "page": self.page,
+            "rows": self.rows,
+            "offset": self.offset,
+            "header": self.header,
+        }
+
+        temp_path = self.checkpoint_path + ".tmp"
+        with open(temp_path, "w") as fp:
+            json.dump(checkpoint, fp)
+        os.rename(temp_path, self.checkpoint_path)
+
+    def format_row(self, row):
+        if self.format == "csv":
+            line = format_csv_row(row)
+        else:
+            line = json.dumps(OrderedDict(zip(self.header, row))) + "\n"
+        return line.encode("utf-8")
+
+    def write_page(self, header, rows):
+        """Append a page of rows to the file, return the number of rows.
+
+        :param header: Names of the columns, None for an empty result.
+        :param rows: Iterable of lists of values, written as they come.
+
+        """
+        if self.header is None:
+            self.header = header
+        elif header is not None and header != self.header:
+            raise exceptions.FatalError("the columns changed during the "
+                                        "export, remove {} to start over"
+                                        .format(self.checkpoint_path))
+
+        count = 0
+        mode = "r+b" if self.offset else "wb"
+        with open(self.path, mode) as fp:
+            fp.seek(self.offset)
+            fp.truncate()
+
+            out = fp
+            if self.compressed:
+                out = gzip.GzipFile(fileobj=fp, mode="wb")
+
+            if header is not None:
+                if self.format == "csv" and not self.offset:
+                    out.write(format_csv_row(header).encode("utf-8"))
+                for row in rows:
+                    out.write(self.format_row(row))
+                    count += 1
+
+            if self.compressed:
+                out.close()
+            fp.flush()
+            os.fsync(fp.fileno())
+            self.offset = fp.tell()
+
+        self.page += 1
+        self.rows += count
+        self.save_checkpoint()
+
+        return count
+
+    def finish(self):
+        """Remove the checkpoint of the completed export."""
+
+        os.remove(self.checkpoint_path)
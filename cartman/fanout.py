@@ -0,0 +1,213 @@
+# Copyright (c) 2011-2023 Bertrand Janin <b@janin.com>
+#
+# Permission to use, copy, modify, and/or distribute this software for any
+# purpose with or without fee is hereby granted, provided that the above
+# copyright notice and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+# WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+# ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+# OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+
+"""
+Run a read command on several sites concurrently (``-s a,b,c`` or ``-s
+all``), merging their output.
+"""
+
+import sys
+import copy
+import threading
+from collections import OrderedDict
+
+from cartman import app
+from cartman import exceptions
+
+
+# Commands which can run on several sites at once, they only read.
+FANOUT_COMMANDS = ("properties", "report", "reports", "search", "timeline",
+                   "view")
+
+
+def is_multi_site(site):
+    """Returns True if the ``-s`` argument names more than one site.
+
+    :param site: Value of the ``-s`` argument, may be None.
+
+    """
+    return site is not None and (site == "all" or "," in site)
+
+
+class Printer(object):
+
+    """
+    Output shared by the applications of each site, the lines are written
+    whole and tagged with their site: prefixed with ``[site]`` as text, with
+    a ``site`` field otherwise (see ``SiteApp.format_items()``).
+    """
+
+    def __init__(self, output_format):
+        self.output_format = output_format
+        self.lock = threading.Lock()
+        self.started = set()
+        self.headers = set()
+
+    def write(self, site, line):
+        with self.lock:
+            first = site not in self.started
+            self.started.add(site)
+
+            if self.output_format == "text":
+                line = u"\n".join(u"[{}] {}".format(site, l)
+                                  for l in u"{}".format(line).split("\n"))
+            elif self.output_format == "tsv" and first:
+                # Sites with the same columns share the header line.
+                if line in self.headers:
+                    return
+                self.headers.add(line)
+
+            sys.stdout.write(line + "\n")
+
+    def error(self, site, message):
+        with self.lock:
+            sys.stdout.flush()
+            sys.stderr.write(u"[{}] {}\n".format(site, message))
+
+
+class SiteApp(app.CartmanApp):
+
+    """
+    Application of one of the sites, writing its output to the shared
+    ``Printer``.
+    """
+
+    def __init__(self, site, printer):
+        app.CartmanApp.__init__(self)
+        self.site = site
+        self.printer = printer
+
+    def format_items(self, items, format_text, as_dict=None):
+        if self.output_format == "text":
+            return app.CartmanApp.format_items(self, items, format_text)
+
+        def as_site_dict(item):
+            fields = OrderedDict([("site", self.site)])
+            fields.update(as_dict(item) if as_dict else item)
+            return fields
+
+        return app.CartmanApp.format_items(self, items, format_text,
+                                           as_site_dict)
+
+    def call_command(self, func, func_name, parameters):
+        # Invalid parameters fail the site like any other error, instead of
+        # printing the help between the lines of the other sites.
+        output = func(*parameters)
+        self.save_session()
+        self.print_output(output)
+
+    def warn(self, message):
+        self.printer.error(self.site, u"warning: {}".format(message))
+
+    def print_output(self, output):
+        if not output:
+            return
+
+        for line in output:
+            self.printer.write(self.site, line)
+
+
+class MultiSiteApp(object):
+
+    """
+    Stand-in for ``CartmanApp`` running the command with one application
+    per site, each in its own thread.
+    """
+
+    def get_sites(self, site):
+        """Return the list of sites named by the ``-s`` argument.
+
+        :param site: Comma-separated list of sites or "all".
+
+        """
+        if site == "all":
+            sites = app.get_sites()
+            if not sites:
+                raise exceptions.ConfigError("no site configured")
+            return sites
+
+        sites = []
+        for name in site.split(","):
+            name = name.strip()
+            if name and name not in sites:
+                sites.append(name)
+        return sites
+
+    def run(self, args):
+        """Run the command on each site, raise a ``FatalError`` if it failed
+        on any of them.
+
+        :param args: Arguments returned from the argparse module.
+
+        """
+        if args.command not in FANOUT_COMMANDS:
+            raise exceptions.UsageException(
+                "only {} can run on several sites".format(
+                    ", ".join(FANOUT_COMMANDS)))
+
+        # The help is the same for all the sites.
+        if "help" in args.parameters:
+            app.CartmanApp().print_function_help("run_" + args.command)
+            return
+
+        printer = Printer(args.format)
+        applications = [SiteApp(site, printer)
+                        for site in self.get_sites(args.site)]
+        failed = []
+
+        # The ids read from stdin (e.g. view -) are given to all the sites,
+        # only the first thread would get them otherwise.
+        parameters = list(args.parameters)
+        if "-" in parameters:
+            parameters[parameters.index("-")] = sys.stdin.read()
+
+        # Created once, the threads would race for it.
+        applications[0].ensure_directories()
+
+        def run_site(application):
+            site_args = copy.copy(args)
+            site_args.site = application.site
+            site_args.parameters = list(parameters)
+
+            try:
+                application.run(site_args)
+            except exceptions.CartmanException as ex:
+                printer.error(application.site,
+                              u"{}: {}".format(ex.prefix, ex))
+                failed.append(application.site)
+            except Exception as ex:
+                printer.error(application.site, u"error: {}".format(ex))
+                failed.append(application.site)
+
+        threads = []
+        for application in applications:
+            thread = threading.Thread(target=run_site, args=(application,))
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+
+        # The threads are left to die with the process if interrupted (e.g.
+        # timeline --follow).
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(1)
+        except KeyboardInterrupt:
+            return
+
+        if failed:
+            raise exceptions.FatalError("failed on {} of {} site(s): {}"
+                                        .format(len(failed),
+                                                len(applications),
+                                                ", ".join(sorted(failed))))
@@ -0,0 +1,288 @@
+# Copyright (c) 2011-2023 Bertrand Janin <b@janin.com>
+#
+# Permission to use, copy, modify, and/or distribute this software for any
+# purpose with or without fee is hereby granted, provided that the above
+# copyright notice and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+# WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+# ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+# OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+
+"""
+Local SQLite mirror of the tickets of a Trac site.
+"""
+
+import json
+import sqlite3
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ticket (
+    id INTEGER PRIMARY KEY,
+    changetime TEXT,
+    data TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS report (
+    id INTEGER PRIMARY KEY,
+    columns TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS report_row (
+    report INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (report, position)
+);
+
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# Full-text index of the tickets, the rowid is the ticket id.
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS ticket_text
+USING fts5(summary, description);
+"""
+
+# Weight of the summary and description columns in the search ranking.
+FTS_WEIGHTS = (10.0, 1.0)
+
+
+class Mirror(object):
+
+    """
+    Tickets are stored as JSON dictionaries of the tab-delimited columns
+    returned by Trac, reports as the list of their rows at the time of the
+    last synchronization.
+    """
+
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(SCHEMA)
+
+        # Not all the SQLite builds come with FTS5, searches are then done
+        # with a plain scan of the tickets.
+        try:
+            self.connection.executescript(FTS_SCHEMA)
+            self.has_index = True
+        except sqlite3.OperationalError:
+            self.has_index = False
+
+        if self.has_index and not self.get_meta("indexed"):
+            self.rebuild_index()
+
+    def close(self):
+        self.connection.close()
+
+    def commit(self):
+        self.connection.commit()
+
+    def get_meta(self, name, default=None):
+        """Return a value stored in the meta table.
+
+        :param name: Name of the value.
+        :param default: Returned if the value was never stored.
+
+        """
+        cursor = self.connection.execute(
+                "SELECT value FROM meta WHERE name = ?", (name,))
+        row = cursor.fetchone()
+
+        if row is None:
+            return default
+
+        return row[0]
+
+    def set_meta(self, name, value):
+        """Store a value in the meta table.
+
+        :param name: Name of the value.
+        :param value: String value.
+
+        """
+        self.connection.execute(
+                "INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)",
+                (name, value))
+
+    def clear_tickets(self):
+        """Remove all the tickets, before a full synchronization."""
+
+        self.connection.execute("DELETE FROM ticket")
+        self.connection.execute("DELETE FROM meta WHERE name = 'changetime'")
+
+        if self.has_index:
+            self.connection.execute("DELETE FROM ticket_text")
+
+    def rebuild_index(self):
+        """Index all the mirrored tickets, e.g. for a mirror created before
+        the full-text index was available."""
+
+        self.connection.execute("DELETE FROM ticket_text")
+
+        cursor = self.connection.execute("SELECT id, data FROM ticket")
+        for ticket_id, data in cursor.fetchall():
+            self._index_ticket(ticket_id, json.loads(data))
+
+        self.set_meta("indexed", "1")
+        self.commit()
+
+    def _index_ticket(self, ticket_id, ticket_dict):
+        """Insert or update a ticket in the full-text index.
+
+        :param ticket_id: id of the ticket.
+        :param ticket_dict: Dictionary of the ticket columns.
+
+        """
+        self.connection.execute("DELETE FROM ticket_text WHERE rowid = ?",
+                                (ticket_id,))
+        self.connection.execute(
+                "INSERT INTO ticket_text (rowid, summary, description) "
+                "VALUES (?, ?, ?)",
+                (ticket_id, ticket_dict.get("summary", ""),
+                 ticket_dict.get("description", "")))
+
+    def store_tickets(self, columns, rows):
+        """Insert or update tickets, returns the number of rows stored.
+
+        The rows are expected to be ordered by ``changetime``, the last one
+        becomes the high-water mark for the next incremental update.
+
+        :param columns: List of column names (must include ``id`` and
+                        ``changetime``).
+        :param rows: Iterable of lists of values.
+
+        """
+        id_index = columns.index("id")
+        changetime_index = columns.index("changetime")
+        count = 0
+        changetime = None
+
+        for row in rows:
+            ticket_id = int(row[id_index])
+            ticket_dict = dict(zip(columns, row))
+            changetime = row[changetime_index]
+            self.connection.execute(
+                    "INSERT OR REPLACE INTO ticket (id, changetime, data) "
+                    "VALUES (?, ?, ?)",
+                    (ticket_id, changetime, json.dumps(ticket_dict)))
+            if self.has_index:
+                self._index_ticket(ticket_id, ticket_dict)
+            count += 1
+
+        if changetime is not None:
+            self.set_meta("changetime", changetime)
+
+        return count
+
+    def get_ticket(self, ticket_id):
+        """Return the dictionary of a ticket or None if it was not mirrored.
+
+        :param ticket_id: id of the ticket.
+
+        """
+        cursor = self.connection.execute(
+                "SELECT data FROM ticket WHERE id = ?", (ticket_id,))
+        row = cursor.fetchone()
+
+        if row is None:
+            return None
+
+        return json.loads(row[0])
+
+    def search(self, terms, limit=None):
+        """Return the dictionaries of the tickets whose summary or description
+        contain all the given terms, best matches first.
+
+        :param terms: List of words to look for.
+        :param limit: Maximum number of tickets to return.
+
+        """
+        if self.has_index:
+            # Quote each term to avoid them being interpreted as FTS5 syntax.
+            match = " ".join('"{}"'.format(term.replace('"', '""'))
+                             for term in terms)
+            sql = ("SELECT ticket.data FROM ticket_text "
+                   "JOIN ticket ON ticket.id = ticket_text.rowid "
+                   "WHERE ticket_text MATCH ? "
+                   "ORDER BY bm25(ticket_text, {}, {}), ticket.id DESC"
+                   .format(*FTS_WEIGHTS))
+            params = [match]
+        else:
+            conditions = []
+            params = []
+            for term in terms:
+                conditions.append("data LIKE ?")
+                params.append("%{}%".format(term))
+            sql = ("SELECT data FROM ticket WHERE {} ORDER BY id DESC"
+                   .format(" AND ".join(conditions) or "1"))
+
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        cursor = self.connection.execute(sql, params)
+
+        return [json.loads(row[0]) for row in cursor]
+
+    def count_tickets(self):
+        """Return the number of tickets mirrored."""
+
+        return self.connection.execute(
+                "SELECT COUNT(*) FROM ticket").fetchone()[0]
+
+    def store_report(self, report_id, columns, rows):
+        """Replace the rows of a report, returns the number of rows stored.
+
+        :param report_id: id of the report.
+        :param columns: List of column names.
+        :param rows: Iterable of lists of values.
+
+        """
+        self.connection.execute(
+                "INSERT OR REPLACE INTO report (id, columns) VALUES (?, ?)",
+                (report_id, json.dumps(columns)))
+        self.connection.execute(
+                "DELETE FROM report_row WHERE report = ?", (report_id,))
+
+        count = 0
+        for position, row in enumerate(rows):
+            self.connection.execute(
+                    "INSERT INTO report_row (report, position, data) "
+                    "VALUES (?, ?, ?)",
+                    (report_id, position, json.dumps(row)))
+            count += 1
+
+        return count
+
+    def get_report_ids(self):
+        """Return the ids of all the mirrored reports."""
+
+        cursor = self.connection.execute("SELECT id FROM report ORDER BY id")
+        return [row[0] for row in cursor]
+
+    def get_report(self, report_id):
+        """Return the columns and rows of a mirrored report, None if the
+        report was never synchronized.
+
+        :param report_id: id of the report.
+
+        """
+        cursor = self.connection.execute(
+                "SELECT columns FROM report WHERE id = ?", (report_id,))
+        row = cursor.fetchone()
+
+        if row is None:
+            return None
+
+        cursor = self.connection.execute(
+                "SELECT data FROM report_row WHERE report = ? "
+                "ORDER BY position", (report_id,))
+
+        return json.loads(row[0]), [json.loads(r[0]) for r in cursor]
@@ -0,0 +1,122 @@
+# Copyright (c) 2011-2023 Bertrand Janin <b@janin.com>
+#
+# Permission to use, copy, modify, and/or distribute this software for any
+# purpose with or without fee is hereby granted, provided that the above
+# copyright notice and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+# WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+# ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+# OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+
+"""
+Persistence of the authenticated session (cookie jar) between runs.
+"""
+
+import os
+import re
+import time
+
+# Not in cartman.compat, since it imports urllib.request which is too slow to
+# load for the commands not using the session.
+try:
+    import cookielib
+except ImportError:
+    import http.cookiejar as cookielib
+
+
+# Name of the cookie Trac uses to keep track of an authenticated user.
+AUTH_COOKIE = "trac_auth"
+
+# Trac tells the client to drop an authentication cookie it does not know
+# (anymore) by setting it again with an empty value.
+re_expired_auth = re.compile(r'(?:^|,)\s*' + AUTH_COOKIE +
+                             r'=(?:""|(?=\s*(?:;|,|$)))')
+
+
+def has_auth_cookie(cookies):
+    """Returns True if the given cookie jar holds a Trac authentication
+    cookie.
+
+    :param cookies: Any iterable of ``Cookie`` instances.
+
+    """
+    for cookie in cookies:
+        if cookie.name == AUTH_COOKIE:
+            return True
+
+    return False
+
+
+def is_auth_expired(response):
+    """Returns True if the server expired the authentication cookie with the
+    given response.
+
+    :param response: Response from the server, only its headers are read.
+
+    """
+    header = response.headers.get("Set-Cookie", "")
+    return re_expired_auth.search(header) is not None
+
+
+def load(cookies, path, lifetime=0):
+    """Copy the cookies stored at ``path`` into the given cookie jar.
+
+    Expired cookies are dropped, the whole file is ignored (and removed) if it
+    is older than ``lifetime`` seconds. Returns True if an authentication
+    cookie was restored.
+
+    :param cookies: Cookie jar to populate, typically ``session.cookies``.
+    :param path: Location of the stored cookie jar.
+    :param lifetime: Maximum age of the stored jar in seconds, 0 for no limit.
+
+    """
+    if not os.path.exists(path):
+        return False
+
+    if lifetime and time.time() - os.path.getmtime(path) > lifetime:
+        clear(path)
+        return False
+
+    jar = cookielib.LWPCookieJar(path)
+    try:
+        jar.load(ignore_discard=True)
+    except (IOError, cookielib.LoadError):
+        return False
+
+    for cookie in jar:
+        cookies.set_cookie(cookie)
+
+    return has_auth_cookie(jar)
+
+
+def save(cookies, path):
+    """Store the given cookie jar at ``path``, readable only by the owner.
+
+    Session cookies (without expiration) are kept, Trac does not set any
+    expiration on ``trac_auth`` by default.
+
+    :param cookies: Cookie jar to save, typically ``session.cookies``.
+    :param path: Location of the stored cookie jar.
+
+    """
+    jar = cookielib.LWPCookieJar(path)
+    for cookie in cookies:
+        jar.set_cookie(cookie)
+
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    os.close(fd)
+    jar.save(ignore_discard=True)
+
+
+def clear(path):
+    """Remove a stored cookie jar, if any.
+
+    :param path: Location of the stored cookie jar.
+
+    """
+    if os.path.exists(path):
+        os.unlink(path)
@@ -18,7 +18,6 @@ Various text processing functions.
 
 import re
 import json
-import difflib
 
 from cartman import exceptions
 
@@ -32,6 +31,157 @@ re_timeline_items = re.compile(
                               r'<span class="time">[^<]+</span>[^<]*'
                               r'<em[^>]*>([^<]*)</em>(.*)'
                               )
+re_login_link = re.compile(r'<a href="[^"]*/login">')
+re_page_beyond = re.compile(r"Page \d+ is beyond the number of pages")
+
+# Everything needed from a ticket page, matched in a single scan. All the
+# alternatives start with a tag, the scan only stops on "<" characters. The
+# attributes of an input stop at the next tag, an unclosed input would
+# otherwise be matched against the rest of the page.
+re_ticket_page = re.compile(
+    r'<(?:input (?P<input>[^<>]*)>'
+    r'|span class="status">\((?P<status_v0>\w+) \w+(?:: \w+)?\)</span>'
+    r'|span class="trac-status">\s+<a href="[^"]+">(?P<status_v1>\w+)</a>'
+    r'|p class="message">(?P<message>[^<]+)</p>'
+    r'|strong>Trac (?P<major>\d+)\.(?P<minor>\d+))'
+)
+re_input_name = re.compile(r'\bname="([^"]+)"')
+re_input_value = re.compile(r'\bvalue="([^"]+)"')
+
+
+class FuzzyIndex(object):
+
+    """
+    List of options indexed for ``fuzzy_find()``, to be built once and
+    searched for many values (e.g. each field of each new ticket).
+
+    The lowercase options are indexed by token, and by length and character
+    for the close matches: ``difflib`` only compares the value with the
+    options of a compatible length having enough characters in common, the
+    same bounds ``get_close_matches()`` checks on every option.
+
+    The candidates are pruned on single characters rather than n-grams: the
+    characters in common bound the ``difflib`` ratio, the bigrams in common
+    do not (the matching blocks may be a single character long), pruning on
+    them would drop some of the close matches.
+    """
+
+    def __init__(self, options, cutoff=0.6):
+        """
+        :param options: List of real, system understood values.
+        :param cutoff: Minimum similarity of the close matches (see
+                       ``difflib.get_close_matches()``).
+
+        """
+        self.values = tuple(options)
+        self.valid = frozenset(self.values)
+        self.cutoff = cutoff
+        self.options = {}
+        self.tokens = {}
+        self.characters = None
+
+        for option in self.values:
+            self.options[option.lower()] = option
+
+        for key in self.options:
+            for token in set(key.split()):
+                self.tokens.setdefault(token, []).append(key)
+
+    def __contains__(self, value):
+        return value in self.valid
+
+    def index_characters(self):
+        """Build the index of the characters of each option, by length of
+        option, only needed for the close matches."""
+
+        self.characters = {}
+
+        for key in self.options:
+            counts = {}
+            for char in key:
+                counts[char] = counts.get(char, 0) + 1
+
+            postings = self.characters.setdefault(len(key), {})
+            for char, count in counts.items():
+                postings.setdefault(char, []).append((key, count))
+
+    def get_close_matches(self, value, limit=2):
+        """Return up to ``limit`` lowercase options similar to the value,
+        with a ratio of at least ``cutoff``.
+
+        :param value: Lowercase value.
+        :param limit: Maximum number of matches returned.
+
+        """
+        import difflib
+
+        if self.characters is None:
+            self.index_characters()
+
+        counts = {}
+        for char in value:
+            counts[char] = counts.get(char, 0) + 1
+
+        matcher = difflib.SequenceMatcher()
+        matcher.set_seq2(value)
+        matches = []
+
+        for length, postings in self.characters.items():
+            total = len(value) + length
+
+            # Upper bound from the lengths (see real_quick_ratio()).
+            if 2.0 * min(len(value), length) / total < self.cutoff:
+                continue
+
+            # Upper bound from the characters in common (see quick_ratio()).
+            common = {}
+            for char, count in counts.items():
+                for key, key_count in postings.get(char, ()):
+                    common[key] = common.get(key, 0) + min(count, key_count)
+
+            for key, count in common.items():
+                if 2.0 * count / total < self.cutoff:
+                    continue
+
+                matcher.set_seq1(key)
+                if matcher.ratio() >= self.cutoff:
+                    matches.append(key)
+                    if len(matches) == limit:
+                        return matches
+
+        return matches
+
+    def find(self, value):
+        """Return the one option that should be the closest match, or None.
+        See ``fuzzy_find()``.
+
+        :param value: User-entered words.
+
+        """
+        value = value.lower()
+
+        if value in self.options:
+            return self.options[value]
+
+        # If we have a single match on tokenized options, that's probably good
+        # enough.
+        tokenized_matches = self.tokens.get(value, [])
+
+        if len(tokenized_matches) == 1:
+            return self.options[tokenized_matches[0]]
+
+        # Only a single close match is of any use, no need to look for more
+        # than two.
+        matches = self.get_close_matches(value)
+
+        if not matches and self.options:
+            pattern = re.compile(r".*\b{}\b.*".format(value))
+            matches = [key for key in self.options if pattern.match(key)]
+
+        if len(matches) == 1:
+            return self.options[matches.pop()]
+
+        return None
 
 
 def fuzzy_find(value, options):
@@ -40,39 +190,13 @@ def fuzzy_find(value, options):
     potential typos in exact matches, then we do a word-match using regular
     expressions.
 
+    Build a ``FuzzyIndex`` instead to search the same options repeatedly.
+
     :param value: User-entered words.
     :param options: List of real, system understood values.
 
     """
-    value = value.lower()
-    options = {opt.lower(): opt for opt in options}
-
-    if value in options.keys():
-        return options[value]
-
-    # If we have a single match on tokenized options, that's probably good
-    # enough.
-    tokenized_matches = []
-    for key, option in options.items():
-        tokens = key.split()
-        if value in tokens:
-            tokenized_matches.append(option)
-
-    if len(tokenized_matches) == 1:
-        return tokenized_matches[0]
-
-    matches = difflib.get_close_matches(value, options.keys())
-
-    if not matches:
-        for l_opt, opt in options.items():
-            pattern = r".*\b{}\b.*".format(value)
-            if re.match(pattern, l_opt):
-                matches.append(l_opt)
-
-    if len(matches) == 1:
-        return options[matches.pop()]
-
-    return None
+    return FuzzyIndex(options).find(value)
 
 
 def validate_id(raw_value):
@@ -90,78 +214,195 @@ def validate_id(raw_value):
     return converted_id
 
 
-def extract_timestamps_common(token, raw_html):
-    """Given a dump of HTML data, extract the timestamp and return it as a
-    string value.
+def validate_id_list(raw_value):
+    """Ensures the given raw string is a list of ids and ranges separated by
+    commas or white spaces (e.g. ``12,15,20-40``) and returns the list of ids,
+    without duplicates, in the given order.
 
-    :param raw_html: Dump from the ticket page.
+    :param raw_value: Entity ids as a string.
 
     """
-    regex = r"""name="{}"\s*value="([^"]+)""".format(token)
+    ticket_ids = []
+    seen = set()
 
-    m = re.search(regex, raw_html, re.MULTILINE)
+    for token in re.split(r"[\s,]+", raw_value.strip()):
+        if not token:
+            continue
 
-    if m:
-        timestamp = m.group(1)
-    else:
-        raise exceptions.FatalError("unable to fetch timestamp")
+        if "-" in token:
+            start, _, end = token.partition("-")
+            start, end = validate_id(start), validate_id(end)
+            if start > end:
+                raise exceptions.InvalidParameter(
+                        "invalid range '{}'".format(token))
+            token_ids = range(start, end + 1)
+        else:
+            token_ids = [validate_id(token)]
 
-    return timestamp
+        for ticket_id in token_ids:
+            if ticket_id not in seen:
+                seen.add(ticket_id)
+                ticket_ids.append(ticket_id)
 
+    if not ticket_ids:
+        raise exceptions.InvalidParameter("no identifier given")
 
-def extract_timestamps_v0(raw_html):
-    return {
-        "ts": extract_timestamps_common("ts", raw_html),
-    }
+    return ticket_ids
 
 
-def extract_timestamps_v1(raw_html):
-    return {
-        "start_time": extract_timestamps_common("start_time", raw_html),
-        "view_time": extract_timestamps_common("view_time", raw_html),
-    }
+def format_id_list(ticket_ids):
+    """Return the shortest list of ids and ranges matching the given ids, in
+    the syntax of ``validate_id_list()`` and of the queries of Trac (e.g.
+    ``3-5,12``).
 
+    :param ticket_ids: List of ids, in any order.
 
-def extract_statuses(raw_html):
-    """Given a dump of HTML data, extract the timestamp and return it as a
-    string value.
+    """
+    ranges = []
+
+    for ticket_id in sorted(set(ticket_ids)):
+        if ranges and ranges[-1][1] == ticket_id - 1:
+            ranges[-1][1] = ticket_id
+        else:
+            ranges.append([ticket_id, ticket_id])
+
+    return ",".join(str(start) if start == end
+                    else "{}-{}".format(start, end)
+                    for start, end in ranges)
 
-    :param raw_html: Dump from the ticket page.
+
+def iter_lines(chunks):
+    """Split an iterable of text chunks into lines, keeping their line
+    terminator. Only ``\\n`` is considered a line break, anything else is
+    left to the consumer (e.g. ``\\r`` in quoted CSV fields).
+
+    :param chunks: Iterable of strings, typically from
+                   ``Response.iter_content()``.
 
     """
-    re_status = r'<input type="radio" [^<]+name="action" value="([^"]+)'
-    return re.findall(re_status, raw_html)
+    pending = ""
+
+    for chunk in chunks:
+        if not chunk:
+            continue
 
+        pending += chunk
+        start = 0
+        end = pending.find("\n")
+        while end != -1:
+            yield pending[start:end + 1]
+            start = end + 1
+            end = pending.find("\n", start)
+        pending = pending[start:]
 
-def extract_status_from_ticket_page_common(re_status, raw_html):
-    """Given a dump of the HTML ticket page, extract the current status of
-    a ticket.
+    if pending:
+        yield pending
 
-    TODO: return resolution and display it if any.
 
-    :param raw_html: Dump for the ticket page.
+class TicketPage(object):
 
     """
-    m = re.search(re_status, raw_html, re.MULTILINE)
+    Values extracted from the HTML page of a ticket in a single pass: the
+    form timestamps, the current status, the available actions, the error
+    message and the Trac version.
+    """
+
+    def __init__(self, raw_html, trac_version=None):
+        """Parse the given page.
+
+        :param raw_html: Dump from the ticket page.
+        :param trac_version: Version of the site, decides the timestamps and
+                             status format (default: the version mentioned in
+                             the page, if any).
+
+        """
+        self.timestamps = {}
+        self.actions = []
+        self.message = None
+        self.trac_version = ()
+        self._statuses = {}
+
+        for m in re_ticket_page.finditer(raw_html):
+            kind = m.lastgroup
+            if kind == "input":
+                self._parse_input(m.group("input"))
+            elif kind in ("status_v0", "status_v1"):
+                self._statuses.setdefault(kind, m.group(kind))
+            elif kind == "message":
+                if self.message is None:
+                    self.message = m.group("message")
+            elif not self.trac_version:
+                self.trac_version = (int(m.group("major")),
+                                     int(m.group("minor")))
+
+        self.version = trac_version or self.trac_version or (0, 0)
+
+    def _parse_input(self, attributes):
+        """Keep the timestamps and actions from the attributes of an input.
+
+        :param attributes: Content of the ``input`` tag.
+
+        """
+        name = re_input_name.search(attributes)
+        value = re_input_value.search(attributes)
+        if not name or not value:
+            return
+
+        name, value = name.group(1), value.group(1)
+        if name == "action":
+            if 'type="radio"' in attributes:
+                self.actions.append(value)
+        elif name in ("ts", "start_time", "view_time"):
+            self.timestamps.setdefault(name, value)
+
+    def get_timestamps(self):
+        """Return the timestamps to post back with a change, as a dictionary.
+        """
+        if self.version >= (1, 0):
+            names = ("start_time", "view_time")
+        else:
+            names = ("ts",)
+
+        timestamps = {}
+        for name in names:
+            if name not in self.timestamps:
+                raise exceptions.FatalError("unable to fetch timestamp")
+            timestamps[name] = self.timestamps[name]
+
+        return timestamps
+
+    def get_status(self):
+        """Return the current status of the ticket.
+
+        TODO: return resolution and display it if any.
+
+        """
+        if self.version >= (1, 0):
+            status = self._statuses.get("status_v1")
+        else:
+            status = self._statuses.get("status_v0")
+
+        if status is None:
+            raise exceptions.FatalError("unable to fetch ticket status")
+
+        return status
 
-    if m:
-        status = m.group(1)
-        # task_type = m.group(2)
-        # resolution = m.group(3)
-    else:
-        raise exceptions.FatalError("unable to fetch ticket status")
 
-    return status
+def extract_timestamps_v0(raw_html):
+    return TicketPage(raw_html, (0, 0)).get_timestamps()
+
 
+def extract_timestamps_v1(raw_html):
+    return TicketPage(raw_html, (1, 0)).get_timestamps()
 
-def extract_status_from_ticket_page_v0(raw_html):
-    re_status = r'<span class="status">\((\w+) (\w+)(?:: (\w+))?\)</span>'
-    return extract_status_from_ticket_page_common(re_status, raw_html)
 
+def extract_statuses(raw_html):
+    """Given a dump of HTML data, extract the available actions.
 
-def extract_status_from_ticket_page_v1(raw_html):
-    re_status = r'<span class="trac-status">[\s\n]+<a href="[^"]+">(\w+)</a>'
-    return extract_status_from_ticket_page_common(re_status, raw_html)
+    :param raw_html: Dump from the ticket page.
+
+    """
+    return TicketPage(raw_html).actions
 
 
 def extract_properties(raw_html):
@@ -213,6 +454,30 @@ def extract_message(raw_html):
     return None
 
 
+def is_logged_out(raw_html):
+    """Returns True if the page was rendered for an anonymous user, the
+    navigation bar then contains a link to the login page instead of the
+    "logged in as" notice.
+
+    :param raw_html: Dump from any page.
+
+    """
+    if "logged in as" in raw_html:
+        return False
+
+    return re_login_link.search(raw_html) is not None
+
+
+def is_beyond_last_page(message):
+    """Returns True if the error message is the one of Trac on a page of
+    results past the last one.
+
+    :param message: Message of the error page (see ``extract_message()``).
+
+    """
+    return re_page_beyond.search(message) is not None
+
+
 def extract_search_results(raw_html):
     """Returns the search results.
 
@@ -235,3 +500,47 @@ def extract_timeline_items(raw_html):
     results = re_timeline_items.findall(raw_html)
 
     return [(r[0], r[1]) for r in results]
+
+
+def extract_timeline_events(raw_xml):
+    """Returns the events of the RSS feed of the timeline, oldest first, see
+    ``HttpBackend.get_timeline_events()``.
+
+    :param raw_xml: Dump of the feed (bytes).
+
+    """
+    import email.utils
+    import xml.etree.ElementTree as ElementTree
+
+    try:
+        root = ElementTree.fromstring(raw_xml)
+    except ElementTree.ParseError:
+        raise exceptions.FatalError("unable to parse the timeline feed")
+
+    events = []
+
+    for item in root.iter("item"):
+        def get(tag):
+            return (item.findtext(tag) or "").strip()
+
+        published = email.utils.parsedate_tz(get("pubDate"))
+        if published is None:
+            continue
+
+        link = get("link")
+        m = re.search(r"/ticket/(\d+)", link)
+
+        events.append({
+            "time": email.utils.mktime_tz(published),
+            "id": get("guid") or u"{}/{}".format(link, get("pubDate")),
+            "ticket": int(m.group(1)) if m else None,
+            "title": get("title"),
+            "author": get("{http://purl.org/dc/elements/1.1/}creator") or
+            get("author"),
+            "link": link,
+            "description": get("description"),
+        })
+
+    events.sort(key=lambda e: e["time"])
+
+    return events
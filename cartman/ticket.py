@@ -12,6 +12,8 @@
 # ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
 # OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
 
+from collections import OrderedDict
+
 
 # This dictionary is used to translate different properties from the tab
 # delimited files to instance properties.
@@ -36,20 +38,60 @@ TYPES = {
     "id": int,
 }
 
+# Default value of each ticket attribute, used when a column is missing.
+DEFAULTS = (
+    ("id", 0),
+    ("type", "N/A"),
+    ("summary", "N/A"),
+    ("reporter", "N/A"),
+    ("description", "N/A"),
+    ("milestone", "N/A"),
+    ("component", "N/A"),
+    ("status", "unknown"),
+    ("owner", "unknown"),
+    ("resolution", ""),
+    ("version", ""),
+)
+
 
 class Ticket(object):
 
+    __slots__ = tuple(name for name, _ in DEFAULTS) + (
+        "_row",
+        "_extra_columns",
+        "_extra",
+    )
+
     def __init__(self):
-        self.id = 0
-        self.type = "N/A"
-        self.summary = "N/A"
-        self.reporter = "N/A"
-        self.description = "N/A"
-        self.milestone = "N/A"
-        self.status = "unknown"
-        self.owner = "unknown"
-        self.resolution = ""
-        self.version = ""
+        for name, value in DEFAULTS:
+            setattr(self, name, value)
+
+        self._row = ()
+        self._extra_columns = ()
+        self._extra = None
+
+    @property
+    def extra(self):
+        """Dictionary of the columns without a matching attribute (e.g.
+        custom fields), built on first access from the original row."""
+
+        if self._extra is None:
+            self._extra = dict((column, self._row[index])
+                               for column, index in self._extra_columns)
+
+        return self._extra
+
+    def as_dict(self):
+        """Return all the fields of the ticket, the attributes followed by
+        the extra columns (e.g. for ``--format=jsonl``)."""
+
+        fields = OrderedDict((name, getattr(self, name))
+                             for name, _ in DEFAULTS)
+
+        for column, value in self.extra.items():
+            fields.setdefault(column, value)
+
+        return fields
 
     def format_id(self):
         return "#{}.".format(self.id)
@@ -62,22 +104,68 @@ class Ticket(object):
         )
 
 
+def compile_factory(columns):
+    """Return a function creating a ticket from a row of values, given the
+    names of the columns of these rows (e.g. the header of a tab-delimited
+    file).
+
+    The translation and type casting rules are resolved once for all the
+    rows. The columns without translation are kept in the ``extra`` mapping
+    of each ticket.
+
+    :param columns: List of column names, in the order of the row values.
+
+    """
+    plan = []
+    extra_columns = []
+
+    for index, column in enumerate(columns):
+        name = TRANSLATIONS.get(column)
+        if name is None:
+            extra_columns.append((column, index))
+        else:
+            plan.append((name, index, TYPES.get(name)))
+
+    translated = set(name for name, _, _ in plan)
+    missing = [(name, value) for name, value in DEFAULTS
+               if name not in translated]
+    extra_columns = tuple(extra_columns)
+    column_count = len(columns)
+    new = Ticket.__new__
+
+    def factory(row):
+        if len(row) < column_count:
+            row = list(row) + [""] * (column_count - len(row))
+
+        ticket = new(Ticket)
+
+        for name, value in missing:
+            setattr(ticket, name, value)
+
+        for name, index, cast in plan:
+            value = row[index]
+            setattr(ticket, name, cast(value) if cast else value)
+
+        ticket._row = row
+        ticket._extra_columns = extra_columns
+        ticket._extra = None
+
+        return ticket
+
+    return factory
+
+
 def factory(ticket_dict):
     """Create a new ticket and copy the properties from a dictionary, with a
     few rules regarding translation and type casting.
 
+    Prefer ``compile_factory()`` when creating many tickets with the same
+    columns.
+
     :param ticket_dict: Dictionary as returned from the Trac system, typically
                         translated from a tab-delimited format by cartman.
     """
-    ticket = Ticket()
-
-    for src_name, dest_name in TRANSLATIONS.items():
-        if src_name in ticket_dict:
-            if dest_name in TYPES and TYPES[dest_name] == int:
-                value = int(ticket_dict[src_name])
-            else:
-                value = ticket_dict[src_name]
-
-            setattr(ticket, dest_name, value)
+    columns = list(ticket_dict.keys())
+    row = [ticket_dict[column] for column in columns]
 
-    return ticket
+    return compile_factory(columns)(row)
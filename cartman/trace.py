@@ -0,0 +1,128 @@
+# Copyright (c) 2011-2023 Bertrand Janin <b@janin.com>
+#
+# Permission to use, copy, modify, and/or distribute this software for any
+# purpose with or without fee is hereby granted, provided that the above
+# copyright notice and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+# WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+# ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+# OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+
+"""
+Consumer of the application events, for ``--trace`` and ``--trace-file``.
+"""
+
+import sys
+import json
+import time
+import threading
+
+
+class Tracer(object):
+
+    """
+    Hook of the application (see ``CartmanApp.emit()``), summing the time
+    spent in each phase and the requests made. The summary is printed on
+    stderr and/or each event is appended as a line of JSON to a file.
+
+    The phases may overlap, e.g. the login includes its request.
+    """
+
+    def __init__(self, command, verbose=False, path=None):
+        """
+        :param command: Name of the command traced.
+        :param verbose: Print the summary on stderr when finished.
+        :param path: File to append the events to, as JSON lines.
+
+        """
+        self.command = command
+        self.verbose = verbose
+        self.started = time.time()
+        self.lock = threading.Lock()
+        self.phases = {}
+        self.requests = 0
+        self.errors = 0
+        self.request_time = 0.0
+        self.bytes = 0
+        self.fp = open(path, "a") if path else None
+
+    def __call__(self, event, data):
+        with self.lock:
+            if event == "request_end":
+                self.requests += 1
+                self.request_time += data["elapsed"]
+                self.bytes += data.get("bytes") or 0
+                if data.get("error"):
+                    self.errors += 1
+            elif event == "stream_end":
+                self.bytes += data["bytes"]
+                self.add_phase("stream", data["elapsed"])
+            elif event == "phase_end":
+                self.add_phase(data["phase"], data["elapsed"])
+
+            self.write(event, data)
+
+    def add_phase(self, phase, elapsed):
+        count, total = self.phases.get(phase, (0, 0.0))
+        self.phases[phase] = (count + 1, total + elapsed)
+
+    def write(self, event, data):
+        if self.fp is None:
+            return
+
+        record = {"time": time.time(), "command": self.command,
+                  "event": event}
+        record.update(data)
+        self.fp.write(json.dumps(record) + "\n")
+
+    def get_summary(self):
+        """Return the totals as a dictionary."""
+
+        return {
+            "elapsed": time.time() - self.started,
+            "requests": self.requests,
+            "errors": self.errors,
+            "request_time": self.request_time,
+            "bytes": self.bytes,
+            "phases": dict((name, {"count": count, "elapsed": elapsed})
+                           for name, (count, elapsed) in self.phases.items()),
+        }
+
+    def format_summary(self, summary):
+        """Return the lines of the human-readable summary.
+
+        :param summary: Dictionary returned by ``get_summary()``.
+
+        """
+        lines = [
+            "trace: {} {:.3f}s".format(self.command, summary["elapsed"]),
+            "  {:<14} {:8.3f}s  {} request(s), {} error(s), {:.1f} KiB"
+            .format("network", summary["request_time"], summary["requests"],
+                    summary["errors"], summary["bytes"] / 1024.0),
+        ]
+
+        for name, phase in sorted(summary["phases"].items()):
+            lines.append("  {:<14} {:8.3f}s  x{}".format(
+                name, phase["elapsed"], phase["count"]))
+
+        return lines
+
+    def finish(self):
+        """Print and/or store the summary, close the trace file."""
+
+        with self.lock:
+            summary = self.get_summary()
+
+            if self.verbose:
+                for line in self.format_summary(summary):
+                    sys.stderr.write(line + "\n")
+
+            self.write("summary", summary)
+
+            if self.fp is not None:
+                self.fp.close()
+                self.fp = None
@@ -16,6 +16,8 @@
 Helper functions for console display interface.
 """
 
+import json
+
 
 def underline(text):
     """Given a string, return a series of dash with the same length.
@@ -35,3 +37,47 @@ def title(text):
         return ""
 
     return "{}\n{}".format(text, underline(text))
+
+
+def format_tsv_value(value):
+    """Return a value for a tab-delimited line, the backslashes, tabs and
+    line breaks are escaped to keep each record on one line.
+
+    :param value: Any value, None is an empty string, dictionaries and lists
+                  are written as JSON.
+    """
+    if value is None:
+        return ""
+
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value)
+    elif not isinstance(value, type(u"")):
+        value = u"{}".format(value)
+
+    return (value.replace("\\", "\\\\").replace("\t", "\\t")
+            .replace("\n", "\\n").replace("\r", "\\r"))
+
+
+def iter_jsonl(records):
+    """Yield each record as a line of JSON.
+
+    :param records: Iterable of dictionaries.
+    """
+    for record in records:
+        yield json.dumps(record)
+
+
+def iter_tsv(records):
+    """Yield a header followed by each record as a tab-delimited line. The
+    columns are the keys of the first record.
+
+    :param records: Iterable of dictionaries.
+    """
+    columns = None
+
+    for record in records:
+        if columns is None:
+            columns = list(record.keys())
+            yield u"\t".join(format_tsv_value(c) for c in columns)
+
+        yield u"\t".join(format_tsv_value(record.get(c)) for c in columns)
@@ -1,6 +1,12 @@
+import os
+import json
+import time
+import email.utils
+import shutil
+import tempfile
 import unittest
 
-from cartman import app, exceptions
+from cartman import app, backends, exceptions, text
 
 
 class DummyBrowser:
@@ -15,6 +21,15 @@ class DummyResponse:
         self.status_code = status_code
         self.text = text
         self.content = text
+        self.encoding = "utf-8"
+        self.headers = {}
+
+    def iter_content(self, chunk_size=1, decode_unicode=False):
+        for i in range(0, len(self.text), chunk_size):
+            yield self.text[i:i + chunk_size]
+
+    def close(self):
+        pass
 
 
 class TestableApp(app.CartmanApp):
@@ -22,6 +37,7 @@ class TestableApp(app.CartmanApp):
     def __init__(self):
         app.CartmanApp.__init__(self)
         self.browser = DummyBrowser()
+        self.backend = backends.HttpBackend(self)
         self.trac_version = (0, 12)
         self.output = None
 
@@ -42,18 +58,21 @@ class TestableApp(app.CartmanApp):
         self.password = "nosetests"
         self.auth_type = "basic"
         self.verify_ssl_cert = True
+        self.session_lifetime = 0
+        self.properties_ttl = 0
+        self.cache_size = 0
         self.required_fields = ["To", "Milestone", "Component", "Subject"]
         self.default_fields = ["To", "Cc", "Subject", "Component", "Milestone"]
 
     def login(self):
         pass
 
-    def get(self, query_string, data=None):
+    def get(self, query_string, data=None, **kwargs):
         return self.responses.pop(0)
 
     def print_output(self, output):
         """Store the output for testing purpose."""
-        self.output = output
+        self.output = list(output) if output is not None else None
 
     post = get
 
@@ -69,6 +88,17 @@ class DummyArgs:
         self.message = None
         self.template = None
         self.message_file = None
+        self.refresh = False
+        self.jobs = 1
+        self.offline = False
+        self.no_cache = False
+        self.trace = False
+        self.trace_file = None
+        self.format = "text"
+        self.since = False
+        self.follow = False
+        self.batch = None
+        self.out = None
 
 
 class AppUnitTest(unittest.TestCase):
@@ -86,6 +116,13 @@ class AppUnitTest(unittest.TestCase):
     def setUp(self):
         app.CONFIG_LOCATIONS = [ "./tests/cartmanrc.tests" ]
         self.app = TestableApp()
+        self.base_directory = app.BASE_DIRECTORY
+        self.directory = tempfile.mkdtemp()
+        app.BASE_DIRECTORY = self.directory
+
+    def tearDown(self):
+        app.BASE_DIRECTORY = self.base_directory
+        shutil.rmtree(self.directory)
 
     def test_run_help(self):
         args = DummyArgs("help")
@@ -110,6 +147,190 @@ class AppUnitTest(unittest.TestCase):
             '#2. nope (other_dude)',
         ])
 
+    def test_run_report_jsonl(self):
+        args = DummyArgs("report", ["1"])
+        args.format = "jsonl"
+        self.app.set_responses([
+            (200, u"""id\tsummary\treporter\tpriority\n"""
+                  u"""1\twoot\tsome_reporter\tmajor\n"""),
+        ])
+
+        self.app.run(args)
+        self.assertEquals(len(self.app.output), 1)
+        fields = json.loads(self.app.output[0])
+        self.assertEquals(fields["id"], 1)
+        self.assertEquals(fields["summary"], "woot")
+        self.assertEquals(fields["priority"], "major")
+
+    def test_run_report_tsv(self):
+        args = DummyArgs("report", ["1"])
+        args.format = "tsv"
+        self.app.set_responses([
+            (200, u"""id\tsummary\treporter\n"""
+                  u"""1\twoot\tsome_reporter\n"""
+                  u"""2\tnope\tother_dude\n"""),
+        ])
+
+        self.app.run(args)
+        self.assertEquals(len(self.app.output), 3)
+        header = self.app.output[0].split("\t")
+        row = dict(zip(header, self.app.output[2].split("\t")))
+        self.assertEquals(row["id"], "2")
+        self.assertEquals(row["reporter"], "other_dude")
+
+    def _get_timeline_feed(self, *items):
+        return u"""<?xml version="1.0"?>
+            <rss version="2.0" xmlns:dc="http://purl.org/dc/elements/1.1/">
+            <channel>{}</channel></rss>""".format("".join(
+            u"""<item><title>Ticket #{0} (stuff) created</title>
+                <dc:creator>joe</dc:creator><pubDate>{1}</pubDate>
+                <link>http://localhost/ticket/{0}</link>
+                <guid>ticket/{0}/{1}</guid></item>""".format(*item)
+            for item in items)).encode("utf-8")
+
+    def test_run_timeline_since(self):
+        args = DummyArgs("timeline")
+        args.since = True
+        args.format = "jsonl"
+        now = int(time.time())
+        first = email.utils.formatdate(now - 120, usegmt=True)
+        second = email.utils.formatdate(now - 60, usegmt=True)
+        self.app.set_responses([
+            (200, self._get_timeline_feed((1, first), (2, second))),
+            (200, self._get_timeline_feed((1, first), (2, second),
+                                          (3, second))),
+            (200, self._get_timeline_feed((1, first), (2, second),
+                                          (3, second))),
+        ])
+
+        self.app.run(args)
+        events = [json.loads(line) for line in self.app.output]
+        self.assertEquals([e["ticket"] for e in events], [1, 2])
+
+        # The events already seen are skipped, even at the same time.
+        self.app.run(args)
+        events = [json.loads(line) for line in self.app.output]
+        self.assertEquals([e["ticket"] for e in events], [3])
+        self.assertEquals(events[0]["author"], "joe")
+
+        self.app.run(args)
+        self.assertEquals(self.app.output, [])
+
+    def test_run_timeline_follow(self):
+        args = DummyArgs("timeline")
+        args.follow = True
+        self.app.set_responses([
+            (200, self._get_timeline_feed()),
+            (200, self._get_timeline_feed(
+                (4, email.utils.formatdate(usegmt=True)))),
+        ])
+
+        delays = []
+
+        def sleep(delay):
+            delays.append(delay)
+            if len(delays) == 2:
+                raise KeyboardInterrupt
+
+        sleep_orig = app.time.sleep
+        app.time.sleep = sleep
+        try:
+            self.app.run(args)
+        finally:
+            app.time.sleep = sleep_orig
+
+        self.assertEquals(len(self.app.output), 1)
+        self.assertTrue(self.app.output[0].endswith(
+            "Ticket #4 (stuff) created by joe"))
+        self.assertEquals(delays, [app.FOLLOW_DELAY * 2, app.FOLLOW_DELAY])
+
+    def test_diff_rows(self):
+        old = {
+            1: {"ticket": "1", "summary": "a", "status": "new"},
+            2: {"ticket": "2", "summary": "b", "status": "new"},
+        }
+        new = {
+            1: {"ticket": "1", "summary": "a", "status": "closed"},
+            3: {"ticket": "3", "summary": "c", "status": "new"},
+        }
+
+        changes = app.diff_rows(old, new)
+        self.assertEquals(changes, [
+            {"change": "changed", "id": 1,
+             "fields": {"status": ["new", "closed"]}},
+            {"change": "added", "id": 3, "fields": new[3]},
+            {"change": "removed", "id": 2, "fields": old[2]},
+        ])
+        self.assertEquals([app.format_change(c) for c in changes], [
+            "~ #1 status: new -> closed",
+            "+ #3 c",
+            "- #2 b",
+        ])
+        self.assertEquals(app.diff_rows(new, new), [])
+
+    def test_run_watch(self):
+        args = DummyArgs("watch", ["report", "1"])
+        args.format = "jsonl"
+        self.app.set_responses([
+            (200, u"ticket\tsummary\n1\ta\n2\tb\n"),
+            (304, u""),
+            (200, u"ticket\tsummary\n1\tA\n3\tc\n"),
+        ])
+        self.app.responses[0].headers = {"ETag": '"v1"'}
+
+        requests = []
+        get = self.app.get
+
+        def record_get(query_string, data=None, **kwargs):
+            requests.append(kwargs.get("headers"))
+            return get(query_string, data, **kwargs)
+
+        self.app.get = record_get
+
+        delays = []
+
+        def sleep(delay):
+            delays.append(delay)
+            if len(delays) == 3:
+                raise KeyboardInterrupt
+
+        sleep_orig = app.time.sleep
+        app.time.sleep = sleep
+        try:
+            self.app.run(args)
+        finally:
+            app.time.sleep = sleep_orig
+
+        self.assertEquals(requests, [{}, {"If-None-Match": '"v1"'},
+                                     {"If-None-Match": '"v1"'}])
+        self.assertEquals([json.loads(line) for line in self.app.output], [
+            {"change": "added", "id": 1,
+             "fields": {"ticket": "1", "summary": "a"}},
+            {"change": "added", "id": 2,
+             "fields": {"ticket": "2", "summary": "b"}},
+            {"change": "changed", "id": 1, "fields": {"summary": ["a", "A"]}},
+            {"change": "added", "id": 3,
+             "fields": {"ticket": "3", "summary": "c"}},
+            {"change": "removed", "id": 2,
+             "fields": {"ticket": "2", "summary": "b"}},
+        ])
+        self.assertEquals(delays, [app.FOLLOW_DELAY, app.FOLLOW_DELAY * 2,
+                                   app.FOLLOW_DELAY])
+
+    def test_run_report_quoted_newlines(self):
+        args = DummyArgs("report", ["1"])
+        self.app.set_responses([
+            (200, u"""\ufeffid\tsummary\treporter\tdescription\r\n"""
+                  u"""1\twoot\tsome_reporter\t"multi\r\nline"\r\n"""
+                  u"""2\tnope\tother_dude\tsomething\r\n"""),
+        ])
+
+        self.app.run(args)
+        self.assertEquals(self.app.output, [
+            '#1. woot (some_reporter)',
+            '#2. nope (other_dude)',
+        ])
+
     def test_run_view(self):
         args = DummyArgs("view", ["1"])
         self.app.set_responses([
@@ -124,6 +345,159 @@ class AppUnitTest(unittest.TestCase):
             'any text'
         ])
 
+    def test_run_view_multiple(self):
+        args = DummyArgs("view", ["3,1-2"])
+        self.app.set_responses([
+            (200, self._get_properties()),
+            (200, u"""id\tsummary\treporter\tdescription\n"""
+                  u"""1\twoot\tjoe\tone\n"""
+                  u"""2\tmeh\tbob\ttwo\n"""
+                  u"""3\tbleh\tbob\tthree\n"""),
+        ])
+        queries = []
+        get = self.app.get
+
+        def record_get(query_string, data=None, **kwargs):
+            queries.append(query_string)
+            return get(query_string, data, **kwargs)
+
+        self.app.get = record_get
+        self.app.run(args)
+        self.assertEquals(len(queries), 2)
+        self.assertTrue("id=1-3" in queries[1])
+        self.assertEquals(self.app.output, [
+            '#3. bleh (bob)\n--------------',
+            '',
+            'three',
+            '',
+            '#1. woot (joe)\n--------------',
+            '',
+            'one',
+            '',
+            '#2. meh (bob)\n-------------',
+            '',
+            'two',
+        ])
+
+    def test_run_view_multiple_missing(self):
+        args = DummyArgs("view", ["1,4"])
+        self.app.set_responses([
+            (200, self._get_properties()),
+            (200, u"""id\tsummary\treporter\tdescription\n"""
+                  u"""1\twoot\tjoe\tone\n"""),
+        ])
+
+        self.assertRaises(exceptions.FatalError, self.app.run, args)
+
+    def test_run_view_multiple_no_query(self):
+        args = DummyArgs("view", ["2,1"])
+        self.app.set_responses([
+            (200, self._get_properties()),
+            (200, u"""summary\treporter\n"""
+                  u"""woot\tjoe\n"""),
+            (200, u"""id\tsummary\treporter\tdescription\n"""
+                  u"""2\tmeh\tbob\ttwo\n"""),
+            (200, u"""id\tsummary\treporter\tdescription\n"""
+                  u"""1\twoot\tjoe\tone\n"""),
+        ])
+
+        self.app.run(args)
+        self.assertEquals(self.app.output[0], '#2. meh (bob)\n-------------')
+        self.assertEquals(self.app.output[-1], 'one')
+
+    def test_run_export(self):
+        page_size = app.EXPORT_PAGE_SIZE
+        app.EXPORT_PAGE_SIZE = 2
+        self.addCleanup(setattr, app, "EXPORT_PAGE_SIZE", page_size)
+        path = os.path.join(self.directory, "export.jsonl")
+        args = DummyArgs("export", ["report", "1"])
+        args.out = path
+        get = self.app.get
+
+        def get_or_fail(query_string, data=None, **kwargs):
+            r = get(query_string, data, **kwargs)
+            if r.status_code >= 400:
+                raise exceptions.FatalError(text.extract_message(r.text))
+            return r
+
+        self.app.get = get_or_fail
+
+        # The second page fails, the first one is kept.
+        self.app.set_responses([
+            (200, u"id\tsummary\n1\ta\n2\tb\n"),
+            (500, u'<p class="message">Internal error</p>'),
+        ])
+        self.assertRaises(exceptions.FatalError, self.app.run, args)
+
+        # The last page is full, Trac rejects the following one.
+        self.app.set_responses([
+            (200, u"id\tsummary\n3\tc\n4\td\n"),
+            (500, u'<p class="message">Page 3 is beyond the number of pages '
+                  u'in the query</p>'),
+        ])
+        self.app.run(args)
+        self.assertEquals(self.app.output,
+                          ["4 ticket(s) exported to " + path])
+
+        with open(path) as fp:
+            ids = [json.loads(line)["id"] for line in fp]
+        self.assertEquals(ids, ["1", "2", "3", "4"])
+
+    def test_run_sync_and_offline(self):
+        self.app.properties_ttl = 60
+        self.app.set_responses([
+            (200, self._get_properties()),
+            (200, u"""id\tsummary\treporter\tchangetime\tdescription\n"""
+                  u"""1\twoot\tsome_reporter\t2017-01-01\tany text\n"""
+                  u"""2\tnope\tother_dude\t2017-01-02\tsomething\n"""),
+            (200, u"""ticket\tsummary\t_reporter\n"""
+                  u"""2\tnope\tother_dude\n"""),
+        ])
+
+        self.app.run(DummyArgs("sync", ["3"]))
+        self.assertEquals(self.app.output, [
+            "2 ticket(s) updated, 2 in the mirror",
+            "report #3: 1 ticket(s)",
+        ])
+
+        args = DummyArgs("view", ["1"])
+        args.offline = True
+        self.app.run(args)
+        self.assertEquals(self.app.output, [
+            '#1. woot (some_reporter)\n------------------------',
+            '',
+            'any text'
+        ])
+
+        args = DummyArgs("report", ["3"])
+        args.offline = True
+        self.app.run(args)
+        self.assertEquals(self.app.output, ['#2. nope (other_dude)'])
+
+    def test_run_search_local(self):
+        self.app.properties_ttl = 60
+        self.app.set_responses([
+            (200, self._get_properties()),
+            (200, u"""id\ttype\tstatus\tsummary\tchangetime\tdescription\n"""
+                  u"""6\tdefect\tnew\tfishy\t2017-01-01\tsomething\n"""
+                  u"""7\tdefect\tnew\tsomething\t2017-01-02\tboo\n"""
+                  u"""8\ttask\tnew\tnothing\t2017-01-03\tboo\n"""),
+        ])
+        self.app.run(DummyArgs("sync"))
+
+        args = DummyArgs("search", ["something"])
+        args.offline = True
+        self.app.run(args)
+        self.assertEquals(self.app.output, [
+            '#7. defect: something (new)',
+            '#6. defect: fishy (new)',
+        ])
+
+    def test_run_view_offline_missing(self):
+        args = DummyArgs("view", ["1"])
+        args.offline = True
+        self.assertRaises(exceptions.FatalError, self.app.run, args)
+
     def test_run_open_on_request(self):
         args = DummyArgs("open", ["1"])
         self.app.set_responses([
@@ -154,6 +528,66 @@ class AppUnitTest(unittest.TestCase):
             '',
         ])
 
+    def test_get_properties_cached(self):
+        self.app.properties_ttl = 60
+        self.app.set_responses([
+            (200, self._get_properties()),
+        ])
+
+        self.assertFalse(self.app.properties_cached)
+        first = self.app.get_properties()
+        self.assertFalse(self.app.properties_cached)
+
+        # No more responses available, the second call must hit the cache.
+        second = self.app.get_properties()
+        self.assertTrue(self.app.properties_cached)
+        self.assertEquals(first, second)
+
+    def test_get_property_options_optgroups(self):
+        self.app.properties_ttl = 60
+        self.app.set_responses([
+            (200, u"""var properties={
+                "milestone": {"options": ["m1"],
+                              "optgroups": [{"label": "Closed",
+                                             "options": ["old"]}]}
+            }; var modes={};"""),
+        ])
+
+        for _ in range(2):
+            self.assertEquals(self.app.get_property_options()["milestone"],
+                              ["m1", "old"])
+
+    def test_run_properties_refresh(self):
+        self.app.properties_ttl = 60
+        self.app.set_responses([
+            (200, self._get_properties()),
+            (200, self._get_properties().replace("meh1", "meh3")),
+        ])
+        self.app.get_properties()
+
+        args = DummyArgs("properties", [])
+        args.refresh = True
+        self.app.run(args)
+        self.assertEquals(self.app.output[1], u'meh3, meh2')
+
+    def test_run_change_multiple(self):
+        args = DummyArgs("change", ["1,3-4", "milestone=2.1"])
+        self.app.set_responses([
+            (200, u"""<input name="ts" value="1" />"""), # time stamp
+            (200, u""), # post
+            (200, u"""<input name="ts" value="1" />"""), # time stamp
+            (200, u"""<div id="system-message">bad</div>"""), # post
+            (200, u"""<input name="ts" value="1" />"""), # time stamp
+            (200, u""), # post
+        ])
+
+        self.assertRaises(exceptions.BatchError, self.app.run, args)
+        self.assertEquals(self.app.output, [
+            '#1. changed',
+            '#3. error: unable to save change',
+            '#4. changed',
+        ])
+
     def test_run_comment(self):
         args = DummyArgs("comment", ["1"])
         args.message = "brilliant!"
@@ -188,6 +622,20 @@ class AppUnitTest(unittest.TestCase):
         self.app.run(args)
         self.assertIsNone(self.app.output)
 
+    def test_get_ticket_page_version(self):
+        self.app.trac_version = (0, 0)
+        self.app.set_responses([
+            (200, u"""<span class="trac-status">
+                        <a href="/query?status=new">new</a>
+                      </span>
+                      <a href="/about"><strong>Trac 1.0.1</strong></a>"""),
+        ])
+
+        # The version comes from the parse of the page itself.
+        page = self.app.get_ticket_page(1)
+        self.assertEquals(self.app.trac_version, (1, 0))
+        self.assertEquals(page.get_status(), "new")
+
     def test_run_status_get_v1(self):
         args = DummyArgs("status", ["1"])
         self.app.trac_version = (1,0)
@@ -238,6 +686,158 @@ class AppUnitTest(unittest.TestCase):
 
         self.app.run(args)
 
+    def _write_batch(self, content):
+        path = os.path.join(self.directory, "batch")
+        with open(path, "w") as fp:
+            fp.write(content)
+        return path
+
+    def _post_new_tickets(self, results):
+        """Replace post() by the creation of the tickets, one result (ticket
+        id or None for an error) per call."""
+
+        posted = []
+
+        def post(query_string, data=None, **kwargs):
+            posted.append(data)
+            ticket_id = results.pop(0)
+            if ticket_id is None:
+                return DummyResponse(500, u"")
+            response = DummyResponse(303, u"")
+            response.headers = {
+                "Location": "localhost/ticket/{}".format(ticket_id),
+            }
+            return response
+
+        self.app.post = post
+        return posted
+
+    def test_read_batch_mbox(self):
+        path = self._write_batch(
+            "From alerts Mon Jan  1 00:00:00 2024\n"
+            "Subject: disk full\nMilestone: meh1\n\non db1\n\n"
+            "From alerts Mon Jan  1 00:00:00 2024\n"
+            "Subject: disk full\n\non db2\n")
+
+        batch = self.app.read_batch(path)
+        self.assertEquals(len(batch), 2)
+        self.assertEquals(list(batch[0][1].items()),
+                          [("Subject", "disk full"), ("Milestone", "meh1")])
+        self.assertEquals(batch[1][2].strip(), "on db2")
+        self.assertNotEqual(batch[0][0], batch[1][0])
+
+    def test_read_batch_jsonl(self):
+        path = self._write_batch(
+            '{"summary": "disk full", "Milestone": "meh1", '
+            '"description": "on db1"}\n\n{"summary": "load", "cc": "x"}\n')
+
+        batch = self.app.read_batch(path)
+        self.assertEquals(list(batch[0][1].items()),
+                          [("Subject", "disk full"), ("Milestone", "meh1")])
+        self.assertEquals(batch[0][2], "on db1")
+        self.assertEquals(list(batch[1][1].items()),
+                          [("Subject", "load"), ("Cc", "x")])
+
+        self._write_batch('{"summary": "disk full"\n')
+        self.assertRaises(exceptions.FatalError, self.app.read_batch, path)
+
+    def test_run_new_batch(self):
+        path = self._write_batch(
+            '{"summary": "one", "milestone": "MEH2", "component": "com1"}\n'
+            '{"summary": "two", "milestone": "meh2", "component": "Com1"}\n'
+            '{"summary": "three", "milestone": "meh1", "component": "com2"}'
+            '\n')
+        args = DummyArgs("new")
+        args.batch = path
+        self.app.set_responses([(200, self._get_properties())])
+        posted = self._post_new_tickets([10, None, 12])
+
+        self.assertRaises(exceptions.BatchError, self.app.run, args)
+        self.assertEquals(self.app.output, [
+            "record 1. ticket #10 created",
+            "record 2. error: unable to create new ticket",
+            "record 3. ticket #12 created",
+        ])
+        self.assertEquals(posted[0]["field_owner"], "nosetests")
+        self.assertEquals(posted[2]["field_milestone"], "meh1")
+
+        # Only the failed record is created again.
+        self.app.set_responses([(200, self._get_properties())])
+        posted = self._post_new_tickets([11])
+        self.app.run(args)
+        self.assertEquals(self.app.output, [
+            "record 1. ticket #10 already created",
+            "record 3. ticket #12 already created",
+            "record 2. ticket #11 created",
+        ])
+        self.assertEquals(posted[0]["field_summary"], "two")
+        self.assertEquals(posted[0]["field_component"], "com1")
+
+    def test_run_new_batch_invalid(self):
+        path = self._write_batch(
+            '{"summary": "one", "milestone": "meh1", "component": "com1"}\n'
+            '{"milestone": "nope", "component": "com1"}\n')
+        args = DummyArgs("new")
+        args.batch = path
+        self.app.set_responses([(200, self._get_properties())])
+        posted = self._post_new_tickets([])
+
+        self.assertRaises(exceptions.BatchError, self.app.run, args)
+        self.assertEquals(posted, [])
+        self.assertEquals(self.app.output, [
+            "record 2. Invalid 'Subject': cannot be blank",
+            "record 2. Invalid 'Milestone': expected: meh1, meh2",
+        ])
+
+    def test_run_new_batch_stale_cache(self):
+        path = self._write_batch(
+            '{"summary": "one", "milestone": "1.1"}\n'
+            '{"summary": "two", "milestone": "1.0"}\n')
+
+        # The cached options lack the milestone just added, close to an old
+        # one, it must not be completed with the old one.
+        self.app.read_config()
+        self.app.properties_ttl = 60
+        self.app.properties = (time.time(), {
+            "milestone": {"options": ["1.0"]},
+        })
+        self.app.set_responses([(200, u"""var properties={
+            "milestone": {"options": ["1.0", "1.1"]}
+        }; var modes={};""")])
+        posted = self._post_new_tickets([10, 11])
+
+        list(self.app.create_tickets(path, None))
+        self.assertEquals(sorted(data["field_milestone"] for data in posted),
+                          ["1.0", "1.1"])
+
+    def test_validate_headers(self):
+        options = {
+            "milestone": ["1.0", "2.0 beta"],
+            "component": ["backend", "frontend"],
+        }
+        self.app.required_fields = ["To", "Subject"]
+        headers = {"To": "joe", "Subject": "stuff", "Milestone": "beta",
+                   "Component": "backnd", "Priority": "high"}
+        self.assertEquals(self.app._validate_headers(headers, options), [])
+        self.assertEquals(headers["Milestone"], "2.0 beta")
+        self.assertEquals(headers["Component"], "backend")
+
+        index = self.app.fuzzy_indexes["milestone"]
+        headers["Milestone"] = "1"
+        self.app._validate_headers(headers, options)
+        self.assertTrue(self.app.fuzzy_indexes["milestone"] is index)
+
+        options["milestone"] = ["3.0"]
+        headers["Milestone"] = "1"
+        errors = self.app._validate_headers(headers, options)
+        self.assertEquals(errors, ["Invalid 'Milestone': expected: 3.0"])
+
+        # Only the exact values are accepted without completion.
+        headers["Milestone"] = "3"
+        errors = self.app._validate_headers(headers, options, complete=False)
+        self.assertEquals(errors, ["Invalid 'Milestone': expected: 3.0"])
+        self.assertEquals(headers["Milestone"], "3")
+
     def test_run_search(self):
         args = DummyArgs("search", ["something"])
         self.app.set_responses([
@@ -265,3 +865,22 @@ class AppUnitTest(unittest.TestCase):
             '#7. defect: just something (new)',
             '#6. defect: something is fishy (new)',
         ])
+
+    def test_run_traced(self):
+        path = os.path.join(self.directory, "trace.jsonl")
+        self.app.set_responses([
+            (200, u"""<span class="status">(new defect)</span>"""),
+        ])
+        args = DummyArgs("status", ["1"])
+        args.trace_file = path
+        self.app.run(args)
+
+        self.assertEquals(self.app.hooks, [])
+        with open(path) as fp:
+            events = [json.loads(line) for line in fp]
+        self.assertEquals([(e["event"], e.get("phase")) for e in events], [
+            ("phase_start", "parse"),
+            ("phase_end", "parse"),
+            ("summary", None),
+        ])
+        self.assertEquals(events[0]["what"], "ticket_page")
@@ -0,0 +1,376 @@
+import os
+import sys
+import time
+import shutil
+import sqlite3
+import tempfile
+import threading
+import unittest
+
+import requests
+
+try:
+    from xmlrpc.server import SimpleXMLRPCServer, SimpleXMLRPCRequestHandler
+    from xmlrpc.client import DateTime, Fault
+except ImportError:
+    from SimpleXMLRPCServer import (SimpleXMLRPCServer,
+                                    SimpleXMLRPCRequestHandler)
+    from xmlrpclib import DateTime, Fault
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+from cartman import app, backends, cli, exceptions
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..",
+                                "benchmarks"))
+
+import faketrac
+
+
+class RequestHandler(SimpleXMLRPCRequestHandler):
+
+    rpc_paths = ("/rpc", "/login/rpc")
+
+    def do_POST(self):
+        self.server.post_count += 1
+        SimpleXMLRPCRequestHandler.do_POST(self)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeTrac(object):
+
+    """Stand-in for the ticket methods of the XmlRpcPlugin."""
+
+    def __init__(self):
+        self.tickets = {
+            1: {"summary": "first", "status": "new", "reporter": "joe",
+                "milestone": "m1"},
+            2: {"summary": "second", "status": "closed", "reporter": "bob",
+                "milestone": "m1"},
+        }
+        self.updates = []
+
+    def get_ticket(self, ticket_id):
+        if ticket_id not in self.tickets:
+            raise Fault(404, "Ticket {} does not exist.".format(ticket_id))
+        time = DateTime("20230505T12:00:00")
+        attributes = dict(self.tickets[ticket_id], time=time)
+        return [ticket_id, time, time, attributes]
+
+    def get_actions(self, ticket_id):
+        return [["leave", "leave", "", []], ["resolve", "resolve", "", []]]
+
+    def update(self, ticket_id, comment, attributes, notify):
+        self.get_ticket(ticket_id)
+        self.updates.append((ticket_id, comment, attributes))
+        return self.get_ticket(ticket_id)
+
+    def get_ticket_fields(self):
+        return [
+            {"name": "summary", "type": "text", "label": "Summary"},
+            {"name": "milestone", "type": "select", "label": "Milestone",
+             "options": ["m1"],
+             "optgroups": [{"label": "Closed", "options": ["m0"]}]},
+        ]
+
+
+class XmlRpcBackendUnitTest(unittest.TestCase):
+
+    def setUp(self):
+        self.trac = FakeTrac()
+        self.server = SimpleXMLRPCServer(("127.0.0.1", 0), RequestHandler,
+                                         allow_none=True, logRequests=False)
+        self.server.register_function(self.trac.get_ticket, "ticket.get")
+        self.server.register_function(self.trac.get_actions,
+                                      "ticket.getActions")
+        self.server.register_function(self.trac.update, "ticket.update")
+        self.server.register_function(self.trac.get_ticket_fields,
+                                      "ticket.getTicketFields")
+        self.server.register_multicall_functions()
+        self.server.post_count = 0
+
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       kwargs={"poll_interval": 0.01})
+        self.thread.daemon = True
+        self.thread.start()
+
+        self.app = app.CartmanApp()
+        self.app.base_url = "http://127.0.0.1:{}".format(
+            self.server.server_address[1])
+        self.app.auth_type = "none"
+        self.app.jobs = 1
+        self.app.session = requests.session()
+        self.backend = backends.XmlRpcBackend(self.app)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.app.session.close()
+
+    def test_url(self):
+        self.assertTrue(self.backend.url.endswith("/rpc"))
+        self.app.auth_type = "basic"
+        backend = backends.XmlRpcBackend(self.app)
+        self.assertTrue(backend.url.endswith("/login/rpc"))
+
+    def test_get_tickets(self):
+        tickets = self.backend.get_tickets([2, 1])
+        self.assertEquals([t.id for t in tickets], [2, 1])
+        self.assertEquals(tickets[0].summary, "second")
+        self.assertEquals(tickets[1].reporter, "joe")
+        self.assertEquals(tickets[1].extra["time"], "2023-05-05T12:00:00Z")
+
+    def test_get_tickets_missing(self):
+        self.assertRaises(exceptions.FatalError, self.backend.get_tickets,
+                          [1, 3])
+
+    def test_get_ticket_status(self):
+        status, actions = self.backend.get_ticket_status(1)
+        self.assertEquals(status, "new")
+        self.assertEquals(actions, ["leave", "resolve"])
+
+    def test_get_properties(self):
+        properties = self.backend.get_properties()
+        self.assertEquals(sorted(properties), ["milestone", "summary"])
+        self.app.backend = self.backend
+        self.app.properties_ttl = 0
+        self.app.site = "xmlrpc-test"
+        self.assertEquals(self.app.get_property_options()["milestone"],
+                          ["m1", "m0"])
+
+    def test_update_ticket(self):
+        self.backend.update_ticket(1, "done", {"milestone": "m2"}, "resolve")
+        self.assertEquals(self.trac.updates, [
+            (1, "done", {"milestone": "m2", "action": "resolve"}),
+        ])
+
+    def test_update_ticket_fault(self):
+        self.assertRaises(exceptions.FatalError, self.backend.update_ticket,
+                          3, "meh")
+
+    def test_update_tickets_batched(self):
+        results = list(self.backend.update_tickets([1, 3, 2], "meh",
+                                                   {"milestone": "m2"}))
+        self.assertEquals([r[0] for r in results], [1, 3, 2])
+        self.assertEquals(results[0][1], None)
+        self.assertTrue("does not exist" in results[1][1])
+        self.assertEquals(results[2][1], None)
+        self.assertEquals(len(self.trac.updates), 2)
+        self.assertEquals(self.server.post_count, 1)
+
+    def test_update_tickets_multicall_size(self):
+        multicall_size = backends.MULTICALL_SIZE
+        backends.MULTICALL_SIZE = 2
+        try:
+            results = list(self.backend.update_tickets([1, 2, 1], "meh"))
+        finally:
+            backends.MULTICALL_SIZE = multicall_size
+        self.assertEquals([r[1] for r in results], [None, None, None])
+        self.assertEquals(self.server.post_count, 2)
+
+
+TRAC_SCHEMA = """
+CREATE TABLE ticket (
+    id integer PRIMARY KEY, type text, time integer, changetime integer,
+    component text, severity text, priority text, owner text,
+    reporter text, cc text, version text, milestone text, status text,
+    resolution text, summary text, description text, keywords text
+);
+CREATE TABLE ticket_custom (
+    ticket integer, name text, value text, UNIQUE (ticket, name)
+);
+CREATE TABLE ticket_change (
+    ticket integer, time integer, author text, field text, oldvalue text,
+    newvalue text, UNIQUE (ticket, time, field)
+);
+CREATE TABLE report (
+    id integer PRIMARY KEY, author text, title text, query text,
+    description text
+);
+"""
+
+
+class HttpBackendUnitTest(unittest.TestCase):
+
+    def setUp(self):
+        self.trac = faketrac.FakeTrac(tickets=60, comments=0)
+        self.server = faketrac.serve(self.trac)
+
+        self.app = app.CartmanApp()
+        self.app.base_url = "http://127.0.0.1:{}".format(
+            self.server.server_address[1])
+        self.app.auth_type = "none"
+        self.app.use_cache = False
+        self.app.session = requests.session()
+        self.backend = backends.HttpBackend(self.app)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.app.session.close()
+
+    def test_get_timeline_events_unlimited(self):
+        # More events than the 50 of a Trac feed by default.
+        events = self.backend.get_timeline_events(time.time() - 400 * 86400)
+        self.assertEquals(len(events), 60)
+        self.assertEquals(sorted(e["ticket"] for e in events),
+                          list(range(1, 61)))
+
+
+class DbBackendUnitTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        path = os.path.join(self.directory, "trac.db")
+
+        # Timestamps in microseconds, like Trac 1.0+.
+        now = int(time.time()) * 1000000
+        hour = 3600 * 1000000
+        day = 24 * hour
+
+        connection = sqlite3.connect(path)
+        connection.executescript(TRAC_SCHEMA)
+        connection.executemany(
+            "INSERT INTO ticket (id, type, time, changetime, status, "
+            "reporter, owner, summary, description, milestone) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", [
+                (1, "defect", now - 40 * day, now - day, "closed", "joe",
+                 "bob", "old one", "desc 1", "m1"),
+                (2, "task", now - 2 * day, now - 2 * day, "new", "bob",
+                 "joe", "new one", "desc 2", None),
+            ])
+        connection.execute("INSERT INTO ticket_custom VALUES (1, 'sla', '4h')")
+        connection.executemany(
+            "INSERT INTO ticket_change VALUES (?, ?, ?, ?, ?, ?)", [
+                (1, now - day - hour, "bob", "status", "new", "closed"),
+                (1, now - day - hour, "bob", "comment", "", "fixed"),
+                (1, now - 50 * day, "joe", "comment", "", "too old"),
+            ])
+        connection.executemany(
+            "INSERT INTO report (id, title, query) VALUES (?, ?, ?)", [
+                (1, "Active Tickets",
+                 "SELECT id AS ticket, summary, reporter, time AS created "
+                 "FROM ticket WHERE status <> 'closed' ORDER BY id"),
+                (2, "My Tickets",
+                 "SELECT id AS ticket, summary FROM ticket "
+                 "WHERE owner = $USER ORDER BY id"),
+                (3, "Query", "query:?status=new"),
+            ])
+        connection.commit()
+        connection.close()
+
+        self.app = app.CartmanApp()
+        self.app.database = "sqlite:" + path
+        self.app.username = "joe"
+        self.backend = backends.DbBackend(self.app)
+
+    def tearDown(self):
+        if self.backend.connection:
+            self.backend.connection.close()
+        shutil.rmtree(self.directory)
+
+    def _run(self, *argv):
+        """Run a command from a configuration using the database, Trac
+        itself being unreachable, return the lines printed."""
+
+        config_path = os.path.join(self.directory, "config")
+        with open(config_path, "w") as fp:
+            fp.write("[trac]\nbase_url = http://127.0.0.1:9/\n"
+                     "username = joe\npassword = secret\nbackend = db\n"
+                     "database = {}\nconnect_timeout = 1\nretries = 0\n"
+                     .format(self.app.database))
+
+        config_locations = app.CONFIG_LOCATIONS
+        base_directory = app.BASE_DIRECTORY
+        stdout = sys.stdout
+        app.CONFIG_LOCATIONS = [config_path]
+        app.BASE_DIRECTORY = self.directory
+        sys.stdout = StringIO()
+        application = app.CartmanApp()
+        try:
+            application.run(cli.build_parser().parse_args(list(argv)))
+            return sys.stdout.getvalue().splitlines()
+        finally:
+            sys.stdout = stdout
+            app.CONFIG_LOCATIONS = config_locations
+            app.BASE_DIRECTORY = base_directory
+            if application.backend and application.backend.connection:
+                application.backend.connection.close()
+
+    def test_run_without_http(self):
+        self.assertEquals(self._run("report", "1"), ["#2. new one (bob)"])
+        self.assertEquals(self._run("view", "2")[0], "#2. new one (bob)")
+        self.assertEquals(self._run("reports")[0], "#1. Active Tickets")
+        self.assertEquals(self._run("timeline"), [
+            "#1. (old one) closed by bob",
+            "#2. (new one) created by bob",
+        ])
+
+    def test_run_query_report_over_http(self):
+        self.assertRaises(requests.exceptions.ConnectionError, self._run,
+                          "report", "3")
+
+    def test_missing_database(self):
+        self.app.database = os.path.join(self.directory, "nope.db")
+        self.assertRaises(exceptions.FatalError, self.backend.get_reports)
+
+    def test_read_only(self):
+        connection = self.backend.connect()
+        self.assertRaises(sqlite3.OperationalError, connection.execute,
+                          "UPDATE ticket SET summary = 'changed'")
+
+    def test_get_tickets(self):
+        tickets = self.backend.get_tickets([2, 1])
+        self.assertEquals([t.id for t in tickets], [2, 1])
+        self.assertEquals(tickets[0].summary, "new one")
+        self.assertEquals(tickets[0].milestone, "")
+        self.assertEquals(tickets[1].owner, "bob")
+        self.assertEquals(tickets[1].extra["sla"], "4h")
+        self.assertTrue(tickets[1].extra["time"].endswith("Z"))
+
+    def test_get_tickets_missing(self):
+        self.assertRaises(exceptions.FatalError, self.backend.get_tickets,
+                          [1, 3])
+
+    def test_get_reports(self):
+        self.assertEquals(list(self.backend.get_reports()), [
+            (1, "Active Tickets"),
+            (2, "My Tickets"),
+            (3, "Query"),
+        ])
+
+    def test_get_report_tickets(self):
+        tickets = list(self.backend.get_report_tickets(1))
+        self.assertEquals([t.id for t in tickets], [2])
+        self.assertEquals(tickets[0].format_title(), "#2. new one (bob)")
+
+    def test_get_report_tickets_user(self):
+        tickets = list(self.backend.get_report_tickets(2))
+        self.assertEquals([t.id for t in tickets], [2])
+
+    def test_get_report_tickets_missing(self):
+        self.assertRaises(exceptions.FatalError,
+                          self.backend.get_report_tickets, 4)
+
+    def test_get_timeline(self):
+        self.assertEquals(self.backend.get_timeline(), [
+            ("#1", "(old one) closed by bob"),
+            ("#2", "(new one) created by bob"),
+        ])
+        self.assertEquals(self.backend.get_timeline(1), [])
+
+    def test_get_timeline_events(self):
+        self.backend.app.base_url = "http://localhost"
+        events = self.backend.get_timeline_events(time.time() - 30 * 86400)
+        self.assertEquals([(e["ticket"], e["author"]) for e in events],
+                          [(2, "bob"), (1, "bob")])
+        self.assertEquals(events[0]["title"], "Ticket #2 (new one) created")
+        self.assertEquals(events[1]["title"], "Ticket #1 (old one) closed")
+        self.assertTrue(events[0]["time"] < events[1]["time"])
+        self.assertEquals(len(set(e["id"] for e in events)), 2)
+        self.assertEquals(self.backend.get_timeline_events(time.time()), [])
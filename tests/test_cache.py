@@ -0,0 +1,116 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+import requests
+
+try:
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+except ImportError:
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+
+from cartman import app, cache
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+
+    """Serve the body of a path with an ETag, honor If-None-Match."""
+
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        body = self.server.bodies[self.path]
+        etag = '"{}"'.format(len(body))
+
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        if self.path != "/nocache":
+            self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class CacheUnitTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.base_directory = app.BASE_DIRECTORY
+        app.BASE_DIRECTORY = self.directory
+
+        self.server = HTTPServer(("127.0.0.1", 0), RequestHandler)
+        self.server.requests = []
+        self.server.bodies = {
+            "/report/1?format=tab": u"id\tsummary\n1\tcafé\n"
+                                    .encode("utf-8"),
+            "/ticket/1": b"<html>ticket</html>",
+            "/nocache": b"fresh",
+        }
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       kwargs={"poll_interval": 0.01})
+        self.thread.daemon = True
+        self.thread.start()
+
+        self.app = app.CartmanApp()
+        self.app.base_url = "http://127.0.0.1:{}".format(
+            self.server.server_address[1])
+        self.app.cache_size = 1
+        self.app.session = requests.session()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.app.session.close()
+        app.BASE_DIRECTORY = self.base_directory
+        shutil.rmtree(self.directory)
+
+    def test_get_revalidated(self):
+        first = self.app.get("/ticket/1").text
+        second = self.app.get("/ticket/1")
+        self.assertEquals(second.text, first)
+        self.assertTrue(second.from_cache)
+        self.assertEquals(len(self.server.requests), 2)
+
+    def test_get_rows_streamed(self):
+        first = list(self.app.get_rows("/report/1?format=tab"))
+        second = list(self.app.get_rows("/report/1?format=tab"))
+        self.assertEquals(first, [["id", "summary"], ["1", u"café"]])
+        self.assertEquals(second, first)
+
+    def test_stream_not_consumed(self):
+        r = self.app.get("/report/1?format=tab", stream=True)
+        r.close()
+        r = self.app.get("/report/1?format=tab", stream=True)
+        self.assertFalse(getattr(r, "from_cache", False))
+        r.close()
+
+    def test_no_validators(self):
+        self.app.get("/nocache")
+        r = self.app.get("/nocache")
+        self.assertFalse(getattr(r, "from_cache", False))
+
+    def test_no_cache(self):
+        self.app.get("/ticket/1")
+        self.app.use_cache = False
+        r = self.app.get("/ticket/1")
+        self.assertFalse(getattr(r, "from_cache", False))
+
+    def test_evict(self):
+        c = cache.ResponseCache(os.path.join(self.directory, "c"), 300)
+        r1 = self.app.session.get(self.app.base_url + "/ticket/1")
+        r2 = self.app.session.get(self.app.base_url + "/report/1?format=tab")
+        c.store("http://a/1", r1)
+        c.store("http://a/2", r2)
+        c.store("http://a/3", r1)
+        self.assertEquals(c.get("http://a/1"), None)
+        self.assertNotEqual(c.get("http://a/2"), None)
+        self.assertNotEqual(c.get("http://a/3"), None)
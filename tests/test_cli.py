@@ -0,0 +1,53 @@
+import os
+import unittest
+
+from cartman import cli
+
+
+class CliUnitTest(unittest.TestCase):
+
+    def parse(self, argv):
+        return cli.build_parser().parse_args(argv)
+
+    def test_is_forwardable_report(self):
+        self.assertTrue(cli.is_forwardable(self.parse(["report", "1"])))
+
+    def test_is_forwardable_comment_message(self):
+        args = self.parse(["comment", "1", "-m", "meh"])
+        self.assertTrue(cli.is_forwardable(args))
+
+    def test_is_forwardable_editor(self):
+        self.assertFalse(cli.is_forwardable(self.parse(["comment", "1"])))
+        self.assertFalse(cli.is_forwardable(self.parse(["new"])))
+        self.assertFalse(cli.is_forwardable(self.parse(["new", "-m", "a"])))
+        args = self.parse(["status", "1", "reopen", "-c"])
+        self.assertFalse(cli.is_forwardable(args))
+
+    def test_is_forwardable_stdin(self):
+        self.assertFalse(cli.is_forwardable(self.parse(["view", "-i"])))
+        args = self.parse(["change", "-", "milestone=2"])
+        self.assertFalse(cli.is_forwardable(args))
+
+    def test_is_forwardable_environment(self):
+        os.environ["TRAC_PASSWORD"] = "secret"
+        try:
+            self.assertFalse(cli.is_forwardable(self.parse(["report", "1"])))
+        finally:
+            del os.environ["TRAC_PASSWORD"]
+
+    def test_is_forwardable_browser(self):
+        self.assertFalse(cli.is_forwardable(self.parse(["open", "1"])))
+
+    def test_parse_fast_arguments_help(self):
+        args = cli.parse_fast_arguments(["help", "new"])
+        self.assertEquals(args.command, "help")
+        self.assertEquals(args.parameters, ["new"])
+
+    def test_parse_fast_arguments_options(self):
+        self.assertEquals(cli.parse_fast_arguments(["help", "-s", "x"]), None)
+        self.assertEquals(cli.parse_fast_arguments(["report", "1"]), None)
+        self.assertEquals(cli.parse_fast_arguments([]), None)
+
+    def test_parse_fast_arguments_defaults(self):
+        args = cli.parse_fast_arguments(["open", "1"])
+        self.assertEquals(vars(args), vars(self.parse(["open", "1"])))
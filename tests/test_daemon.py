@@ -0,0 +1,116 @@
+import io
+import os
+import sys
+import shutil
+import argparse
+import tempfile
+import threading
+import unittest
+
+from cartman import daemon
+
+
+released = threading.Event()
+
+
+def dummy_run(argv, get_application):
+    if argv == ["crash"]:
+        raise ValueError("boom")
+
+    # Blocks until another command runs.
+    if argv == ["wait"]:
+        sys.stdout.write("released\n" if released.wait(5) else "timeout\n")
+        return 0
+
+    if argv == ["release"]:
+        released.set()
+
+    sys.stdout.write("first line\n")
+    sys.stderr.write("warning\n")
+    sys.stdout.write(" ".join(argv) + "\n")
+
+    return len(argv)
+
+
+class DaemonUnitTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "daemon.sock")
+        self.thread = threading.Thread(target=daemon.serve,
+                                       args=(dummy_run, self.path))
+        self.thread.start()
+
+        # Wait for the daemon to accept connections.
+        sock = None
+        while sock is None:
+            sock = daemon.connect(self.path)
+        sock.close()
+
+    def tearDown(self):
+        if self.thread.is_alive():
+            daemon.stop(self.path)
+        self.thread.join()
+        shutil.rmtree(self.directory)
+
+    def forward(self, argv):
+        stdout, stderr = io.StringIO(), io.StringIO()
+        status = daemon.forward(argv, self.path, stdout, stderr)
+        return status, stdout.getvalue(), stderr.getvalue()
+
+    def test_forward(self):
+        status, out, err = self.forward(["view", "1"])
+
+        self.assertEquals(status, 2)
+        self.assertEquals(out, "first line\nview 1\n")
+        self.assertEquals(err, "warning\n")
+
+    def test_forward_twice(self):
+        self.assertEquals(self.forward(["a"])[0], 1)
+        self.assertEquals(self.forward(["a", "b", "c"])[0], 3)
+
+    def test_forward_crash(self):
+        status, out, err = self.forward(["crash"])
+
+        self.assertEquals(status, 1)
+        self.assertIn("ValueError: boom", err)
+
+    def test_forward_concurrent(self):
+        released.clear()
+        results = []
+        thread = threading.Thread(
+            target=lambda: results.append(self.forward(["wait"])))
+        thread.start()
+
+        self.assertEquals(self.forward(["release"]),
+                          (1, "first line\nrelease\n", "warning\n"))
+        thread.join()
+        self.assertEquals(results, [(0, "released\n", "")])
+
+    def test_applications(self):
+        server = daemon.Server(os.path.join(self.directory, "other.sock"),
+                               dummy_run)
+        args = argparse.Namespace(site=None)
+        try:
+            first = server.acquire_application(args)
+            second = server.acquire_application(args)
+            self.assertFalse(first is second)
+
+            server.release_application(args, first)
+            self.assertTrue(server.acquire_application(args) is first)
+        finally:
+            server.server_close()
+
+    def test_forward_no_daemon(self):
+        path = os.path.join(self.directory, "nothing.sock")
+        self.assertEquals(daemon.forward(["view", "1"], path), None)
+
+    def test_serve_twice(self):
+        self.assertRaises(daemon.exceptions.FatalError, daemon.serve,
+                          dummy_run, self.path)
+
+    def test_stop(self):
+        daemon.stop(self.path)
+        self.thread.join()
+
+        self.assertFalse(os.path.exists(self.path))
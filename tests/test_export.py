@@ -0,0 +1,105 @@
+import os
+import csv
+import gzip
+import json
+import shutil
+import tempfile
+import unittest
+
+from cartman import exceptions, export
+
+
+class ExportUnitTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def test_jsonl_gzip_pages(self):
+        path = self._path("out.jsonl.gz")
+        e = export.Export(path, "report 1")
+        self.assertFalse(e.load_checkpoint())
+        self.assertEquals(e.write_page(["id", "summary"],
+                                       iter([["1", "a"], ["2", "b"]])), 2)
+        self.assertEquals(e.write_page(["id", "summary"], [["3", u"\xe9"]]),
+                          1)
+
+        # The checkpoint is kept until the export is finished.
+        self.assertTrue(os.path.exists(path + ".checkpoint"))
+        e.finish()
+        self.assertFalse(os.path.exists(path + ".checkpoint"))
+
+        with gzip.open(path) as fp:
+            records = [json.loads(line.decode("utf-8")) for line in fp]
+        self.assertEquals(records, [
+            {"id": "1", "summary": "a"},
+            {"id": "2", "summary": "b"},
+            {"id": "3", "summary": u"\xe9"},
+        ])
+
+    def test_csv(self):
+        path = self._path("out.csv")
+        e = export.Export(path, "query status=new")
+        e.write_page(["id", "summary"], [["1", "a, b"]])
+        e.write_page(["id", "summary"], [["2", "c"]])
+
+        with open(path) as fp:
+            self.assertEquals(list(csv.reader(fp)), [
+                ["id", "summary"],
+                ["1", "a, b"],
+                ["2", "c"],
+            ])
+
+    def test_resume(self):
+        path = self._path("out.jsonl.gz")
+        e = export.Export(path, "report 1")
+        e.write_page(["id"], [["1"], ["2"]])
+
+        # A page interrupted while written is dropped on resume.
+        def interrupted_rows():
+            yield ["3"]
+            raise KeyboardInterrupt()
+
+        self.assertRaises(KeyboardInterrupt, e.write_page, ["id"],
+                          interrupted_rows())
+
+        e = export.Export(path, "report 1")
+        self.assertTrue(e.load_checkpoint())
+        self.assertEquals((e.page, e.rows), (1, 2))
+        e.write_page(["id"], [["3"], ["4"]])
+        e.finish()
+
+        with gzip.open(path) as fp:
+            ids = [json.loads(line.decode("utf-8"))["id"] for line in fp]
+        self.assertEquals(ids, ["1", "2", "3", "4"])
+
+    def test_resume_other_source(self):
+        path = self._path("out.jsonl")
+        export.Export(path, "report 1").write_page(["id"], [["1"]])
+
+        e = export.Export(path, "report 2")
+        self.assertRaises(exceptions.FatalError, e.load_checkpoint)
+
+    def test_resume_other_format(self):
+        path = self._path("out.jsonl")
+        export.Export(path, "report 1").write_page(["id"], [["1"]])
+
+        for name in ("out.csv", "out.jsonl.gz"):
+            other = self._path(name)
+            shutil.copy(path, other)
+            shutil.copy(path + ".checkpoint", other + ".checkpoint")
+            e = export.Export(other, "report 1")
+            self.assertRaises(exceptions.FatalError, e.load_checkpoint)
+
+        self.assertTrue(export.Export(path, "report 1").load_checkpoint())
+
+    def test_columns_changed(self):
+        e = export.Export(self._path("out.jsonl"), "report 1")
+        e.write_page(["id"], [["1"]])
+        self.assertRaises(exceptions.FatalError, e.write_page,
+                          ["id", "summary"], [["2", "b"]])
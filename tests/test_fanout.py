@@ -0,0 +1,146 @@
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+from cartman import app, cli, exceptions, fanout
+
+
+class DummyTicket:
+
+    def __init__(self, ticket_id, summary):
+        self.id = ticket_id
+        self.summary = summary
+
+    def format_title(self):
+        return "#{}. {}".format(self.id, self.summary)
+
+    def as_dict(self):
+        return {"id": self.id, "summary": self.summary}
+
+
+class FanoutUnitTest(unittest.TestCase):
+
+    def setUp(self):
+        self.stdout = sys.stdout
+        sys.stdout = StringIO()
+        self.base_directory = app.BASE_DIRECTORY
+        self.directory = tempfile.mkdtemp()
+        app.BASE_DIRECTORY = os.path.join(self.directory, "cartman")
+
+    def tearDown(self):
+        sys.stdout = self.stdout
+        app.BASE_DIRECTORY = self.base_directory
+        shutil.rmtree(self.directory)
+
+    def test_is_multi_site(self):
+        self.assertFalse(fanout.is_multi_site(None))
+        self.assertFalse(fanout.is_multi_site("trac"))
+        self.assertTrue(fanout.is_multi_site("a,b"))
+        self.assertTrue(fanout.is_multi_site("all"))
+
+    def test_get_sites(self):
+        multi = fanout.MultiSiteApp()
+        self.assertEquals(multi.get_sites("a, b,,a"), ["a", "b"])
+
+    def test_get_sites_all(self):
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, "config")
+        with open(path, "w") as fp:
+            fp.write("[a]\nbase_url = http://a/\n[b]\nbase_url = http://b/\n"
+                     "[notes]\nstuff = 1\n")
+
+        config_locations = app.CONFIG_LOCATIONS
+        app.CONFIG_LOCATIONS = [path]
+        try:
+            self.assertEquals(fanout.MultiSiteApp().get_sites("all"),
+                              ["a", "b"])
+        finally:
+            app.CONFIG_LOCATIONS = config_locations
+            shutil.rmtree(directory)
+
+    def test_run_write_command(self):
+        args = cli.build_parser().parse_args(["-s", "a,b", "new"])
+        self.assertRaises(exceptions.UsageException,
+                          fanout.MultiSiteApp().run, args)
+
+    def test_run_stdin(self):
+        args = cli.build_parser().parse_args(["-s", "a,b", "view", "-"])
+        parameters = []
+
+        def run(application, site_args):
+            parameters.append(site_args.parameters)
+
+        stdin = sys.stdin
+        run_orig = fanout.SiteApp.run
+        sys.stdin = StringIO("12\n15\n")
+        fanout.SiteApp.run = run
+        try:
+            fanout.MultiSiteApp().run(args)
+        finally:
+            fanout.SiteApp.run = run_orig
+            sys.stdin = stdin
+
+        self.assertEquals(parameters, [["12\n15\n"], ["12\n15\n"]])
+
+    def test_run_invalid_parameter(self):
+        application = fanout.SiteApp("a", fanout.Printer("text"))
+        self.assertRaises(exceptions.InvalidParameter,
+                          application.call_command, application.run_view,
+                          "run_view", ["x"])
+        self.assertEquals(sys.stdout.getvalue(), "")
+
+    def test_warn(self):
+        stderr = sys.stderr
+        sys.stderr = StringIO()
+        try:
+            fanout.SiteApp("a", fanout.Printer("text")).warn("meh")
+            self.assertEquals(sys.stderr.getvalue(), "[a] warning: meh\n")
+        finally:
+            sys.stderr = stderr
+
+    def test_print_text(self):
+        printer = fanout.Printer("text")
+        application = fanout.SiteApp("a", printer)
+        tickets = [DummyTicket(1, "meh"), DummyTicket(2, "bleh")]
+        application.print_output(application.format_items(
+            tickets, DummyTicket.format_title, DummyTicket.as_dict))
+        application.print_output(["title\n-----"])
+
+        self.assertEquals(sys.stdout.getvalue().splitlines(), [
+            "[a] #1. meh",
+            "[a] #2. bleh",
+            "[a] title",
+            "[a] -----",
+        ])
+
+    def test_print_jsonl(self):
+        printer = fanout.Printer("jsonl")
+        application = fanout.SiteApp("a", printer)
+        application.output_format = "jsonl"
+        application.print_output(application.format_items(
+            [DummyTicket(1, "meh")], None, DummyTicket.as_dict))
+
+        record = json.loads(sys.stdout.getvalue())
+        self.assertEquals(record, {"site": "a", "id": 1, "summary": "meh"})
+
+    def test_print_tsv_header_once(self):
+        printer = fanout.Printer("tsv")
+        for site in ("a", "b"):
+            application = fanout.SiteApp(site, printer)
+            application.output_format = "tsv"
+            application.print_output(application.format_items(
+                [{"id": 1}], None))
+
+        self.assertEquals(sys.stdout.getvalue().splitlines(), [
+            "site\tid",
+            "a\t1",
+            "b\t1",
+        ])
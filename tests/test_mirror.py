@@ -0,0 +1,103 @@
+import unittest
+
+from cartman import mirror
+
+
+class MirrorUnitTest(unittest.TestCase):
+
+    def setUp(self):
+        self.mirror = mirror.Mirror(":memory:")
+
+    def tearDown(self):
+        self.mirror.close()
+
+    def test_meta(self):
+        self.assertEquals(self.mirror.get_meta("stuff"), None)
+        self.assertEquals(self.mirror.get_meta("stuff", "meh"), "meh")
+        self.mirror.set_meta("stuff", "value")
+        self.assertEquals(self.mirror.get_meta("stuff"), "value")
+
+    def test_store_tickets(self):
+        columns = ["id", "summary", "changetime"]
+        count = self.mirror.store_tickets(columns, [
+            ["1", "first", "2017-01-01"],
+            ["2", "second", "2017-01-03"],
+        ])
+
+        self.assertEquals(count, 2)
+        self.assertEquals(self.mirror.get_meta("changetime"), "2017-01-03")
+        self.assertEquals(self.mirror.get_ticket(1), {
+            "id": "1",
+            "summary": "first",
+            "changetime": "2017-01-01",
+        })
+        self.assertEquals(self.mirror.get_ticket(3), None)
+
+    def test_store_tickets_update(self):
+        columns = ["id", "summary", "changetime"]
+        self.mirror.store_tickets(columns, [["1", "first", "2017-01-01"]])
+        self.mirror.store_tickets(columns, [["1", "changed", "2017-01-04"]])
+
+        self.assertEquals(self.mirror.count_tickets(), 1)
+        self.assertEquals(self.mirror.get_ticket(1)["summary"], "changed")
+        self.assertEquals(self.mirror.get_meta("changetime"), "2017-01-04")
+
+    def test_store_tickets_nothing_keeps_mark(self):
+        columns = ["id", "summary", "changetime"]
+        self.mirror.store_tickets(columns, [["1", "first", "2017-01-01"]])
+        self.assertEquals(self.mirror.store_tickets(columns, []), 0)
+        self.assertEquals(self.mirror.get_meta("changetime"), "2017-01-01")
+
+    def test_clear_tickets(self):
+        columns = ["id", "summary", "changetime"]
+        self.mirror.store_tickets(columns, [["1", "first", "2017-01-01"]])
+        self.mirror.clear_tickets()
+
+        self.assertEquals(self.mirror.count_tickets(), 0)
+        self.assertEquals(self.mirror.get_meta("changetime"), None)
+
+    def _store_search_tickets(self):
+        columns = ["id", "summary", "description", "changetime"]
+        self.mirror.store_tickets(columns, [
+            ["1", "dead mouse", "found under the desk", "2017-01-01"],
+            ["2", "printer", "a dead mouse is stuck in it", "2017-01-02"],
+            ["3", "keyboard", "missing keys", "2017-01-03"],
+        ])
+
+    def test_search(self):
+        self._store_search_tickets()
+        results = self.mirror.search(["dead", "mouse"])
+        self.assertEquals([d["id"] for d in results], ["1", "2"])
+
+    def test_search_updated(self):
+        self._store_search_tickets()
+        self.mirror.store_tickets(["id", "summary", "description",
+                                   "changetime"], [
+            ["1", "cat", "nothing to see", "2017-01-04"],
+        ])
+        results = self.mirror.search(["mouse"])
+        self.assertEquals([d["id"] for d in results], ["2"])
+
+    def test_search_syntax(self):
+        self._store_search_tickets()
+        self.assertEquals(self.mirror.search(['keys"', "OR"]), [])
+
+    def test_search_without_index(self):
+        self.mirror.has_index = False
+        self._store_search_tickets()
+        results = self.mirror.search(["dead", "mouse"])
+        self.assertEquals([d["id"] for d in results], ["2", "1"])
+
+    def test_store_report(self):
+        self.mirror.store_report(3, ["ticket", "summary"], [["1", "first"]])
+        self.mirror.store_report(3, ["ticket", "summary"], [
+            ["2", "second"],
+            ["4", "fourth"],
+        ])
+
+        self.assertEquals(self.mirror.get_report_ids(), [3])
+        self.assertEquals(self.mirror.get_report(3), (
+            ["ticket", "summary"],
+            [["2", "second"], ["4", "fourth"]],
+        ))
+        self.assertEquals(self.mirror.get_report(4), None)
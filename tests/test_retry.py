@@ -0,0 +1,144 @@
+import time
+import unittest
+
+import requests
+import urllib3
+
+from cartman import app
+
+
+class DummyResponse:
+
+    def __init__(self, status_code, text=""):
+        self.status_code = status_code
+        self.text = text
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class DummySession:
+
+    """Return or raise the given outcomes in order, after an optional delay
+    (``(delay, outcome)`` tuples)."""
+
+    def __init__(self, outcomes):
+        self.outcomes = outcomes
+        self.calls = []
+
+    def request(self, method, url, **kwargs):
+        self.calls.append((method, kwargs["timeout"]))
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, tuple):
+            delay, outcome = outcome
+            time.sleep(delay)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+
+def refused():
+    reason = urllib3.exceptions.NewConnectionError(None, "refused")
+    return requests.exceptions.ConnectionError(
+        urllib3.exceptions.MaxRetryError(None, "/", reason))
+
+
+class RetryUnitTest(unittest.TestCase):
+
+    def setUp(self):
+        self.backoff_base = app.BACKOFF_BASE
+        app.BACKOFF_BASE = 0
+        self.app = app.CartmanApp()
+
+    def tearDown(self):
+        app.BACKOFF_BASE = self.backoff_base
+
+    def send(self, method, outcomes):
+        self.app.session = DummySession(outcomes)
+        return self.app.send(method, "http://localhost/")
+
+    def test_timeouts(self):
+        self.app.connect_timeout = 1.5
+        self.app.read_timeout = 20
+        self.send("GET", [DummyResponse(200)])
+        self.assertEquals(self.app.session.calls, [("GET", (1.5, 20))])
+
+    def test_get_retried(self):
+        r = self.send("GET", [
+            requests.exceptions.ReadTimeout(),
+            DummyResponse(503),
+            DummyResponse(200),
+        ])
+        self.assertEquals(r.status_code, 200)
+        self.assertEquals(len(self.app.session.calls), 3)
+
+    def test_get_retries_exhausted(self):
+        self.app.retries = 1
+        self.assertRaises(requests.exceptions.ReadTimeout, self.send, "GET", [
+            requests.exceptions.ReadTimeout(),
+            requests.exceptions.ReadTimeout(),
+            DummyResponse(200),
+        ])
+
+    def test_get_busy_exhausted(self):
+        self.app.retries = 1
+        r = self.send("GET", [DummyResponse(503), DummyResponse(502)])
+        self.assertEquals(r.status_code, 502)
+
+    def test_post_not_retried(self):
+        self.assertRaises(requests.exceptions.ReadTimeout, self.send,
+                          "POST", [
+                              requests.exceptions.ReadTimeout(),
+                              DummyResponse(200),
+                          ])
+        r = self.send("POST", [DummyResponse(503), DummyResponse(200)])
+        self.assertEquals(r.status_code, 503)
+
+    def test_post_retried_before_connection(self):
+        r = self.send("POST", [
+            requests.exceptions.ConnectTimeout(),
+            refused(),
+            DummyResponse(200),
+        ])
+        self.assertEquals(r.status_code, 200)
+
+    def test_is_connect_error(self):
+        self.assertTrue(app.is_connect_error(refused()))
+        self.assertFalse(app.is_connect_error(
+            requests.exceptions.ConnectionError("reset by peer")))
+
+    def test_get_backoff(self):
+        app.BACKOFF_BASE = 0.5
+        for attempt in range(4):
+            backoff = app.get_backoff(attempt)
+            self.assertTrue(0 <= backoff <= 0.5 * 2 ** attempt)
+
+    def test_hedged(self):
+        self.app.hedge_after = 0.05
+        slow = DummyResponse(200, "slow")
+        r = self.send("GET", [(0.5, slow), DummyResponse(200, "fast")])
+        self.assertEquals(r.text, "fast")
+        time.sleep(0.6)
+        self.assertTrue(slow.closed)
+
+    def test_hedged_not_needed(self):
+        self.app.hedge_after = 1
+        r = self.send("GET", [DummyResponse(200, "fast")])
+        self.assertEquals(r.text, "fast")
+        self.assertEquals(len(self.app.session.calls), 1)
+
+    def test_hedged_first_fails(self):
+        self.app.hedge_after = 0.05
+        self.app.retries = 0
+        r = self.send("GET", [
+            (0.2, requests.exceptions.ConnectionError()),
+            (0.3, DummyResponse(200, "second")),
+        ])
+        self.assertEquals(r.text, "second")
@@ -0,0 +1,190 @@
+import os
+import time
+import shutil
+import tempfile
+import unittest
+
+from cartman import app, session
+from cartman.session import cookielib
+
+
+def make_cookie(name, value, expires=None):
+    return cookielib.Cookie(
+        version=0, name=name, value=value, port=None, port_specified=False,
+        domain="localhost.local", domain_specified=False,
+        domain_initial_dot=False, path="/", path_specified=True,
+        secure=False, expires=expires, discard=expires is None, comment=None,
+        comment_url=None, rest={},
+    )
+
+
+class DummyResponse:
+
+    def __init__(self, status_code, text, headers=None):
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers or {}
+
+    def close(self):
+        pass
+
+
+class DummySession:
+
+    def __init__(self, responses):
+        self.cookies = cookielib.CookieJar()
+        self.responses = responses
+        self.urls = []
+
+    def get(self, url, **kwargs):
+        self.urls.append(url)
+        return self.responses.pop(0)
+
+
+class SessionApp(app.CartmanApp):
+
+    def __init__(self, responses):
+        app.CartmanApp.__init__(self)
+        self.base_url = "http://localhost"
+        self.auth_type = "basic"
+        self.trac_version = (1, 0)
+        self.session_lifetime = 3600
+        self.cache_size = 0
+        self.session = DummySession(responses)
+
+
+class SessionUnitTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "cookies")
+        self.base_directory = app.BASE_DIRECTORY
+        app.BASE_DIRECTORY = self.directory
+
+    def tearDown(self):
+        app.BASE_DIRECTORY = self.base_directory
+        shutil.rmtree(self.directory)
+
+    def test_has_auth_cookie(self):
+        jar = cookielib.CookieJar()
+        self.assertFalse(session.has_auth_cookie(jar))
+        jar.set_cookie(make_cookie("trac_auth", "123"))
+        self.assertTrue(session.has_auth_cookie(jar))
+
+    def test_is_auth_expired(self):
+        for header, expected in (
+                ('trac_auth=""; expires=Thu, 01 Jan 1970 00:00:00 GMT', True),
+                ("trac_form_token=456, trac_auth=; Path=/", True),
+                ("trac_auth=123; Path=/", False),
+                ("trac_session=123", False),
+                ("", False)):
+            response = DummyResponse(200, "", {"Set-Cookie": header})
+            self.assertEqual(session.is_auth_expired(response), expected)
+
+    def test_load_missing(self):
+        jar = cookielib.CookieJar()
+        self.assertFalse(session.load(jar, self.path))
+
+    def test_save_load(self):
+        jar = cookielib.CookieJar()
+        jar.set_cookie(make_cookie("trac_auth", "123"))
+        jar.set_cookie(make_cookie("trac_form_token", "456"))
+        session.save(jar, self.path)
+
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o600)
+
+        restored = cookielib.CookieJar()
+        self.assertTrue(session.load(restored, self.path))
+        self.assertEqual(sorted((c.name, c.value) for c in restored), [
+            ("trac_auth", "123"),
+            ("trac_form_token", "456"),
+        ])
+
+    def test_load_expired_cookie(self):
+        jar = cookielib.CookieJar()
+        jar.set_cookie(make_cookie("trac_auth", "123", int(time.time()) - 60))
+        session.save(jar, self.path)
+
+        restored = cookielib.CookieJar()
+        self.assertFalse(session.load(restored, self.path))
+
+    def test_load_too_old(self):
+        jar = cookielib.CookieJar()
+        jar.set_cookie(make_cookie("trac_auth", "123"))
+        session.save(jar, self.path)
+        old = time.time() - 7200
+        os.utime(self.path, (old, old))
+
+        restored = cookielib.CookieJar()
+        self.assertFalse(session.load(restored, self.path, lifetime=3600))
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_app_restore_skips_login(self):
+        application = SessionApp([])
+        jar = cookielib.CookieJar()
+        jar.set_cookie(make_cookie("trac_auth", "123"))
+        session.save(jar, application.get_site_path("cookies"))
+
+        application.restore_session()
+        application.login()
+
+        self.assertTrue(application.logged_in)
+        self.assertEqual(application.session.urls, [])
+
+    def test_app_relogin_on_stale_session(self):
+        application = SessionApp([
+            DummyResponse(200, '<a href="/trac/login">Login</a>'),
+            DummyResponse(200, "logged in as nosetests"),
+            DummyResponse(200, "logged in as nosetests, ticket page"),
+        ])
+        jar = cookielib.CookieJar()
+        jar.set_cookie(make_cookie("trac_auth", "123"))
+        session.save(jar, application.get_site_path("cookies"))
+        application.restore_session()
+
+        r = application.get("/ticket/1")
+
+        self.assertEqual(r.text, "logged in as nosetests, ticket page")
+        self.assertEqual(application.session.urls, [
+            "http://localhost/ticket/1",
+            "http://localhost/login",
+            "http://localhost/ticket/1",
+        ])
+        self.assertFalse(application.session_restored)
+
+    def test_app_relogin_on_expired_stream(self):
+        expired = {"Set-Cookie": 'trac_auth=""; Path=/'}
+        application = SessionApp([
+            DummyResponse(200, "id\tsummary", expired),
+            DummyResponse(200, "logged in as nosetests"),
+            DummyResponse(200, "id\tsummary"),
+        ])
+        jar = cookielib.CookieJar()
+        jar.set_cookie(make_cookie("trac_auth", "123"))
+        session.save(jar, application.get_site_path("cookies"))
+        application.restore_session()
+
+        application.get("/report/1?format=tab", stream=True)
+
+        self.assertEqual(application.session.urls, [
+            "http://localhost/report/1?format=tab",
+            "http://localhost/login",
+            "http://localhost/report/1?format=tab",
+        ])
+        self.assertFalse(application.session_restored)
+
+    def test_app_stream_single_request(self):
+        application = SessionApp([
+            DummyResponse(200, "id\tsummary"),
+        ])
+        jar = cookielib.CookieJar()
+        jar.set_cookie(make_cookie("trac_auth", "123"))
+        session.save(jar, application.get_site_path("cookies"))
+        application.restore_session()
+
+        application.get("/report/1?format=tab", stream=True)
+
+        self.assertEqual(application.session.urls, [
+            "http://localhost/report/1?format=tab",
+        ])
+        self.assertTrue(application.session_restored)
@@ -0,0 +1,80 @@
+import os
+import sys
+import subprocess
+import unittest
+
+from cartman import app
+
+
+# Modules only needed by some of the commands, which should not be loaded
+# when the command-line interface starts.
+LAZY_MODULES = (
+    "requests",
+    "csv",
+    "difflib",
+    "email.parser",
+    "multiprocessing.pool",
+    "socket",
+    "sqlite3",
+    "subprocess",
+    "tempfile",
+    "webbrowser",
+)
+
+# Ceiling of the cumulative import time of the command-line interface
+# (microseconds), a few times the usual time but well below the cost of an
+# eager import of requests (more than 100ms).
+IMPORT_TIME_BUDGET = 50000
+
+
+def get_imported_modules(code):
+    output = subprocess.check_output(
+            [sys.executable, "-c",
+             code + "\nimport sys\nprint('\\n'.join(sys.modules))"])
+    return output.decode("ascii").split()
+
+
+def get_import_time(module, repeat=3):
+    # Measure the import of the compiled modules, the first run writes them
+    # if needed, the best of the following runs is kept.
+    env = dict(os.environ)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    subprocess.check_call([sys.executable, "-c", "import " + module],
+                          env=env)
+
+    times = []
+    for _ in range(repeat):
+        output = subprocess.check_output(
+                [sys.executable, "-X", "importtime", "-c", "import " + module],
+                stderr=subprocess.STDOUT, env=env)
+        for line in output.decode("ascii").splitlines():
+            fields = line.split("|")
+            if len(fields) == 3 and fields[2].strip() == module:
+                times.append(int(fields[1]))
+
+    return min(times)
+
+
+class StartupUnitTest(unittest.TestCase):
+
+    def test_lazy_modules(self):
+        # Ignore the modules loaded by the interpreter itself (e.g. from .pth
+        # files of the site-packages).
+        baseline = set(get_imported_modules(""))
+        modules = set(get_imported_modules("import cartman.cli")) - baseline
+        for name in LAZY_MODULES:
+            if name not in baseline:
+                self.assertFalse(name in modules, name)
+
+    def test_requests_not_imported(self):
+        modules = get_imported_modules("import cartman.cli")
+        self.assertFalse("requests" in modules)
+
+    @unittest.skipIf(sys.version_info < (3, 7), "-X importtime unavailable")
+    def test_import_time(self):
+        self.assertTrue(get_import_time("cartman.cli") < IMPORT_TIME_BUDGET)
+
+    def test_commands(self):
+        methods = sorted(name for name in dir(app.CartmanApp)
+                         if name.startswith("run_"))
+        self.assertEquals(app.CartmanApp().list_commands(), methods)
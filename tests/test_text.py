@@ -66,6 +66,47 @@ class TextUnitTest(unittest.TestCase):
     def test_validate_id_str_good(self):
         self.assertEquals(text.validate_id("12"), 12)
 
+    def test_validate_id_list_one(self):
+        self.assertEquals(text.validate_id_list("12"), [12])
+
+    def test_validate_id_list_ranges(self):
+        self.assertEquals(text.validate_id_list("12,15,20-22 3\n12"),
+                          [12, 15, 20, 21, 22, 3])
+
+    def test_validate_id_list_empty(self):
+        self.assertRaises(exceptions.InvalidParameter, text.validate_id_list,
+                          " ")
+
+    def test_validate_id_list_bad_range(self):
+        self.assertRaises(exceptions.InvalidParameter, text.validate_id_list,
+                          "5-2")
+
+    def test_validate_id_list_bad_id(self):
+        self.assertRaises(exceptions.InvalidParameter, text.validate_id_list,
+                          "5,a")
+
+    def test_is_beyond_last_page(self):
+        self.assertTrue(text.is_beyond_last_page(
+            "Page 3 is beyond the number of pages in the query"))
+        self.assertFalse(text.is_beyond_last_page("Report 3 does not exist."))
+
+    def test_format_id_list(self):
+        self.assertEquals(text.format_id_list([12, 3, 5, 4, 12, 7, 8]),
+                          "3-5,7-8,12")
+        self.assertEquals(text.format_id_list([1]), "1")
+
+    def test_iter_lines_empty(self):
+        self.assertEquals(list(text.iter_lines([])), [])
+
+    def test_iter_lines_chunked(self):
+        chunks = ["ab", "c\nde", "", "f\r\n\ng", "h"]
+        self.assertEquals(list(text.iter_lines(chunks)), [
+            "abc\n",
+            "def\r\n",
+            "\n",
+            "gh",
+        ])
+
     def test_fuzzy_find_no_options(self):
         self.assertEquals(text.fuzzy_find("meh", []), None)
 
@@ -88,6 +129,67 @@ class TextUnitTest(unittest.TestCase):
         self.assertEquals(text.fuzzy_find("meh", ["meh stuff", "mih stuff"]),
                           "meh stuff")
 
+    def test_extract_timeline_events(self):
+        raw_xml = b"""<?xml version="1.0"?>
+            <rss version="2.0" xmlns:dc="http://purl.org/dc/elements/1.1/">
+              <channel>
+                <item>
+                  <title>Ticket #2 (stuff) closed</title>
+                  <dc:creator>bob</dc:creator>
+                  <pubDate>Tue, 02 May 2023 10:48:00 GMT</pubDate>
+                  <link>http://localhost/ticket/2#comment:1</link>
+                  <guid isPermaLink="false">guid-2</guid>
+                  <description>&lt;p&gt;fixed&lt;/p&gt;</description>
+                </item>
+                <item>
+                  <title>Ticket #1 (other stuff) created</title>
+                  <dc:creator>joe</dc:creator>
+                  <pubDate>Tue, 02 May 2023 10:47:00 GMT</pubDate>
+                  <link>http://localhost/ticket/1</link>
+                </item>
+              </channel>
+            </rss>"""
+        events = text.extract_timeline_events(raw_xml)
+        self.assertEquals([e["ticket"] for e in events], [1, 2])
+        self.assertEquals(events[0]["time"], 1683024420)
+        self.assertEquals(events[0]["author"], "joe")
+        self.assertEquals(events[0]["id"], "http://localhost/ticket/1/"
+                                           "Tue, 02 May 2023 10:47:00 GMT")
+        self.assertEquals(events[1]["id"], "guid-2")
+        self.assertEquals(events[1]["title"], "Ticket #2 (stuff) closed")
+        self.assertEquals(events[1]["description"], "<p>fixed</p>")
+
+    def test_extract_timeline_events_invalid(self):
+        self.assertRaises(exceptions.FatalError,
+                          text.extract_timeline_events, b"<html>")
+
+    def test_fuzzy_index(self):
+        index = text.FuzzyIndex(["Backend", "Frontend", "Web site",
+                                 "Web service"])
+        self.assertTrue("Backend" in index)
+        self.assertFalse("backend" in index)
+        self.assertEquals(index.find("backend"), "Backend")
+        self.assertEquals(index.find("backnd"), "Backend")
+        self.assertEquals(index.find("site"), "Web site")
+        self.assertEquals(index.find("web"), None)
+        self.assertEquals(index.find("nothing"), None)
+
+    def test_fuzzy_index_close_matches(self):
+        import difflib
+
+        options = ["{} {}".format(word, i)
+                   for word in ("milestone", "release", "sprint", "next")
+                   for i in range(250)]
+        index = text.FuzzyIndex(options)
+        self.assertEquals(len(index.get_close_matches("milestone 12x")), 2)
+        for value in ("milestone 12x", "relase 3", "next", "sprin", "zzz"):
+            self.assertEquals(
+                sorted(index.get_close_matches(value, len(options))),
+                sorted(difflib.get_close_matches(value, options,
+                                                 len(options))))
+        self.assertEquals(index.get_close_matches("zzz"), [])
+        self.assertEquals(index.find("Release 249"), "release 249")
+
     def test_extract_properties_none(self):
         raw_html = """hemene, hemene"""
         self.assertEquals(text.extract_properties(raw_html), {})
@@ -112,3 +214,50 @@ class TextUnitTest(unittest.TestCase):
             "another": "one",
             "bites": [ "the", "d;ust" ]
         })
+
+    def test_ticket_page_v1(self):
+        raw_html = """
+            <span class="trac-status">
+              <a href="/query?status=accepted">accepted</a>
+            </span>
+            <input type="hidden" name="start_time" value="111" />
+            <input type="hidden" name="view_time" value="222" />
+            <input type="radio" id="a1" name="action" value="leave" />
+            <input type="radio" id="a2" name="action" value="resolve" />
+            <p class="message">Something odd</p>
+            <p>Powered by <a href="/about"><strong>Trac 1.2</strong></a></p>
+            """
+        page = text.TicketPage(raw_html)
+        self.assertEquals(page.trac_version, (1, 2))
+        self.assertEquals(page.get_status(), "accepted")
+        self.assertEquals(page.actions, ["leave", "resolve"])
+        self.assertEquals(page.message, "Something odd")
+        self.assertEquals(page.get_timestamps(),
+                          {"start_time": "111", "view_time": "222"})
+
+    def test_ticket_page_v0(self):
+        raw_html = """
+            <span class="status">(new defect)</span>
+            <input name="ts" value="333" />
+            """
+        page = text.TicketPage(raw_html)
+        self.assertEquals(page.trac_version, ())
+        self.assertEquals(page.get_status(), "new")
+        self.assertEquals(page.actions, [])
+        self.assertEquals(page.message, None)
+        self.assertEquals(page.get_timestamps(), {"ts": "333"})
+
+    def test_ticket_page_unclosed_input(self):
+        raw_html = """
+            <input <input name="ts" value="333" />
+            <input type="radio" name="action" value="leave"
+            """
+        page = text.TicketPage(raw_html)
+        self.assertEquals(page.get_timestamps(), {"ts": "333"})
+        self.assertEquals(page.actions, [])
+
+    def test_ticket_page_given_version(self):
+        raw_html = """<input name="ts" value="333" />"""
+        page = text.TicketPage(raw_html, (1, 0))
+        self.assertRaises(exceptions.FatalError, page.get_timestamps)
+        self.assertRaises(exceptions.FatalError, page.get_status)
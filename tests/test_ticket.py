@@ -39,3 +39,38 @@ class TicketUnitTest(unittest.TestCase):
 
         self.assertEquals(t.id, 123)
         self.assertEquals(t.reporter, "douche")
+
+    def test_ticket_slots(self):
+        t = ticket.Ticket()
+        self.assertRaises(AttributeError, setattr, t, "unknown", "value")
+
+    def test_compile_factory(self):
+        factory = ticket.compile_factory(["ticket", "summary", "priority",
+                                          "_reporter"])
+        t = factory(["12", "meh", "major", "douche"])
+
+        self.assertEquals(t.id, 12)
+        self.assertEquals(t.summary, "meh")
+        self.assertEquals(t.reporter, "douche")
+        self.assertEquals(t.description, "N/A")
+        self.assertEquals(t.extra, {"priority": "major"})
+
+    def test_compile_factory_short_row(self):
+        factory = ticket.compile_factory(["id", "summary", "owner"])
+        t = factory(["12", "meh"])
+
+        self.assertEquals(t.id, 12)
+        self.assertEquals(t.owner, "")
+        self.assertEquals(t.extra, {})
+
+    def test_as_dict(self):
+        factory = ticket.compile_factory(["ticket", "summary", "priority",
+                                          "id"])
+        fields = factory(["12", "meh", "major", "13"]).as_dict()
+
+        self.assertEquals(list(fields.keys())[:3], ["id", "type", "summary"])
+        self.assertEquals(fields["id"], 13)
+        self.assertEquals(fields["summary"], "meh")
+        self.assertEquals(fields["status"], "unknown")
+        self.assertEquals(list(fields.keys())[-1], "priority")
+        self.assertEquals(fields["priority"], "major")
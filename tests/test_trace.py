@@ -0,0 +1,57 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+
+from cartman import app, trace
+
+
+class TraceUnitTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "trace.jsonl")
+        self.base_directory = app.BASE_DIRECTORY
+        app.BASE_DIRECTORY = self.directory
+
+    def tearDown(self):
+        app.BASE_DIRECTORY = self.base_directory
+        shutil.rmtree(self.directory)
+
+    def read_events(self):
+        with open(self.path) as fp:
+            return [json.loads(line) for line in fp]
+
+    def test_summary(self):
+        tracer = trace.Tracer("view")
+        tracer("request_end", {"elapsed": 0.5, "bytes": 2048})
+        tracer("request_end", {"elapsed": 0.25, "bytes": 0, "error": "boom"})
+        tracer("stream_end", {"elapsed": 1.0, "bytes": 1024})
+        tracer("phase_end", {"phase": "parse", "elapsed": 0.125})
+        tracer("phase_end", {"phase": "parse", "elapsed": 0.125})
+
+        summary = tracer.get_summary()
+        self.assertEquals(summary["requests"], 2)
+        self.assertEquals(summary["errors"], 1)
+        self.assertEquals(summary["request_time"], 0.75)
+        self.assertEquals(summary["bytes"], 3072)
+        self.assertEquals(summary["phases"]["parse"],
+                          {"count": 2, "elapsed": 0.25})
+        self.assertEquals(summary["phases"]["stream"],
+                          {"count": 1, "elapsed": 1.0})
+
+        lines = tracer.format_summary(summary)
+        self.assertTrue(lines[0].startswith("trace: view "))
+        self.assertTrue("2 request(s), 1 error(s), 3.0 KiB" in lines[1])
+
+    def test_trace_file(self):
+        tracer = trace.Tracer("view", path=self.path)
+        tracer("request_start", {"method": "GET", "url": "/ticket/1"})
+        tracer.finish()
+
+        events = self.read_events()
+        self.assertEquals([e["event"] for e in events],
+                          ["request_start", "summary"])
+        self.assertEquals(events[0]["url"], "/ticket/1")
+        self.assertEquals(events[0]["command"], "view")
@@ -22,3 +22,23 @@ class UiUnitTest(unittest.TestCase):
 
     def test_title_with_space(self):
         self.assertEquals(ui.title("a bcd"), "a bcd\n-----")
+
+    def test_format_tsv_value(self):
+        self.assertEquals(ui.format_tsv_value(None), "")
+        self.assertEquals(ui.format_tsv_value(12), "12")
+        self.assertEquals(ui.format_tsv_value("a\tb\r\nc\\d"),
+                          "a\\tb\\r\\nc\\\\d")
+        self.assertEquals(ui.format_tsv_value({"a": [1, 2]}), '{"a": [1, 2]}')
+
+    def test_iter_jsonl(self):
+        lines = list(ui.iter_jsonl(iter([{"id": 1}, {"id": 2}])))
+        self.assertEquals(lines, ['{"id": 1}', '{"id": 2}'])
+
+    def test_iter_tsv(self):
+        records = iter([{"id": 1, "summary": "a b"}, {"id": 2}])
+        lines = list(ui.iter_tsv(records))
+        self.assertEquals(lines[1:], ["1\ta b", "2\t"])
+        self.assertEquals(sorted(lines[0].split("\t")), ["id", "summary"])
+
+    def test_iter_tsv_empty(self):
+        self.assertEquals(list(ui.iter_tsv([])), [])